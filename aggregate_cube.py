@@ -0,0 +1,183 @@
+# Shared Date x Product x Region aggregate cube
+
+import time
+import numpy as np
+import pandas as pd
+
+from dimensions import group_sum
+from sketches import PARTITION_ROWS, describe_sketch, measure_sketch, merge_measure_sketches, sketch_histogram
+from time_index import build_time_index, period_codes
+
+CUBE_DIMENSIONS = ['Date', 'Product', 'Region']
+CUBE_MEASURES = ['Sales', 'Revenue']
+MOMENTS = ['sum', 'count', 'sumsq']
+HISTOGRAM_BINS = 50
+
+def build_cube(df, verbose=True, time_index=None):
+    """
+    Aggregate the cleaned rows once into additive moments (sum, count, sum of
+    squares) per Date x Product x Region cell. Every per-date, per-product,
+    per-region or per-month summary is a roll-up of these cells.
+    Args: df (pandas.DataFrame): Cleaned data
+          verbose (bool): Print the cube size
+          time_index (dict): Time index of df (see time_index.build_time_index); built
+                             here when the dates are sorted, so Date needs no hashing
+    Returns: pandas.DataFrame: One row per observed cell, columns '<measure>_<moment>'
+                               plus 'rows' (fact rows per cell) and, for data with
+                               an IsHoliday flag, 'holiday_rows'
+    """
+    start_time = time.time()
+    dimensions = [col for col in CUBE_DIMENSIONS if col in df.columns]
+    measures = [col for col in CUBE_MEASURES if col in df.columns]
+    
+    # Additive columns, summed in a single pass over the dimension codes
+    columns = {'rows': np.ones(len(df), dtype=np.int64)}
+    for measure in measures:
+        values = df[measure].to_numpy(dtype=np.float64, na_value=np.nan)
+        observed = ~np.isnan(values)
+        values = np.where(observed, values, 0)
+        columns[f'{measure}_sum'] = values
+        columns[f'{measure}_count'] = observed.astype(np.int64)
+        columns[f'{measure}_sumsq'] = values * values
+    if 'IsHoliday' in df.columns:
+        # Holiday flags (weekly data) roll up to holiday rows per cell
+        columns['holiday_rows'] = df['IsHoliday'].to_numpy(dtype=np.int64, na_value=0)
+    keys = [df[col] for col in dimensions]
+    if 'Date' in dimensions:
+        if time_index is None and df['Date'].is_monotonic_increasing:
+            time_index = build_time_index(df['Date'])
+        if time_index is not None:
+            keys[0] = (period_codes(time_index, 'date'), time_index['date']['labels'])
+    
+    # Cells with missing keys are kept so roll-ups over other dimensions still count them
+    cube = group_sum(keys, columns, names=dimensions, dropna=False)
+    
+    if verbose:
+        print(f"🧊 Aggregate cube: {len(df):,} rows -> {len(cube):,} cells "
+              f"({', '.join(dimensions)}) in {time.time() - start_time:.2f}s")
+    return cube
+
+def cube_columns(cube):
+    """
+    Columns of the source data the cube can answer for: its dimensions, the
+    calendar parts derived from Date, and its measures
+    Args: cube (pandas.DataFrame): Output of build_cube
+    Returns: set: Column names
+    """
+    columns = set(cube.index.names)
+    if 'Date' in columns:
+        columns.update(['Year', 'Month', 'Quarter'])
+    columns.update(m for m in CUBE_MEASURES if f'{m}_sum' in cube.columns)
+    return columns
+
+def sketch_row_statistics(sketches, histogram_col='Sales', bins=HISTOGRAM_BINS):
+    """
+    row_statistics from merged measure sketches (see sketches.measure_sketch): exact
+    count/mean/std/min/max, quartiles within sketches.QUANTILE_ACCURACY, approximate histogram
+    Args: sketches (dict): Measure -> merged measure sketch
+          histogram_col (str): Measure to bin
+          bins (int): Number of equal-width bins
+    Returns: dict: As row_statistics, with '25%', '50%' and '75%' in 'describe'
+    """
+    describe = {measure: describe_sketch(sketch) for measure, sketch in sketches.items()}
+    histogram = None
+    if histogram_col in sketches:
+        counts, edges = sketch_histogram(sketches[histogram_col]['quantiles'], bins)
+        histogram = {'counts': counts, 'edges': edges}
+    return {'describe': describe, 'histogram': histogram}
+
+def row_statistics(df, histogram_col='Sales', bins=HISTOGRAM_BINS, approx=False):
+    """
+    Row-level statistics that are not roll-ups of the cube: describe() figures
+    per measure and a histogram of one measure
+    Args: df (pandas.DataFrame): Cleaned data
+          histogram_col (str): Measure to bin
+          bins (int): Number of equal-width bins
+          approx (bool): Sketch partitions of PARTITION_ROWS rows and merge them
+                         (see sketch_row_statistics) instead of exact full passes
+    Returns: dict: 'describe' (measure -> count/mean/std/min/max) and
+                   'histogram' ('counts' and 'edges', or None)
+    """
+    if approx:
+        sketches = {}
+        for measure in CUBE_MEASURES:
+            if measure in df.columns:
+                for start in range(0, len(df), PARTITION_ROWS):
+                    partition = measure_sketch(df[measure].iloc[start:start + PARTITION_ROWS])
+                    sketches[measure] = merge_measure_sketches(sketches.get(measure), partition)
+        return sketch_row_statistics(sketches, histogram_col, bins)
+    
+    describe = {}
+    for measure in CUBE_MEASURES:
+        if measure in df.columns:
+            stats = df[measure].describe()
+            describe[measure] = {key: float(stats[key]) for key in ('count', 'mean', 'std', 'min', 'max')}
+    histogram = None
+    if histogram_col in df.columns:
+        counts, edges = np.histogram(df[histogram_col].dropna(), bins=bins)
+        histogram = {'counts': counts, 'edges': edges}
+    return {'describe': describe, 'histogram': histogram}
+
+def roll_up(cube, dimensions):
+    """
+    Sum the cube cells over every dimension not listed
+    Args: cube (pandas.DataFrame): Output of build_cube
+          dimensions (list): Dimensions to keep (empty for a grand total)
+    Returns: pandas.DataFrame or pandas.Series: Additive columns per remaining cell
+    """
+    if not dimensions:
+        return cube.sum()
+    index = cube.index
+    if isinstance(index, pd.MultiIndex):
+        positions = [index.names.index(dim) for dim in dimensions]
+        keys = [(index.codes[i], index.levels[i]) for i in positions]
+        ordered = all(index.levels[i].is_monotonic_increasing for i in positions)
+    else:
+        keys, ordered = [index], True
+    result = group_sum(keys, {col: cube[col].to_numpy() for col in cube.columns}, names=list(dimensions))
+    # Merged cubes can carry unsorted levels, while group-bys order cells by label
+    return result if ordered else result.sort_index()
+
+def measure_totals(cube, dimensions, measure='Sales'):
+    """
+    Sum of a measure per cell of the given dimensions
+    Args: cube (pandas.DataFrame): Output of build_cube
+          dimensions (list): Dimensions to keep
+          measure (str): Measure column
+    Returns: pandas.Series: Totals indexed by the dimensions
+    """
+    return roll_up(cube, dimensions)[f'{measure}_sum'].rename(measure)
+
+def measure_moments(cube, dimensions, measure='Revenue'):
+    """
+    Sum/count/sum-of-squares of a measure per cell of the given dimensions
+    (the input of revenue_analysis.summary_from_moments)
+    Args: cube (pandas.DataFrame): Output of build_cube
+          dimensions (list): Dimensions to keep
+          measure (str): Measure column
+    Returns: pandas.DataFrame: Columns 'sum', 'count' and 'sumsq'
+    """
+    moments = roll_up(cube, dimensions)[[f'{measure}_{m}' for m in MOMENTS]]
+    moments.columns = MOMENTS
+    return moments
+
+def monthly_means(cube, measure='Sales'):
+    """
+    Average row value of a measure per calendar month, rolled up from the Date cells
+    Args: cube (pandas.DataFrame): Output of build_cube
+          measure (str): Measure column
+    Returns: pandas.Series: Means indexed by month number (1-12)
+    """
+    by_date = roll_up(cube, ['Date'])
+    by_month = by_date.groupby(by_date.index.month).sum()
+    means = by_month[f'{measure}_sum'] / by_month[f'{measure}_count']
+    return means.rename_axis('Month').rename(measure)
+
+if __name__ == "__main__":
+    from data_loader import create_sample_data
+    from data_cleaner import clean_data
+    cleaned_df = clean_data(create_sample_data())
+    cube = build_cube(cleaned_df)
+    print(cube.head())
+    print(measure_totals(cube, ['Product']))
+    print(monthly_means(cube))
\ No newline at end of file
@@ -0,0 +1,292 @@
+# Outlier and level-shift detection over every series of the sales hierarchy
+
+import os
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from batch_forecasting import _fill_gaps, _shared, map_row_chunks, series_matrix
+from frequency import infer_frequency, season_length, window_periods
+from hierarchy import HIERARCHIES, aggregate_history, build_hierarchy, sales_series_matrix
+
+MAD_SCALE = 1.4826          # MAD -> standard deviation of normal data
+MEAN_AD_SCALE = 1.2533      # Mean absolute deviation -> standard deviation (when the MAD is 0)
+OUTLIER_THRESHOLD = 3.5     # Robust z-score beyond which a period is an outlier (Iglewicz-Hoaglin)
+SHIFT_THRESHOLD = 5.0       # Standardised difference of the window means around a level shift
+PARALLEL_SERIES = 2048      # Series count from which the scan uses every core by default
+MIN_BASELINE = 12           # Fewest periods in the rolling baseline (shorter ones flag too much)
+MIN_SEASONS = 2             # Full seasonal cycles needed before the seasonal adjustment
+
+# Severity is |Score| over the threshold of the finding's type, so outliers and
+# level shifts rank on one scale
+FINDING_COLUMNS = ['Type', 'Level', 'Series', 'Date', 'Value', 'Expected', 'Score', 'Severity', 'Change_%']
+NUMERIC_COLUMNS = ['Value', 'Expected', 'Score', 'Severity', 'Change_%']
+
+def seasonal_profile(values, season):
+    """
+    Additive seasonal profile per series, leave one cycle out: each period gets the
+    median of its season position over the other years, centred on zero, so a value
+    is never adjusted by itself (zero when the series spans less than MIN_SEASONS
+    full seasons)
+    Args: values (numpy.ndarray): (series x period) matrix, gap-free
+          season (int): Periods per seasonal cycle
+    Returns: numpy.ndarray: (series x period) seasonal component
+    """
+    n_series, n_periods = values.shape
+    if n_periods < MIN_SEASONS * season:
+        return np.zeros_like(values)
+    n_years = -(-n_periods // season)
+    padded = np.full((n_series, n_years * season), np.nan)
+    padded[:, :n_periods] = values
+    cycles = padded.reshape(n_series, n_years, season)
+    profile = np.empty_like(cycles)
+    with warnings.catch_warnings():
+        # Season positions never observed give all-NaN slices
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for year in range(n_years):
+            others = np.nanmedian(np.delete(cycles, year, axis=1), axis=1)
+            profile[:, year] = others - np.nanmedian(others, axis=1, keepdims=True)
+    return np.nan_to_num(profile.reshape(n_series, n_years * season)[:, :n_periods])
+
+def difference_noise(values):
+    """
+    Noise level of every series from the MAD of its first differences, which level
+    shifts and slow trends barely move
+    Args: values (numpy.ndarray): (series x period) matrix, gap-free
+    Returns: numpy.ndarray: Standard deviation estimate per series
+    """
+    return MAD_SCALE * np.median(np.abs(np.diff(values, axis=1)), axis=1) / np.sqrt(2)
+
+def rolling_baseline(values, window):
+    """
+    Trailing robust baseline of every period: median of the previous window periods
+    and their spread (MAD, or the mean absolute deviation when the MAD is 0), as
+    one sliding-window kernel over all series
+    Args: values (numpy.ndarray): (series x period) matrix, gap-free
+          window (int): Periods in the baseline
+    Returns: tuple: (median, scale) (series x period), NaN for the first window periods
+    """
+    n_series, n_periods = values.shape
+    median = np.full((n_series, n_periods), np.nan)
+    scale = np.full((n_series, n_periods), np.nan)
+    if n_periods > window:
+        # Window j covers periods j .. j + window - 1, the baseline of period j + window
+        windows = sliding_window_view(values[:, :-1], window, axis=1)
+        center = np.median(windows, axis=-1)
+        deviation = np.abs(windows - center[..., None])
+        mad = np.median(deviation, axis=-1) * MAD_SCALE
+        mean_ad = deviation.mean(axis=-1) * MEAN_AD_SCALE
+        median[:, window:] = center
+        scale[:, window:] = np.where(mad > 0, mad, mean_ad)
+    return median, scale
+
+def level_shift_scores(values, window):
+    """
+    Level-shift statistic of every period: the mean of the next window periods minus
+    the mean of the previous window periods, in units of its standard error. The
+    noise level comes from the MAD of the first differences, which a level shift
+    barely moves. Window sums are prefix-sum differences.
+    Args: values (numpy.ndarray): (series x period) matrix, gap-free
+          window (int): Periods on each side of a candidate change point
+    Returns: tuple: (score, mean before, mean after) (series x period), NaN where
+                    a full window is missing on either side
+    """
+    n_series, n_periods = values.shape
+    score, before, after = (np.full((n_series, n_periods), np.nan) for _ in range(3))
+    if n_periods < 2 * window:
+        return score, before, after
+    prefix = np.concatenate([np.zeros((n_series, 1)), np.cumsum(values, axis=1)], axis=1)
+    t = np.arange(window, n_periods - window + 1)
+    before[:, t] = (prefix[:, t] - prefix[:, t - window]) / window
+    after[:, t] = (prefix[:, t + window] - prefix[:, t]) / window
+    noise = difference_noise(values)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score = (after - before) / (noise[:, None] * np.sqrt(2 / window))
+    score[~np.isfinite(score)] = np.nan
+    return score, before, after
+
+def scan_series(values, window, shift_window, season=None, threshold=OUTLIER_THRESHOLD):
+    """
+    Outlier and level-shift scores of many series. Series are seasonally adjusted
+    first (when they span MIN_SEASONS seasons), the baseline spread is floored at the
+    series' first-difference noise so a quiet window does not inflate the scores, and
+    outliers are pulled back to their baseline before the level-shift scan so a
+    single spike does not read as a shift.
+    Args: values (numpy.ndarray): (series x period) matrix, NaN for missing periods
+          window (int): Periods in the rolling baseline
+          shift_window (int): Periods on each side of a candidate level shift
+          season (int): Periods per seasonal cycle (None skips the adjustment)
+          threshold (float): Outlier threshold used for the clean-up
+    Returns: dict: (series x period) 'outlier' scores, 'expected' values, 'shift'
+                   scores and the window means 'before' and 'after'
+    """
+    filled = _fill_gaps(values)
+    seasonal = seasonal_profile(filled, season) if season else np.zeros_like(filled)
+    adjusted = filled - seasonal
+    median, scale = rolling_baseline(adjusted, window)
+    scale = np.fmax(scale, difference_noise(adjusted)[:, None])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        outlier = (adjusted - median) / scale
+    outlier[~np.isfinite(outlier) | np.isnan(values)] = np.nan
+
+    cleaned = np.where(np.abs(np.nan_to_num(outlier)) > threshold, median, adjusted)
+    shift, before, after = level_shift_scores(np.nan_to_num(cleaned), shift_window)
+    shift[np.isnan(filled)] = np.nan
+    return {'outlier': outlier, 'expected': median + seasonal, 'shift': shift,
+            'before': before, 'after': after}
+
+def _scan_rows(start, stop, window, shift_window, season, threshold):
+    """Pool task: scan rows [start, stop) of the shared series matrix"""
+    return scan_series(_shared['values'][start:stop], window, shift_window, season, threshold)
+
+def local_peaks(score, window, threshold):
+    """
+    Periods whose |score| passes the threshold and is the largest within window
+    periods on either side (one change point per shift)
+    Args: score (numpy.ndarray): (series x period) scores, NaN where undefined
+          window (int): Half-width of the neighbourhood
+          threshold (float): Minimum |score|
+    Returns: numpy.ndarray: Boolean (series x period) mask
+    """
+    strength = np.nan_to_num(np.abs(score))
+    padded = np.pad(strength, ((0, 0), (window, window)))
+    neighbourhood = sliding_window_view(padded, 2 * window + 1, axis=1).max(axis=-1)
+    return (strength >= threshold) & (strength == neighbourhood)
+
+def series_labels(keys):
+    """Readable name of each node, e.g. 'Product=Electronics, Region=East' ('Total' for the top)"""
+    columns = [col for col in keys.columns if col != 'Level']
+    labels = []
+    for row in keys[columns].itertuples(index=False):
+        # Integer keys come back as floats once levels with missing keys are concatenated
+        parts = [f'{col}={int(value) if isinstance(value, float) and value.is_integer() else value}'
+                 for col, value in zip(columns, row) if not pd.isna(value)]
+        labels.append(', '.join(parts) or 'Total')
+    return np.array(labels, dtype=object)
+
+def find_anomalies(values, keys, dates, window=None, shift_window=None, workers=1, chunk_size=256,
+                   outlier_threshold=OUTLIER_THRESHOLD, shift_threshold=SHIFT_THRESHOLD):
+    """
+    Outliers against a rolling median/MAD baseline and level shifts of every series,
+    scanned in row chunks over a process pool
+    Args: values (numpy.ndarray): (series x period) matrix, NaN for missing periods
+          keys (pandas.DataFrame): 'Level' and key columns, one row per series
+          dates (pandas.DatetimeIndex): Periods of the matrix
+          window (int): Periods in the rolling baseline (default: 12 months, at least
+                        MIN_BASELINE periods)
+          shift_window (int): Periods on each side of a level shift (default: 3 months)
+          workers (int): Worker processes (1 runs in-process)
+          chunk_size (int): Series per task
+          outlier_threshold (float): Robust z-score of an outlier
+          shift_threshold (float): Standardised mean difference of a level shift
+    Returns: pandas.DataFrame: FINDING_COLUMNS, most severe first
+    """
+    frequency = infer_frequency(dates)
+    window = window or max(window_periods(12, frequency), MIN_BASELINE)
+    shift_window = shift_window or window_periods(3, frequency)
+    season = season_length(frequency)
+
+    blocks = map_row_chunks(_scan_rows, {'values': values}, len(values),
+                            (window, shift_window, season, outlier_threshold),
+                            workers=workers, chunk_size=chunk_size)
+    scans = {name: np.concatenate([block[name] for block in blocks]) if blocks else np.empty((0, len(dates)))
+             for name in ('outlier', 'expected', 'shift', 'before', 'after')}
+
+    labels = series_labels(keys)
+    levels = keys['Level'].to_numpy()
+    rows, periods = np.nonzero(np.abs(np.nan_to_num(scans['outlier'])) > outlier_threshold)
+    expected = scans['expected'][rows, periods]
+    outliers = pd.DataFrame({
+        'Type': 'Outlier', 'Level': levels[rows], 'Series': labels[rows], 'Date': dates[periods],
+        'Value': values[rows, periods], 'Expected': expected, 'Score': scans['outlier'][rows, periods]
+    })
+    outliers['Severity'] = outliers['Score'].abs() / outlier_threshold
+    rows, periods = np.nonzero(local_peaks(scans['shift'], shift_window, shift_threshold))
+    before, after = scans['before'][rows, periods], scans['after'][rows, periods]
+    shifts = pd.DataFrame({
+        'Type': 'Level shift', 'Level': levels[rows], 'Series': labels[rows], 'Date': dates[periods],
+        'Value': after, 'Expected': before, 'Score': scans['shift'][rows, periods]
+    })
+    shifts['Severity'] = shifts['Score'].abs() / shift_threshold
+    findings = pd.concat([outliers, shifts], ignore_index=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        findings['Change_%'] = (findings['Value'] - findings['Expected']) / findings['Expected'].abs() * 100
+    order = np.argsort(-findings['Severity'].to_numpy(), kind='stable')
+    return findings.take(order).reset_index(drop=True)[FINDING_COLUMNS]
+
+def anomaly_series(df, cube=None, value='Sales'):
+    """
+    Every series to scan: the total, each Product, Region and Product x Region
+    (from the cube) and, when the data has them, each Store and Store x Dept
+    Args: df (pandas.DataFrame): Cleaned data (None when only the cube is available)
+          cube (pandas.DataFrame): Aggregate cube of df (see aggregate_cube.build_cube)
+          value (str): Measure to scan
+    Returns: tuple: (values (series x period), keys with a 'Level' column, dates)
+    """
+    matrices = []
+    if cube is not None or (df is not None and {'Product', 'Region'} <= set(df.columns)):
+        bottom, series_keys, dates = sales_series_matrix(df, cube, value)
+        matrices.append((bottom, series_keys, dates, HIERARCHIES['sales']))
+    if df is not None and {'Store', 'Dept'} <= set(df.columns):
+        bottom, series_keys, dates = series_matrix(df, ('Store', 'Dept'), value)
+        # The total is already covered by the sales hierarchy
+        levels = HIERARCHIES['walmart'][1:] if matrices else HIERARCHIES['walmart']
+        matrices.append((bottom, series_keys, dates, levels))
+    if not matrices:
+        raise ValueError("No series to scan: the data needs Product/Region or Store/Dept columns")
+
+    dates = matrices[0][2]
+    for _, _, other, _ in matrices[1:]:
+        dates = dates.union(other)
+    values, keys = [], []
+    for bottom, series_keys, own_dates, levels in matrices:
+        hierarchy = build_hierarchy(series_keys, levels)
+        history = aggregate_history(hierarchy, bottom)
+        aligned = np.full((len(history), len(dates)), np.nan)
+        aligned[:, dates.get_indexer(own_dates)] = history
+        values.append(aligned)
+        keys.append(hierarchy['keys'])
+    return np.concatenate(values), pd.concat(keys, ignore_index=True), dates
+
+def detect_anomalies(df, cube=None, value='Sales', workers=None, **options):
+    """
+    Pipeline stage: scan every series for outliers and level shifts
+    Args: df (pandas.DataFrame): Cleaned data (None when cube is given)
+          cube (pandas.DataFrame): Aggregate cube of df (see aggregate_cube.build_cube)
+          value (str): Measure to scan
+          workers (int): Worker processes (default: all cores from PARALLEL_SERIES series)
+          options: window, shift_window, chunk_size and thresholds of find_anomalies
+    Returns: pandas.DataFrame: Output of find_anomalies
+    """
+    print("\n" + "="*50)
+    print("🚨 ANOMALY AND LEVEL-SHIFT DETECTION")
+    print("="*50)
+
+    start_time = time.time()
+    values, keys, dates = anomaly_series(df, cube, value)
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(values) >= PARALLEL_SERIES else 1
+    findings = find_anomalies(values, keys, dates, workers=workers, **options)
+
+    print(f"🔎 Scanned {len(values):,} series x {len(dates)} periods in {time.time() - start_time:.2f}s "
+          f"({workers} worker{'s' if workers > 1 else ''})")
+    if len(findings):
+        print(findings.groupby(['Level', 'Type'], sort=False).size().unstack(fill_value=0))
+    print(f"✅ {(findings['Type'] == 'Outlier').sum():,} outliers, "
+          f"{(findings['Type'] == 'Level shift').sum():,} level shifts")
+    return findings
+
+if __name__ == "__main__":
+    import sys
+    workers = int(sys.argv[sys.argv.index('--workers') + 1]) if '--workers' in sys.argv else None
+    if '--walmart' in sys.argv:
+        from walmart_data import load_walmart_dataset
+        dataset = load_walmart_dataset().rename(columns={'Weekly_Sales': 'Sales'})
+        findings = detect_anomalies(dataset, workers=workers)
+    else:
+        from data_loader import create_sample_data
+        from data_cleaner import clean_data
+        findings = detect_anomalies(clean_data(create_sample_data()), workers=workers)
+    print(findings.head(20).round({col: 2 for col in NUMERIC_COLUMNS}))
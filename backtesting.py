@@ -0,0 +1,222 @@
+# Rolling-origin backtesting of the forecasting methods
+
+import time
+import numpy as np
+import pandas as pd
+
+from batch_forecasting import _fill_gaps, _shared, map_row_chunks, series_matrix
+from forecasting import exponential_smoothing_matrix
+from holt_winters import fit_holt_winters, forecast_from_state, holt_winters_filter
+
+BACKTEST_METHODS = ['Rolling Mean', 'Exponential Smoothing', 'Seasonal Naive', 'Holt-Winters']
+METRICS = ['MAE', 'RMSE', 'MAPE', 'WAPE', 'WMAE']
+HOLIDAY_WEIGHT = 5  # Holiday weeks count five times in WMAE
+
+# Additive error statistics per method and fold; chunks are merged by summation
+STATS = ['n', 'abs_error', 'sq_error', 'ape', 'n_ape', 'abs_actual', 'weighted_abs_error', 'weight']
+
+def rolling_origin_cutoffs(n_periods, horizon, n_folds=4, step=None, min_train=1):
+    """
+    Training lengths for rolling-origin folds, ending with the latest full horizon
+    Args: n_periods (int): Length of the history
+          horizon (int): Periods forecast per fold
+          n_folds (int): Number of folds
+          step (int): Periods between consecutive cutoffs (default: horizon)
+          min_train (int): Shortest allowed training window
+    Returns: list: Observation counts at each cutoff, oldest first
+    """
+    step = step or horizon
+    last = n_periods - horizon
+    cutoffs = [last - i * step for i in range(n_folds)]
+    return sorted(c for c in cutoffs if c >= min_train)
+
+def prefix_statistics(values, alpha=0.3):
+    """
+    Statistics computed once per series and reused by every fold: prefix sums and
+    counts for rolling means, and the exponential smoothing level at every period
+    Args: values (numpy.ndarray): (series x period) matrix, NaN for missing periods
+          alpha (float): Smoothing parameter (0-1)
+    Returns: dict: 'filled', 'cumsum', 'cumcount' (series x period+1) and 'smoothed'
+    """
+    observed = ~np.isnan(values)
+    zeros = np.zeros((values.shape[0], 1))
+    filled = _fill_gaps(values)
+    return {
+        'filled': filled,
+        'cumsum': np.hstack([zeros, np.cumsum(np.where(observed, values, 0), axis=1)]),
+        'cumcount': np.hstack([zeros, np.cumsum(observed, axis=1)]),
+        'smoothed': exponential_smoothing_matrix(filled, alpha)
+    }
+
+def fold_forecasts(values, stats, cutoff, horizon, window=52, season_length=52, hw_snapshot=None,
+                   hw_multiplicative=None):
+    """
+    Forecasts of every method from the first cutoff periods, read off the prefix statistics
+    Args: values (numpy.ndarray): (series x period) matrix, NaN for missing periods
+          stats (dict): Output of prefix_statistics
+          cutoff (int): Number of training periods
+          horizon (int): Periods to forecast
+          window (int): Rolling mean window
+          season_length (int): Seasonal lag
+          hw_snapshot (dict): Holt-Winters states after cutoff periods (optional)
+          hw_multiplicative (numpy.ndarray): Holt-Winters seasonality flags
+    Returns: dict: Method name -> (series x horizon) forecasts (NaN without history)
+    """
+    n_series = values.shape[0]
+    start = max(cutoff - window, 0)
+    count = stats['cumcount'][:, cutoff] - stats['cumcount'][:, start]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rolling = (stats['cumsum'][:, cutoff] - stats['cumsum'][:, start]) / count
+    has_history = stats['cumcount'][:, cutoff] > 0
+    
+    level = np.where(has_history, stats['smoothed'][:, cutoff - 1], np.nan)
+    
+    seasonal = np.full((n_series, horizon), np.nan)
+    if cutoff >= season_length:
+        lags = cutoff - season_length + np.arange(horizon) % season_length
+        seasonal = values[:, lags]
+    seasonal = np.where(np.isnan(seasonal), rolling[:, None], seasonal)
+    
+    holt_winters = np.full((n_series, horizon), np.nan)
+    if hw_snapshot is not None:
+        holt_winters = forecast_from_state(hw_snapshot['level'][0], hw_snapshot['trend'][0],
+                                           hw_snapshot['season'][0], hw_multiplicative, cutoff, horizon)
+    
+    return {
+        'Rolling Mean': np.repeat(rolling[:, None], horizon, axis=1),
+        'Exponential Smoothing': np.repeat(level[:, None], horizon, axis=1),
+        'Seasonal Naive': seasonal,
+        'Holt-Winters': holt_winters
+    }
+
+def error_statistics(forecast, actual, weights):
+    """
+    Additive error statistics for one block of forecasts
+    Args: forecast, actual, weights (numpy.ndarray): Aligned (series x horizon) arrays
+    Returns: numpy.ndarray: Values in STATS order
+    """
+    valid = ~np.isnan(forecast) & ~np.isnan(actual)
+    error = np.abs(np.where(valid, forecast - actual, 0))
+    actual = np.where(valid, actual, 0)
+    nonzero = valid & (actual != 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ape = np.where(nonzero, error / np.abs(actual), 0)
+    weights = np.where(valid, weights, 0)
+    return np.array([valid.sum(), error.sum(), (error ** 2).sum(), ape.sum(), nonzero.sum(),
+                     np.abs(actual).sum(), (weights * error).sum(), weights.sum()])
+
+def _backtest_rows(start, stop, cutoffs, horizon, window, alpha, season_length):
+    """Pool task: error statistics (method x fold x stat) for rows [start, stop)"""
+    values = _shared['values'][start:stop]
+    weights = _shared['weights'][start:stop]
+    stats = prefix_statistics(values, alpha)
+    
+    # Holt-Winters: fit once on the first training window, then one filter pass
+    # snapshots the states at every cutoff instead of refitting per fold
+    # (series with gaps in that window get NaN states and are left out)
+    snapshots, multiplicative = {}, np.zeros(len(values), dtype=bool)
+    first = cutoffs[0]
+    fittable = ~np.isnan(values[:, :first]).any(axis=1)
+    if first >= 2 * season_length and fittable.any():
+        model = fit_holt_winters(stats['filled'][fittable, :first], season_length)
+        multiplicative[fittable] = model['multiplicative']
+        fitted = holt_winters_filter(stats['filled'][fittable], season_length, model['alpha'][None, :],
+                                     model['beta'][None, :], model['gamma'][None, :],
+                                     model['multiplicative'], checkpoints=cutoffs)['checkpoints']
+        for cutoff, state in fitted.items():
+            snapshots[cutoff] = {}
+            for name, array in state.items():
+                full = np.full((1, len(values)) + array.shape[2:], np.nan)
+                full[:, fittable] = array
+                snapshots[cutoff][name] = full
+    
+    result = np.zeros((len(BACKTEST_METHODS), len(cutoffs), len(STATS)))
+    for fold, cutoff in enumerate(cutoffs):
+        forecasts = fold_forecasts(values, stats, cutoff, horizon, window, season_length,
+                                   snapshots.get(cutoff), multiplicative)
+        actual = values[:, cutoff:cutoff + horizon]
+        fold_weights = weights[:, cutoff:cutoff + horizon]
+        for m, method in enumerate(BACKTEST_METHODS):
+            result[m, fold] = error_statistics(forecasts[method], actual, fold_weights)
+    return result
+
+def metrics_from_statistics(stats):
+    """
+    Turn summed error statistics into MAE/RMSE/MAPE/WAPE/WMAE
+    Args: stats (numpy.ndarray): (..., len(STATS)) array
+    Returns: dict: Metric name -> array
+    """
+    s = {name: stats[..., i] for i, name in enumerate(STATS)}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'MAE': s['abs_error'] / s['n'],
+            'RMSE': np.sqrt(s['sq_error'] / s['n']),
+            'MAPE': s['ape'] / s['n_ape'] * 100,
+            'WAPE': s['abs_error'] / s['abs_actual'] * 100,
+            'WMAE': s['weighted_abs_error'] / s['weight']
+        }
+
+def backtest(dataset, horizon=13, n_folds=4, step=None, workers=1, chunk_size=256,
+             window=52, alpha=0.3, season_length=52, keys=('Store', 'Dept'),
+             value_col='Weekly_Sales', holiday_col='IsHoliday'):
+    """
+    Rolling-origin cross-validation of every method over every series
+    Args: dataset (pandas.DataFrame): Long-format rows (e.g. walmart_data.load_walmart_dataset)
+          horizon (int): Periods forecast per fold
+          n_folds (int): Number of cutoffs
+          step (int): Periods between cutoffs (default: horizon)
+          workers (int): Worker processes evaluating series partitions (1 runs in-process)
+          chunk_size (int): Series per task
+          window (int): Rolling mean window
+          alpha (float): Exponential smoothing parameter
+          season_length (int): Seasonal period
+          keys (tuple): Columns identifying a series
+          value_col (str): Column holding the observations
+          holiday_col (str): Boolean holiday flag used for WMAE weights
+    Returns: pandas.DataFrame: Metrics per method and cutoff, plus 'All' rows per method
+    """
+    print("\n" + "="*50)
+    print("🧪 ROLLING-ORIGIN BACKTEST")
+    print("="*50)
+    
+    start_time = time.time()
+    values, series_keys, dates = series_matrix(dataset, keys, value_col)
+    if holiday_col in dataset.columns:
+        holidays, _, _ = series_matrix(dataset, keys, holiday_col)
+        weights = np.where(holidays == 1, HOLIDAY_WEIGHT, 1.0)
+    else:
+        weights = np.ones_like(values)
+    
+    cutoffs = rolling_origin_cutoffs(values.shape[1], horizon, n_folds, step)
+    if not cutoffs:
+        raise ValueError(f"History of {values.shape[1]} periods is too short for horizon {horizon}")
+    print(f"📦 {len(series_keys):,} series, {len(cutoffs)} folds of {horizon} periods, {workers} workers")
+    
+    chunks = map_row_chunks(_backtest_rows, {'values': values, 'weights': weights}, len(series_keys),
+                            (cutoffs, horizon, window, alpha, season_length),
+                            workers=workers, chunk_size=chunk_size)
+    stats = np.sum(chunks, axis=0)
+    
+    rows = []
+    cutoff_labels = [dates[c - 1] for c in cutoffs] + ['All']
+    per_fold = metrics_from_statistics(stats)
+    overall = metrics_from_statistics(stats.sum(axis=1))
+    for m, method in enumerate(BACKTEST_METHODS):
+        for f, label in enumerate(cutoff_labels):
+            source = overall if label == 'All' else per_fold
+            index = (m,) if label == 'All' else (m, f)
+            count = stats[m].sum(axis=0)[0] if label == 'All' else stats[m, f, 0]
+            rows.append(dict({'Method': method, 'Cutoff': label, 'N': int(count)},
+                             **{metric: source[metric][index] for metric in METRICS}))
+    metrics = pd.DataFrame(rows)
+    
+    print(f"✅ Backtest finished in {time.time() - start_time:.2f}s")
+    print("\n📊 BACKTEST ACCURACY (all folds):")
+    print(metrics[metrics['Cutoff'] == 'All'].set_index('Method')[METRICS].round(2))
+    return metrics
+
+if __name__ == "__main__":
+    from walmart_data import load_walmart_dataset
+    train = load_walmart_dataset()
+    metrics = backtest(train, horizon=13, n_folds=3, workers=2)
+    print(metrics.round(2))
\ No newline at end of file
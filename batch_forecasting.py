@@ -0,0 +1,326 @@
+# Batch forecasting across Store x Dept series
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+from dimensions import dimension_codes, group_codes
+from frequency import future_dates, infer_frequency
+from forecasting import exponential_smoothing_matrix, method_column
+from holt_winters import fit_holt_winters, forecast_from_state
+
+FORECAST_METHODS = ['Rolling_Mean_Forecast', 'Exponential_Smoothing_Forecast', 'Seasonal_Naive_Forecast',
+                    'Holt_Winters_Forecast']
+
+# Per-series parameter columns accepted from tuning.tune_parameters
+TUNED_COLUMNS = ['window', 'alpha', 'season_lag']
+
+# Worker-side view of the shared series matrix (set by _attach_shared)
+_shared = {}
+
+def series_matrix(dataset, keys=('Store', 'Dept'), value_col='Weekly_Sales'):
+    """
+    Lay out long-format rows as a dense (series x period) matrix
+    Args: dataset (pandas.DataFrame): Rows with key columns, 'Date' and value_col
+          keys (tuple): Columns identifying a series
+          value_col (str): Column holding the observations
+    Returns: tuple: (matrix float64 with NaN for missing periods,
+                     pandas.DataFrame of series keys, pandas.DatetimeIndex of periods)
+    """
+    keys = list(keys)
+    # Series in key order, numbered from the keys' integer codes (rows with a missing key are dropped)
+    series_codes, kept, series_index = group_codes([dataset[key] for key in keys], names=keys)
+    date_codes, dates = dimension_codes(dataset['Date'])
+    values = dataset[value_col].to_numpy(dtype=np.float64)
+    if kept is not None:
+        date_codes, values = date_codes[kept], values[kept]
+    
+    matrix = np.full((len(series_index), len(dates)), np.nan)
+    matrix[series_codes, date_codes] = values
+    
+    series_keys = series_index.to_frame(index=False)
+    return matrix, series_keys, pd.DatetimeIndex(dates)
+
+def _fill_gaps(values):
+    """
+    Prepare series for smoothing: leading gaps take the first observation and
+    later gaps carry the last observation forward
+    Args: values (numpy.ndarray): (series x period) matrix with NaN gaps
+    Returns: numpy.ndarray: Gap-free copy (all-NaN rows stay NaN)
+    """
+    observed = ~np.isnan(values)
+    last_seen = np.where(observed, np.arange(values.shape[1]), -1)
+    np.maximum.accumulate(last_seen, axis=1, out=last_seen)
+    first_seen = observed.argmax(axis=1)
+    last_seen = np.where(last_seen < 0, first_seen[:, None], last_seen)
+    return np.take_along_axis(values, last_seen, axis=1)
+
+def fit_forecast_state(values, window=52, alpha=0.3, season_length=52, season_lag=None):
+    """
+    Everything the forecasts of many series depend on, computed once: rolling mean,
+    smoothing level, the last season of observations and fitted Holt-Winters states.
+    Forecasts of any horizon are then read off with forecast_from_fitted.
+    Args: values (numpy.ndarray): (series x period) matrix, NaN for missing periods
+          window (int or numpy.ndarray): Rolling mean window, or one per series
+          alpha (float or numpy.ndarray): Smoothing parameter (0-1), or one per series
+          season_length (int): Seasonal period of Holt-Winters
+          season_lag (int or numpy.ndarray): Seasonal lag for the naive forecast, or one
+                                             per series (default: season_length)
+    Returns: dict: Per-series 'rolling', 'level', 'season_lag', 'recent' (last periods)
+                   and Holt-Winters 'hw_level', 'hw_trend', 'hw_season', 'hw_multiplicative'
+                   (NaN states for series that could not be fitted), plus 'n_periods'
+    """
+    n_series, n_periods = values.shape
+    season_lag = season_length if season_lag is None else season_lag
+    
+    # Method 1: Rolling Mean Forecast over the last window periods
+    if np.ndim(window) == 0:
+        recent = values[:, -window:]
+    else:
+        # Per-series windows (e.g. tuning.tune_parameters): mask the older periods
+        in_window = np.arange(n_periods) >= n_periods - np.asarray(window)[:, None]
+        recent = np.where(in_window, values, np.nan)
+    with np.errstate(invalid='ignore'):
+        with_data = (~np.isnan(recent)).sum(axis=1)
+        window_sum = np.nansum(recent, axis=1)
+        rolling = np.where(with_data > 0, window_sum / np.maximum(with_data, 1), np.nan)
+    
+    # Method 2: Simple Exponential Smoothing, vectorised across series
+    filled = _fill_gaps(values)
+    if np.ndim(alpha) == 0:
+        level = exponential_smoothing_matrix(filled, alpha)[:, -1]
+    else:
+        # One smoothing run per distinct alpha, then each series picks its own
+        alphas, choice = np.unique(alpha, return_inverse=True)
+        level = exponential_smoothing_matrix(filled, alphas)[:, :, -1][choice, np.arange(n_series)]
+    
+    # Method 3: Seasonal Naive reads the last season_lag periods
+    lags = np.broadcast_to(np.asarray(season_lag), (n_series,))
+    longest = int(lags.max()) if n_series else 0
+    last_periods = np.full((n_series, longest), np.nan)
+    kept = min(longest, n_periods)
+    if kept:
+        last_periods[:, longest - kept:] = values[:, n_periods - kept:]
+    
+    # Method 4: Holt-Winters, fitted per series by grid search (needs two full seasons)
+    hw = {'hw_level': np.full(n_series, np.nan), 'hw_trend': np.full(n_series, np.nan),
+          'hw_season': np.full((n_series, season_length), np.nan),
+          'hw_multiplicative': np.zeros(n_series, dtype=bool)}
+    fittable = ~np.isnan(filled).any(axis=1)
+    if n_periods >= 2 * season_length and fittable.any():
+        model = fit_holt_winters(filled[fittable], season_length)
+        for name in ('level', 'trend', 'season', 'multiplicative'):
+            hw[f'hw_{name}'][fittable] = model[name]
+    
+    return dict({'rolling': rolling, 'level': level, 'season_lag': lags, 'recent': last_periods,
+                 'n_periods': n_periods}, **hw)
+
+def forecast_from_fitted(fitted, horizon, rows=None):
+    """
+    Forecasts of every method from a fitted state
+    Args: fitted (dict): Output of fit_forecast_state
+          horizon (int): Periods to forecast
+          rows (numpy.ndarray): Series to forecast (default: all)
+    Returns: dict: Method name -> (series x horizon) forecasts
+    """
+    take = (lambda array: array) if rows is None else (lambda array: array[rows])
+    rolling, level = take(fitted['rolling']), take(fitted['level'])
+    
+    # Same period last season, rolling mean if unobserved
+    recent = take(fitted['recent'])
+    lag = take(fitted['season_lag'])[:, None]
+    index = recent.shape[1] - lag + np.arange(horizon) % lag
+    seasonal = recent[np.arange(len(recent))[:, None], index] if recent.shape[1] else \
+        np.full((len(recent), horizon), np.nan)
+    seasonal = np.where(np.isnan(seasonal), rolling[:, None], seasonal)
+    
+    holt_winters = forecast_from_state(take(fitted['hw_level']), take(fitted['hw_trend']),
+                                       take(fitted['hw_season']), take(fitted['hw_multiplicative']),
+                                       fitted['n_periods'], horizon)
+    return {
+        'Rolling_Mean_Forecast': np.repeat(rolling[:, None], horizon, axis=1),
+        'Exponential_Smoothing_Forecast': np.repeat(level[:, None], horizon, axis=1),
+        'Seasonal_Naive_Forecast': seasonal,
+        'Holt_Winters_Forecast': holt_winters
+    }
+
+def forecast_block(values, horizon, window=52, alpha=0.3, season_length=52, season_lag=None):
+    """
+    Rolling mean, exponential smoothing, seasonal naive and Holt-Winters forecasts
+    for many series at once (the same methods as forecasting.simple_forecasting)
+    Args: values (numpy.ndarray): (series x period) matrix, NaN for missing periods
+          horizon (int): Periods to forecast
+          window, alpha, season_length, season_lag: As in fit_forecast_state
+    Returns: dict: Method name -> (series x horizon) forecasts
+    """
+    return forecast_from_fitted(fit_forecast_state(values, window, alpha, season_length, season_lag), horizon)
+
+def _attach_shared(specs):
+    """Pool initializer: map the shared arrays into this worker"""
+    handles = []
+    for name, (shm_name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        handles.append(shm)
+        _shared[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    _shared['_handles'] = handles
+
+def map_row_chunks(task, arrays, n_rows, args=(), workers=1, chunk_size=256):
+    """
+    Run task(start, stop, *args) over row chunks of arrays placed in shared memory.
+    Workers attach to the arrays once (no DataFrame pickling); tasks read their
+    rows from the module-level _shared mapping and return small results.
+    Args: task (callable): Module-level function of (start, stop, *args)
+          arrays (dict): Name -> numpy.ndarray with rows along the first axis
+          n_rows (int): Number of rows to cover
+          args (tuple): Extra task arguments
+          workers (int): Worker processes (1 runs in-process)
+          chunk_size (int): Rows per task
+    Returns: list: Task results in row order
+    """
+    bounds = [(start, min(start + chunk_size, n_rows)) for start in range(0, n_rows, chunk_size)]
+    
+    if workers == 1:
+        _shared.update(arrays)
+        try:
+            return [task(start, stop, *args) for start, stop in bounds]
+        finally:
+            _shared.clear()
+    
+    blocks = []
+    try:
+        specs = {}
+        for name, array in arrays.items():
+            shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            blocks.append(shm)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+            specs[name] = (shm.name, array.shape, array.dtype.str)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_shared,
+                                 initargs=(specs,)) as pool:
+            tasks = [pool.submit(task, start, stop, *args) for start, stop in bounds]
+            return [task.result() for task in tasks]
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+def _forecast_rows(start, stop, horizon, params):
+    """Pool task: forecast rows [start, stop) of the shared series matrix"""
+    # Per-series parameters travel in shared memory next to the matrix
+    tuned = {name: array[start:stop] for name, array in _shared.items() if name in TUNED_COLUMNS}
+    block = forecast_block(_shared['values'][start:stop], horizon, **params, **tuned)
+    return np.stack([block[method] for method in FORECAST_METHODS], axis=-1)
+
+def batch_forecast(dataset, horizon=39, workers=None, chunk_size=256, freq=None,
+                   keys=('Store', 'Dept'), value_col='Weekly_Sales', target=None, tuned=None, features=None,
+                   **params):
+    """
+    Forecast every series in the dataset over a process pool. The series matrix
+    is placed in shared memory once; workers read row ranges from it and only
+    the small forecast blocks travel back.
+    Args: dataset (pandas.DataFrame): Long-format rows (e.g. walmart_data.load_walmart_dataset)
+          horizon (int): Periods to forecast per series
+          workers (int): Worker processes (default: CPU count, 1 runs in-process)
+          chunk_size (int): Series per task
+          freq (str): pandas alias of the forecast dates (default: inferred from the data)
+          keys (tuple): Columns identifying a series
+          value_col (str): Column holding the observations
+          target (pandas.DataFrame): Optional rows to forecast (e.g. test.csv); sets the
+                                     horizon and restricts the output to those rows
+          tuned (pandas.DataFrame): Per-series parameters from tuning.tune_parameters
+                                    (keys plus window/alpha/season_lag), overriding params;
+                                    its 'method' column adds 'Recommended_Forecast'
+          features (pandas.DataFrame): Store features (walmart_data.read_features); adds
+                                       the exogenous 'Regression_Forecast' column
+          params: window, alpha and season_length passed to forecast_block
+    Returns: pandas.DataFrame: One row per series and forecast date
+    """
+    print("\n" + "="*50)
+    print("🔮 BATCH FORECASTING")
+    print("="*50)
+    
+    start_time = time.time()
+    matrix, series_keys, dates = series_matrix(dataset, keys, value_col)
+    n_series = len(series_keys)
+    if freq is None:
+        frequency = infer_frequency(dates)
+        periods_ahead = lambda n: future_dates(dates[-1], n, frequency, dates)
+    else:
+        periods_ahead = lambda n: pd.date_range(start=dates[-1], periods=n + 1, freq=freq)[1:]
+    if target is not None:
+        # Every period from the last training date up to the last target date, so a test
+        # range that starts later than the next period still lands on its own dates
+        last_target = pd.Timestamp(target['Date'].max())
+        spacing = np.median(np.diff(dates.to_numpy())) if len(dates) > 1 else np.timedelta64(1, 'D')
+        candidates = periods_ahead(max(int((last_target - dates[-1]) / spacing) + 2, 1))
+        horizon = int((candidates <= last_target).sum())
+    workers = workers or os.cpu_count() or 1
+    n_chunks = -(-n_series // chunk_size)
+    
+    print(f"📦 {n_series:,} series x {len(dates)} periods, {n_chunks} chunks, {workers} workers")
+    
+    arrays = {'values': matrix}
+    aligned = None
+    if tuned is not None:
+        # Align the tuned rows with the matrix rows; unknown series keep the defaults
+        aligned = series_keys.merge(tuned, on=list(keys), how='left')
+        defaults = {'window': params.get('window', 52), 'alpha': params.get('alpha', 0.3),
+                    'season_lag': params.get('season_length', 52)}
+        for name in TUNED_COLUMNS:
+            arrays[name] = aligned[name].fillna(defaults[name]).to_numpy()
+        arrays['window'] = arrays['window'].astype(np.int64)
+        arrays['season_lag'] = arrays['season_lag'].astype(np.int64)
+        params = {name: value for name, value in params.items() if name not in TUNED_COLUMNS}
+    
+    blocks = map_row_chunks(_forecast_rows, arrays, n_series, (horizon, params),
+                            workers=workers, chunk_size=chunk_size)
+    forecasts = np.concatenate(blocks)
+    
+    # Tidy table: one row per series and forecast date
+    forecast_dates = periods_ahead(horizon)
+    columns = {method: forecasts[:, :, i] for i, method in enumerate(FORECAST_METHODS)}
+    if features is not None:
+        from exogenous import regression_block
+        columns['Regression_Forecast'] = regression_block(
+            matrix, series_keys['Store'].to_numpy(), dates, features, horizon, workers, chunk_size)
+    if aligned is not None and 'method' in aligned.columns:
+        # Each series' forecast from the method with its lowest backtest error
+        choice = pd.Index(FORECAST_METHODS).get_indexer(aligned['method'].map(method_column, na_action='ignore'))
+        recommended = forecasts[np.arange(n_series), :, np.maximum(choice, 0)]
+        columns['Recommended_Forecast'] = np.where((choice >= 0)[:, None], recommended, np.nan)
+    if target is None:
+        forecast_df = series_keys.loc[series_keys.index.repeat(horizon)].reset_index(drop=True)
+        forecast_df['Date'] = np.tile(forecast_dates, n_series)
+        for method, values in columns.items():
+            forecast_df[method] = values.ravel()
+    else:
+        # Target rows read their forecast by series row and date position
+        forecast_df = target[list(keys) + ['Date']].reset_index(drop=True)
+        rows = forecast_df[list(keys)].merge(series_keys.reset_index(), on=list(keys), how='left')['index']
+        rows = rows.to_numpy(dtype=np.float64, na_value=np.nan)
+        positions = forecast_dates.get_indexer(pd.DatetimeIndex(forecast_df['Date']))
+        found = ~np.isnan(rows) & (positions >= 0)
+        rows, positions = np.where(found, rows, 0).astype(np.int64), np.where(found, positions, 0)
+        for method, values in columns.items():
+            forecast_df[method] = np.where(found, values[rows, positions], np.nan) if values.size else np.nan
+    
+    elapsed = time.time() - start_time
+    print(f"✅ Forecast {n_series:,} series x {horizon} periods in {elapsed:.2f}s "
+          f"({n_series / elapsed:,.0f} series/second)")
+    return forecast_df
+
+if __name__ == "__main__":
+    import sys
+    from walmart_data import load_walmart_dataset, read_features
+    train = load_walmart_dataset()
+    test = load_walmart_dataset(split='test')
+    tuned = None
+    if '--tune' in sys.argv:
+        from tuning import tune_dataset
+        tuned = tune_dataset(train)
+    features = read_features() if '--features' in sys.argv else None
+    forecast_df = batch_forecast(train, workers=2, target=test, tuned=tuned, features=features)
+    print(forecast_df.head(10))
+    print(f"Forecast table shape: {forecast_df.shape}")
\ No newline at end of file
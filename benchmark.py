@@ -0,0 +1,161 @@
+# Benchmark suite: every pipeline module at several data scales
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from synthetic_data import generate_sales
+
+BASELINE_FILE = 'benchmark_baseline.json'
+
+# Generator parameters per scale (weekly data, Date x Product x Region cube of ~10k cells)
+SCALES = {
+    'small': dict(n_stores=10, n_products=8, n_regions=4, n_periods=313, frequency='weekly'),
+    'medium': dict(n_stores=100, n_products=8, n_regions=4, n_periods=313, frequency='weekly'),
+    'large': dict(n_stores=1000, n_products=8, n_regions=4, n_periods=313, frequency='weekly')
+}
+TOLERANCE = 0.25   # Allowed slowdown relative to the baseline
+MIN_SLACK = 0.05   # Seconds of noise tolerated on very fast steps
+
+def _timed(timings, name, func, *args):
+    """Run func(*args) with its printed output discarded and record the wall time"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args)
+    timings[name] = time.perf_counter() - start
+    return result
+
+def run_scale(params, dpi=72):
+    """
+    Time every module on one synthetic dataset
+    Args: params (dict): Keyword arguments of synthetic_data.generate_sales
+          dpi (int): Dashboard resolution (figures are written headless to a scratch directory)
+    Returns: dict: Step name -> seconds, plus 'rows'
+    """
+    from data_cleaner import clean_data
+    from aggregate_cube import build_cube
+    from exploratory_analysis import exploratory_analysis
+    from time_series_analysis import time_series_analysis
+    from revenue_analysis import revenue_breakdown
+    from forecasting import simple_forecasting
+    from anomalies import detect_anomalies
+    from insights import generate_insights
+    from rendering import configure_rendering
+    
+    configure_rendering(headless=True, dpi=dpi)
+    timings = {}
+    start = time.perf_counter()
+    raw = generate_sales(**params)
+    timings['generate'] = time.perf_counter() - start
+    
+    df = _timed(timings, 'clean', clean_data, raw)
+    del raw
+    cube = _timed(timings, 'cube', build_cube, df)
+    _timed(timings, 'eda', exploratory_analysis, df, cube)
+    monthly_data = _timed(timings, 'time_series', time_series_analysis, df, cube)
+    _timed(timings, 'revenue', revenue_breakdown, df, cube)
+    forecast_df = _timed(timings, 'forecasting', simple_forecasting, monthly_data)
+    anomalies = _timed(timings, 'anomalies', detect_anomalies, df, cube)
+    _timed(timings, 'insights', generate_insights, df, monthly_data, forecast_df, cube, anomalies)
+    timings['total'] = sum(timings.values())
+    timings['rows'] = len(df)
+    return timings
+
+def run_benchmarks(scales, repeats=1, dpi=72):
+    """
+    Run the suite; each step keeps its fastest time over the repeats
+    Args: scales (list): Names from SCALES
+          repeats (int): Runs per scale
+          dpi (int): Dashboard resolution
+    Returns: dict: Scale -> step timings
+    """
+    results = {}
+    workdir = tempfile.mkdtemp(prefix='benchmark_')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        for scale in scales:
+            runs = [run_scale(SCALES[scale], dpi) for _ in range(repeats)]
+            results[scale] = {step: min(run[step] for run in runs) for step in runs[0]}
+            print(f"✅ {scale}: {results[scale]['rows']:,} rows in {results[scale]['total']:.2f}s")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def compare_to_baseline(results, baseline, tolerance=TOLERANCE):
+    """
+    Print current vs baseline timings and flag slowdowns beyond the tolerance
+    Args: results (dict): Output of run_benchmarks
+          baseline (dict): Stored results (same layout)
+          tolerance (float): Allowed relative slowdown
+    Returns: list: (scale, step) pairs that regressed
+    """
+    regressions = []
+    for scale, timings in results.items():
+        print(f"\n📏 {scale} ({timings['rows']:,} rows)")
+        print(f"   {'step':<12} {'baseline':>10} {'current':>10} {'ratio':>7}")
+        reference = baseline.get(scale, {})
+        for step, seconds in timings.items():
+            if step == 'rows':
+                continue
+            if step not in reference:
+                print(f"   {step:<12} {'-':>10} {seconds:>9.3f}s {'':>7}  (new)")
+                continue
+            ratio = seconds / reference[step] if reference[step] else float('inf')
+            slower = seconds > reference[step] * (1 + tolerance) + MIN_SLACK
+            status = "❌ regression" if slower else "✅"
+            print(f"   {step:<12} {reference[step]:>9.3f}s {seconds:>9.3f}s {ratio:>6.2f}x  {status}")
+            if slower:
+                regressions.append((scale, step))
+    return regressions
+
+def machine_info():
+    """Describe the machine the timings were taken on"""
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'processor': platform.processor(), 'cpus': os.cpu_count()}
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline module at several scales")
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=['small', 'medium'])
+    parser.add_argument('--repeats', type=int, default=3, help="runs per scale (fastest is kept)")
+    parser.add_argument('--dpi', type=int, default=72, help="dashboard resolution")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="baseline JSON file")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="store these timings as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help="allowed relative slowdown before a step counts as a regression")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    print("\n" + "="*50)
+    print("🏁 PIPELINE BENCHMARK")
+    print("="*50)
+    
+    results = run_benchmarks(args.scales, args.repeats, args.dpi)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('machine') != machine_info():
+            print("⚠️  Baseline was recorded on a different machine; ratios are indicative only")
+    regressions = compare_to_baseline(results, baseline.get('results', {}), args.tolerance)
+    
+    if args.save_baseline:
+        stored = baseline.get('results', {})
+        stored.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump({'machine': machine_info(), 'results': stored}, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+    elif regressions:
+        print(f"\n❌ {len(regressions)} step(s) slower than the baseline")
+        sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,180 @@
+# Columnar cache for cleaned data
+
+import hashlib
+import json
+import os
+import time
+import pandas as pd
+
+from data_cleaner import CLEANER_VERSION
+
+CACHE_DIR = '.data_cache'
+CACHE_SIZE_LIMIT = 2 * 1024 ** 3  # 2 GB across all cached datasets
+INDEX_FILE = 'index.json'
+SAMPLE_BYTES = 64 * 1024  # Bytes hashed from the head and tail of each source file
+
+def parquet_available():
+    """Check whether a Parquet engine (pyarrow) is installed"""
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def source_fingerprint(paths, version=CLEANER_VERSION):
+    """
+    Fingerprint source files without reading them in full
+    Args: paths (list): Source file paths
+          version (str): Cleaner version, so cleaning changes invalidate the cache
+    Returns: str: Hex digest identifying this exact input
+    """
+    digest = hashlib.sha256(f"cleaner={version}".encode())
+    for path in sorted(os.path.abspath(p) for p in paths):
+        stat = os.stat(path)
+        digest.update(f"{path}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+        # Head and tail samples catch rewrites that preserve size and mtime
+        with open(path, 'rb') as f:
+            digest.update(f.read(SAMPLE_BYTES))
+            if stat.st_size > SAMPLE_BYTES:
+                f.seek(max(SAMPLE_BYTES, stat.st_size - SAMPLE_BYTES))
+                digest.update(f.read(SAMPLE_BYTES))
+    return digest.hexdigest()
+
+def _sources_key(paths):
+    """Stable identifier for a set of source files, independent of their content"""
+    return '|'.join(sorted(os.path.abspath(p) for p in paths))
+
+def _read_index(cache_dir):
+    """Load the cache index (entry metadata keyed by fingerprint)"""
+    index_path = os.path.join(cache_dir, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return {}
+    try:
+        with open(index_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_index(cache_dir, index):
+    """Persist the cache index atomically"""
+    index_path = os.path.join(cache_dir, INDEX_FILE)
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, index_path)
+
+def _remove_entry(cache_dir, index, key):
+    """Delete a cached dataset and its index entry"""
+    entry = index.pop(key)
+    path = os.path.join(cache_dir, entry['file'])
+    if os.path.exists(path):
+        os.remove(path)
+
+def evict(cache_dir=CACHE_DIR, size_limit=CACHE_SIZE_LIMIT, index=None):
+    """
+    Evict least recently used datasets until the cache fits the size cap
+    Args: cache_dir (str): Cache directory
+          size_limit (int): Maximum total size in bytes
+          index (dict): Already loaded index (written back by the caller)
+    Returns: list: Evicted fingerprints
+    """
+    owns_index = index is None
+    if owns_index:
+        index = _read_index(cache_dir)
+    
+    evicted = []
+    total_size = sum(entry['size'] for entry in index.values())
+    for key in sorted(index, key=lambda k: index[k]['last_access']):
+        if total_size <= size_limit:
+            break
+        total_size -= index[key]['size']
+        _remove_entry(cache_dir, index, key)
+        evicted.append(key)
+    
+    if owns_index and evicted:
+        _write_index(cache_dir, index)
+    return evicted
+
+def clear_cache(cache_dir=CACHE_DIR):
+    """Remove every cached dataset"""
+    index = _read_index(cache_dir)
+    for key in list(index):
+        _remove_entry(cache_dir, index, key)
+    if os.path.isdir(cache_dir):
+        _write_index(cache_dir, index)
+
+def cached_clean_data(source_paths, build, columns=None, refresh=False,
+                      cache_dir=CACHE_DIR, size_limit=CACHE_SIZE_LIMIT):
+    """
+    Return the cleaned frame for source_paths, reusing the columnar cache when
+    the sources and the cleaner version are unchanged
+    Args: source_paths (list): Raw input files the cleaned frame is derived from
+          build (callable): Loads and cleans the data on a cache miss
+          columns (list): Optional column projection applied when reading the cache
+          refresh (bool): Ignore any cached copy and rebuild it
+          cache_dir (str): Cache directory
+          size_limit (int): Maximum total cache size in bytes (LRU eviction)
+    Returns: pandas.DataFrame: Cleaned data
+    """
+    if not parquet_available():
+        print("⚠️  pyarrow not installed. Cleaned-data cache disabled.")
+        return build()
+    
+    os.makedirs(cache_dir, exist_ok=True)
+    key = source_fingerprint(source_paths)
+    sources = _sources_key(source_paths)
+    index = _read_index(cache_dir)
+    
+    # Invalidate entries built from older versions of the same sources
+    for stale_key in [k for k, e in index.items() if e['sources'] == sources and k != key]:
+        _remove_entry(cache_dir, index, stale_key)
+        print("♻️  Source data changed. Invalidated stale cache entry.")
+    
+    entry = index.get(key)
+    cache_path = os.path.join(cache_dir, f"{key}.parquet")
+    
+    if entry and not refresh and os.path.exists(cache_path):
+        df_clean = pd.read_parquet(cache_path, columns=columns, memory_map=True)
+        entry['last_access'] = time.time()
+        _write_index(cache_dir, index)
+        print(f"⚡ Loaded cleaned data from cache ({entry['rows']:,} rows)")
+        return df_clean
+    
+    df_clean = build()
+    
+    tmp_path = cache_path + '.tmp'
+    df_clean.to_parquet(tmp_path)
+    os.replace(tmp_path, cache_path)
+    index[key] = {
+        'file': os.path.basename(cache_path),
+        'sources': sources,
+        'cleaner_version': CLEANER_VERSION,
+        'rows': len(df_clean),
+        'size': os.path.getsize(cache_path),
+        'last_access': time.time()
+    }
+    evicted = evict(cache_dir, size_limit, index)
+    _write_index(cache_dir, index)
+    
+    print(f"💾 Cached cleaned data ({index[key]['size'] / 1024 ** 2:,.1f} MB)" if key in index
+          else "⚠️  Cleaned data exceeds the cache size limit. Not cached.")
+    if evicted:
+        print(f"🗑️  Evicted {len(evicted)} least recently used cache entries")
+    
+    if columns is not None:
+        return df_clean[columns]
+    return df_clean
+
+if __name__ == "__main__":
+    # Test the cache round trip on sample data
+    from data_loader import create_sample_data
+    from data_cleaner import clean_data
+    
+    sample_path = 'sample_sales_data.csv'
+    create_sample_data().to_csv(sample_path, index=False)
+    build = lambda: clean_data(pd.read_csv(sample_path))
+    
+    cold = cached_clean_data([sample_path], build)
+    warm = cached_clean_data([sample_path], build)
+    print(f"Round trip identical: {cold.equals(warm)}")
+    os.remove(sample_path)
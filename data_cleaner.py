@@ -1,62 +1,154 @@
 # Data cleaning functions
 
+import numpy as np
 import pandas as pd
 
-def clean_data(df):
+from dimensions import encode_dimensions
+from sketches import distinct_count
+from profiler import stage
+
+# Bump whenever clean_data's output changes so cached cleaned frames are rebuilt
+CLEANER_VERSION = '3'
+
+MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June',
+               'July', 'August', 'September', 'October', 'November', 'December']
+MONTH_NAME_DTYPE = pd.CategoricalDtype(MONTH_NAMES, ordered=True)
+
+DATE_COLUMNS = ['Date', 'date', 'DATE', 'order_date', 'sales_date']
+
+# Column plan: target dtype ('numeric' coerces with pd.to_numeric) and fill policy.
+# A fill of None keeps missing values, e.g. MarkDowns that were simply not recorded.
+CLEANING_PLAN = {
+    'Sales': {'dtype': 'numeric', 'fill': 0},
+    'Revenue': {'dtype': 'numeric', 'fill': 0},
+    'sales': {'dtype': 'numeric', 'fill': 0},
+    'revenue': {'dtype': 'numeric', 'fill': 0},
+    'amount': {'dtype': 'numeric', 'fill': 0},
+    'Weekly_Sales': {'dtype': 'numeric', 'fill': 0},
+    'Product': {'dtype': None, 'fill': 'Unknown'},
+    'Region': {'dtype': None, 'fill': 'Unknown'},
+    'Temperature': {'dtype': 'numeric', 'fill': None},
+    'Fuel_Price': {'dtype': 'numeric', 'fill': None},
+    'MarkDown1': {'dtype': 'numeric', 'fill': None},
+    'MarkDown2': {'dtype': 'numeric', 'fill': None},
+    'MarkDown3': {'dtype': 'numeric', 'fill': None},
+    'MarkDown4': {'dtype': 'numeric', 'fill': None},
+    'MarkDown5': {'dtype': 'numeric', 'fill': None},
+    'CPI': {'dtype': 'numeric', 'fill': None},
+    'Unemployment': {'dtype': 'numeric', 'fill': None},
+    'IsHoliday': {'dtype': 'bool', 'fill': False}
+}
+
+# Derived calendar features and their compact dtypes
+DATE_PARTS = {
+    'Year': 'int16',
+    'Month': 'int8',
+    'Quarter': 'int8'
+}
+
+def _fill_column(values, fill):
+    """
+    Fill missing values of one column according to its fill policy
+    Args: values (pandas.Series): Column to fill
+          fill: Fill value (categoricals get it registered as a category first)
+    Returns: pandas.Series: Filled column (the input itself if nothing is missing)
+    """
+    if not values.hasnans:
+        return values
+    if isinstance(values.dtype, pd.CategoricalDtype) and fill not in values.cat.categories:
+        values = values.cat.add_categories([fill])
+    if values.dtype == object:
+        # where() sidesteps fillna's deprecated silent downcasting of object columns
+        return values.where(values.notna(), fill)
+    return values.fillna(fill)
+
+def _apply_plan(df_clean, plan):
+    """
+    Cast and fill the columns covered by the plan, replacing columns rather than
+    mutating them so the caller's frame is never modified
+    Args: df_clean (pandas.DataFrame): Shallow copy of the raw data
+          plan (dict): Column plan (see CLEANING_PLAN)
+    """
+    for col, spec in plan.items():
+        if col not in df_clean.columns:
+            continue
+        original = df_clean[col]
+        values = original
+        if spec['dtype'] == 'numeric' and not pd.api.types.is_numeric_dtype(values):
+            values = pd.to_numeric(values, errors='coerce')
+        if spec['fill'] is not None:
+            values = _fill_column(values, spec['fill'])
+        if spec['dtype'] not in (None, 'numeric') and values.dtype != spec['dtype']:
+            values = values.astype(spec['dtype'])
+        if values is not original:
+            df_clean[col] = values
+
+def clean_data(df, verbose=True, plan=None, approx=False):
     """
     Clean and preprocess the retail sales data
-    Args: df (pandas.DataFrame): Raw data
+    Args: df (pandas.DataFrame): Raw data (never modified)
+          verbose (bool): Print the cleaning report (disabled for streamed chunks)
+          plan (dict): Column dtype/fill plan, defaults to CLEANING_PLAN
+          approx (bool): Report HyperLogLog distinct counts instead of exact nunique
     Returns: pandas.DataFrame: Cleaned data
     """
-    print("\n" + "="*50)
-    print("🧹 DATA CLEANING AND PREPROCESSING")
-    print("="*50)
+    if verbose:
+        print("\n" + "="*50)
+        print("🧹 DATA CLEANING AND PREPROCESSING")
+        print("="*50)
     
-    # Create a copy to avoid modifying original data
-    df_clean = df.copy()
+    # Shallow copy: transformed columns are replaced, so the original data is untouched
+    df_clean = df.copy(deep=False)
     
     # Check for missing values
-    print("🔍 Missing values analysis:")
-    missing_values = df_clean.isnull().sum()
-    print(missing_values)
+    if verbose:
+        print("🔍 Missing values analysis:")
+        missing_values = df_clean.isnull().sum()
+        print(missing_values)
     
     # Handle Date column (check common column names)
-    date_columns = ['Date', 'date', 'DATE', 'order_date', 'sales_date']
-    date_col = None
-    
-    for col in date_columns:
-        if col in df_clean.columns:
-            date_col = col
-            break
+    date_col = next((col for col in DATE_COLUMNS if col in df_clean.columns), None)
     
     if date_col:
-        df_clean['Date'] = pd.to_datetime(df_clean[date_col])
-        print(f"✅ Converted '{date_col}' to datetime")
-    else:
+        if not pd.api.types.is_datetime64_any_dtype(df_clean[date_col]) or date_col != 'Date':
+            with stage('parse dates', rows=len(df_clean)):
+                df_clean['Date'] = pd.to_datetime(df_clean[date_col])
+        if verbose:
+            print(f"✅ Converted '{date_col}' to datetime")
+    elif verbose:
         print("❌ No date column found. Using existing 'Date' column.")
     
-    # Sort by date
-    df_clean = df_clean.sort_values('Date')
+    # Sort by date (a single reordering copy, skipped when already in order)
+    if not df_clean['Date'].is_monotonic_increasing:
+        with stage('sort by date', rows=len(df_clean)):
+            df_clean = df_clean.sort_values('Date', kind='stable')
     
-    # Create time-based features for analysis
-    df_clean['Year'] = df_clean['Date'].dt.year
-    df_clean['Month'] = df_clean['Date'].dt.month
-    df_clean['Quarter'] = df_clean['Date'].dt.quarter
-    df_clean['Month_Name'] = df_clean['Date'].dt.month_name()
+    # Cast and fill the planned columns; columns outside the plan are left as-is
+    with stage('cast and fill', rows=len(df_clean)):
+        _apply_plan(df_clean, CLEANING_PLAN if plan is None else plan)
     
-    # Ensure numeric columns are properly formatted
-    numeric_columns = ['Sales', 'Revenue', 'sales', 'revenue', 'amount']
-    for col in numeric_columns:
-        if col in df_clean.columns and col != 'Date':
-            df_clean[col] = pd.to_numeric(df_clean[col], errors='coerce')
+    # Label dimensions become 1-2 byte codes into sorted lookup tables
+    with stage('encode dimensions', rows=len(df_clean)):
+        encode_dimensions(df_clean)
+    
+    # Create time-based features for analysis
+    dates = df_clean['Date'].dt
+    has_missing_dates = df_clean['Date'].hasnans
+    for part, dtype in DATE_PARTS.items():
+        values = getattr(dates, part.lower())
+        # Nullable integers keep missing dates missing instead of failing the cast
+        df_clean[part] = values.astype(dtype.capitalize() if has_missing_dates else dtype)
+    month_codes = df_clean['Month'].to_numpy(dtype=np.int8, na_value=0) - 1
+    df_clean['Month_Name'] = pd.Categorical.from_codes(month_codes, dtype=MONTH_NAME_DTYPE)
     
-    # Fill missing numeric values with 0
-    df_clean = df_clean.fillna(0)
+    if not verbose:
+        return df_clean
     
     print(f"📅 Data range: {df_clean['Date'].min()} to {df_clean['Date'].max()}")
     print(f"📊 Total records: {len(df_clean)}")
-    print(f"🏷️  Products: {df_clean['Product'].nunique() if 'Product' in df_clean.columns else 'N/A'}")
-    print(f"🌍 Regions: {df_clean['Region'].nunique() if 'Region' in df_clean.columns else 'N/A'}")
+    nunique = (lambda values: f"~{distinct_count(values)}") if approx else (lambda values: values.nunique())
+    print(f"🏷️  Products: {nunique(df_clean['Product']) if 'Product' in df_clean.columns else 'N/A'}")
+    print(f"🌍 Regions: {nunique(df_clean['Region']) if 'Region' in df_clean.columns else 'N/A'}")
     
     return df_clean
 
@@ -65,4 +157,4 @@ if __name__ == "__main__":
     from data_loader import create_sample_data
     test_df = create_sample_data()
     cleaned_df = clean_data(test_df)
-    print(cleaned_df.info())
+    print(cleaned_df.info())
\ No newline at end of file
@@ -1,17 +1,39 @@
 # Data loading and preparation
 
 import pandas as pd
-import numpy as np
 
-def load_and_prepare_data():
+from aggregate_cube import CUBE_MEASURES
+from dimensions import DIMENSIONS
+from profiler import stage
+from time_index import build_time_index, period_totals
+from synthetic_data import generate_sales
+from sketches import hyperloglog, hyperloglog_count, measure_sketch, merge_hyperloglogs, merge_measure_sketches, \
+    merge_moments, welford_moments
+
+DATA_FILE = 'walmart_sales_data.csv'
+
+# Explicit dtypes for streamed ingestion: dimensions as categoricals, measures as float32
+STREAM_DTYPES = {
+    'Product': 'category',
+    'Region': 'category',
+    'Store': 'category',
+    'Dept': 'category',
+    'Sales': 'float32',
+    'Revenue': 'float32'
+}
+
+def load_and_prepare_data(path=DATA_FILE):
     """
     Load and prepare the retail sales data from multiple files
+    Args: path (str): Path to the raw sales CSV
     Returns: pandas.DataFrame
     """
     try:
         # Try to load actual dataset - adjust filename based on your downloaded file
         # Use the first dataset from your Google Drive links
-        df = pd.read_csv('walmart_sales_data.csv')  # Change this to your actual file name
+        with stage('read_csv'):
+            # Label dimensions are parsed straight into categoricals, never as Python strings
+            df = pd.read_csv(path, dtype=dict.fromkeys(DIMENSIONS, 'category'))  # Change DATA_FILE to your actual file name
         
         print("✅ Dataset loaded successfully!")
         print(f"📊 Dataset shape: {df.shape}")
@@ -22,6 +44,113 @@ def load_and_prepare_data():
         print("⚠️  File not found. Creating sample data for demonstration...")
         return create_sample_data()
 
+def _combine_partials(total, partial):
+    """
+    Add a partial aggregate to the running total, aligning on the group index
+    Args: total (pandas.DataFrame or None): Running aggregate
+          partial (pandas.DataFrame): Aggregate of the current chunk
+    Returns: pandas.DataFrame: Updated running aggregate
+    """
+    if total is None:
+        return partial
+    return total.add(partial, fill_value=0)
+
+def _revenue_moments(chunk, group_col):
+    """
+    Additive revenue moments (sum, count, sum of squares) per group for one chunk
+    Args: chunk (pandas.DataFrame): Cleaned chunk
+          group_col (str): Dimension column to group by
+    Returns: pandas.DataFrame: Columns 'sum', 'count' and 'sumsq'
+    """
+    revenue = chunk['Revenue'].astype('float64')
+    moments = pd.DataFrame({
+        'sum': revenue,
+        'count': revenue.notna().astype('int64'),
+        'sumsq': revenue * revenue
+    }).groupby(chunk[group_col], observed=True).sum()
+    # Category sets differ between chunks, so align partials on plain labels
+    moments.index = moments.index.astype(str)
+    return moments
+
+def stream_and_aggregate(file_path=DATA_FILE, chunksize=500_000, approx=False):
+    """
+    Stream a large CSV in bounded-size chunks, clean each chunk and fold it
+    into the Date-level and Product/Region aggregates. Peak memory depends on
+    the chunk size, not on the file size.
+    Args: file_path (str): Path to the raw sales CSV
+          chunksize (int): Number of rows per chunk
+          approx (bool): Also sketch every chunk (quantiles and moments of the measures,
+                         HyperLogLog of the dimensions) and keep Welford revenue moments
+    Returns: dict: 'date_totals' (Date and the Sales/Revenue totals present per date),
+                   'product_moments' and 'region_moments' (sum/count/sumsq of Revenue,
+                   count/mean/m2 with approx; None without a Revenue column),
+                   'n_rows' (int), and with approx
+                   'measure_sketches' (measure -> merged sketch) and 'distinct'
+                   (dimension -> estimated distinct count)
+    """
+    from data_cleaner import clean_data
+    
+    print(f"🌊 Streaming '{file_path}' in chunks of {chunksize:,} rows...")
+    
+    columns = pd.read_csv(file_path, nrows=0).columns
+    dtypes = {col: dtype for col, dtype in STREAM_DTYPES.items() if col in columns}
+    parse_dates = ['Date'] if 'Date' in columns else False
+    
+    date_totals = None
+    product_moments = None
+    region_moments = None
+    n_rows = 0
+    n_chunks = 0
+    measure_sketches, registers = {}, {}
+    moments = (lambda chunk, col: welford_moments(chunk['Revenue'], chunk[col])) if approx else _revenue_moments
+    combine = merge_moments if approx else _combine_partials
+    
+    reader = pd.read_csv(file_path, dtype=dtypes, parse_dates=parse_dates, chunksize=chunksize)
+    for chunk in reader:
+        chunk = clean_data(chunk, verbose=False)
+        n_rows += len(chunk)
+        n_chunks += 1
+        
+        # Chunks come out of clean_data sorted by Date: per-date totals are segment sums
+        # (accumulated in float64 so float32 inputs do not lose precision)
+        measures = [col for col in CUBE_MEASURES if col in chunk.columns]
+        chunk_totals = period_totals(chunk, build_time_index(chunk['Date']), 'date', measures)
+        date_totals = _combine_partials(date_totals, chunk_totals)
+        
+        # Revenue moments only for files that have a Revenue column
+        if 'Product' in chunk.columns and 'Revenue' in chunk.columns:
+            product_moments = combine(product_moments, moments(chunk, 'Product'))
+        if 'Region' in chunk.columns and 'Revenue' in chunk.columns:
+            region_moments = combine(region_moments, moments(chunk, 'Region'))
+        
+        if approx:
+            for measure in measures:
+                measure_sketches[measure] = merge_measure_sketches(measure_sketches.get(measure),
+                                                                   measure_sketch(chunk[measure]))
+            for col in DIMENSIONS + ['Store', 'Dept']:
+                if col in chunk.columns:
+                    sketch = hyperloglog(chunk[col])
+                    registers[col] = merge_hyperloglogs(registers[col], sketch) if col in registers else sketch
+    
+    if date_totals is None:
+        raise ValueError(f"No rows found in '{file_path}'")
+    
+    date_totals = date_totals.sort_index().rename_axis('Date').reset_index()
+    
+    print(f"✅ Streamed {n_rows:,} rows in {n_chunks} chunks")
+    print(f"📊 Distinct dates: {len(date_totals):,}")
+    
+    aggregates = {
+        'date_totals': date_totals,
+        'product_moments': product_moments,
+        'region_moments': region_moments,
+        'n_rows': n_rows
+    }
+    if approx:
+        aggregates['measure_sketches'] = measure_sketches
+        aggregates['distinct'] = {col: int(round(hyperloglog_count(sketch))) for col, sketch in registers.items()}
+    return aggregates
+
 def create_sample_data():
     """
     Create sample retail sales data if actual files aren't available
@@ -29,32 +158,9 @@ def create_sample_data():
     """
     print("🛠️  Creating sample data for demonstration...")
     
-    # Generate realistic sample data
-    dates = pd.date_range('2010-01-01', '2015-12-31', freq='M')
-    products = ['Electronics', 'Clothing', 'Home Goods', 'Sports']
-    regions = ['North', 'South', 'East', 'West']
-    
-    data = []
-    for date in dates:
-        for product in products:
-            for region in regions:
-                # Create realistic sales patterns with trend and seasonality
-                base_sales = 1000 + (date.year - 2010) * 200  # Upward trend
-                seasonal_factor = 1 + 0.3 * np.sin(2 * np.pi * date.month / 12)  # Seasonality
-                product_factor = {'Electronics': 1.5, 'Clothing': 1.2, 'Home Goods': 1.0, 'Sports': 0.8}[product]
-                region_factor = {'North': 1.1, 'South': 1.0, 'East': 0.9, 'West': 1.2}[region]
-                
-                sales = base_sales * seasonal_factor * product_factor * region_factor * np.random.uniform(0.8, 1.2)
-                
-                data.append({
-                    'Date': date,
-                    'Product': product,
-                    'Region': region,
-                    'Sales': max(0, sales),
-                    'Revenue': sales * np.random.uniform(10, 100)
-                })
-    
-    df = pd.DataFrame(data)
+    # 72 months x 4 products x 4 regions with trend, seasonality and noise
+    df = generate_sales(n_products=4, n_regions=4, n_periods=72, frequency='monthly',
+                        start='2010-01-01')
     print("✅ Sample data created successfully!")
     return df
 
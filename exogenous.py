@@ -0,0 +1,245 @@
+# Regression forecasts on lagged sales, seasonal dummies and store features
+
+import time
+import numpy as np
+import pandas as pd
+
+from batch_forecasting import _fill_gaps, _shared, map_row_chunks, series_matrix
+from frequency import future_dates, infer_frequency, season_length
+from walmart_data import FEATURE_COLUMNS
+
+MARKDOWN_COLUMNS = [col for col in FEATURE_COLUMNS if col.startswith('MarkDown')]
+CONTINUOUS_COLUMNS = [col for col in FEATURE_COLUMNS if col not in MARKDOWN_COLUMNS]
+
+RIDGE = 1.0   # Penalty on every coefficient but the intercept (covariates are standardised)
+
+def store_covariates(features, dates):
+    """
+    (store x period x covariate) tensor of the store features on the given dates.
+    Continuous features (Temperature, Fuel_Price, CPI, Unemployment) carry the last
+    observation forward, so the future weeks of features.csv with no CPI yet keep
+    the latest value. A missing MarkDown means no markdown was recorded: the value
+    is 0 and a per-column flag marks the weeks in which any store reported that
+    markdown at all (MarkDowns were not recorded before late 2011), so the era
+    without data shifts the level instead of pulling the markdown effects to 0.
+    Args: features (pandas.DataFrame): Store, Date, FEATURE_COLUMNS and IsHoliday
+                                       (e.g. walmart_data.read_features)
+          dates (pandas.DatetimeIndex): Periods to cover
+    Returns: tuple: (covariates float64 (store x period x covariate), Store ids sorted,
+                     list of covariate names)
+    """
+    stores = np.unique(features['Store'].to_numpy())
+    store_pos = np.searchsorted(stores, features['Store'].to_numpy())
+    date_pos = pd.DatetimeIndex(dates).get_indexer(features['Date'])
+    on_dates = date_pos >= 0
+    store_pos, date_pos = store_pos[on_dates], date_pos[on_dates]
+    shape = (len(stores), len(dates))
+
+    def grid(col):
+        values = np.full(shape, np.nan)
+        values[store_pos, date_pos] = features[col].to_numpy(dtype=np.float64, na_value=np.nan)[on_dates]
+        return values
+
+    columns, names = [], []
+    for col in CONTINUOUS_COLUMNS:
+        values = _fill_gaps(grid(col))
+        # Stores that never report a feature take the mean of the others
+        columns.append(np.where(np.isnan(values), np.nanmean(values) if (~np.isnan(values)).any() else 0, values))
+        names.append(col)
+    for col in MARKDOWN_COLUMNS:
+        values = grid(col)
+        recorded = (~np.isnan(values)).any(axis=0)
+        columns.append(np.nan_to_num(values))
+        columns.append(np.broadcast_to(recorded.astype(np.float64), shape))
+        names.extend([col, f'{col}_recorded'])
+    holiday = grid('IsHoliday') if 'IsHoliday' in features.columns else np.zeros(shape)
+    columns.append(np.nan_to_num(holiday))
+    names.append('IsHoliday')
+
+    covariates = np.stack(columns, axis=-1)
+    # Standardise the feature values so one ridge penalty suits all of them
+    scaled = [i for i, name in enumerate(names) if name in FEATURE_COLUMNS]
+    mean = covariates[:, :, scaled].mean(axis=(0, 1))
+    std = covariates[:, :, scaled].std(axis=(0, 1))
+    covariates[:, :, scaled] = (covariates[:, :, scaled] - mean) / np.where(std > 0, std, 1)
+    return covariates, stores, names
+
+def calendar_design(dates):
+    """
+    Intercept and month-of-year dummies (January is the baseline) per period
+    Args: dates (pandas.DatetimeIndex): Periods
+    Returns: numpy.ndarray: (period x 12) design columns
+    """
+    months = pd.DatetimeIndex(dates).month.to_numpy()
+    dummies = (months[:, None] == np.arange(2, 13)[None, :]).astype(np.float64)
+    return np.column_stack([np.ones(len(months)), dummies])
+
+def _design(calendar, covariates, lags):
+    """Full (series x period x column) design: calendar, lagged sales, covariates"""
+    n_series, n_periods = lags.shape[:2]
+    shared = np.broadcast_to(calendar[None], (n_series, n_periods, calendar.shape[1]))
+    return np.concatenate([shared, lags, covariates], axis=-1)
+
+def fit_regression(values, calendar, covariates, lags=(1, 52), ridge=RIDGE):
+    """
+    Fit y_t = calendar_t + lagged sales + covariates_t for many series at once:
+    the normal equations of every series are formed with one einsum and solved
+    as one stacked (series x column x column) system. Series are scaled by their
+    mean absolute value first; periods with an unobserved target (or before the
+    longest lag) get zero weight, and lagged values read through gaps.
+    Args: values (numpy.ndarray): (series x period) matrix, NaN for missing periods
+          calendar (numpy.ndarray): (period x column) design shared by all series
+          covariates (numpy.ndarray): (series x period x covariate) features
+          lags (tuple): Lags of the sales used as regressors
+          ridge (float): Penalty on every coefficient but the intercept
+    Returns: dict: 'coef' (series x column; NaN rows for series with fewer observed
+                   periods than columns), 'scale' per series, 'filled' (scaled,
+                   gap-free history) and 'lags'
+    """
+    n_series, n_periods = values.shape
+    with np.errstate(invalid='ignore'):
+        scale = np.nanmean(np.abs(values), axis=1)
+    scale = np.where(np.isfinite(scale) & (scale > 0), scale, 1.0)
+    scaled = values / scale[:, None]
+    filled = _fill_gaps(scaled)
+
+    first = max(lags)
+    periods = np.arange(first, n_periods)
+    lagged = np.stack([filled[:, periods - lag] for lag in lags], axis=-1)
+    X = _design(calendar[periods], covariates[:, periods], lagged)
+    target = scaled[:, periods]
+    weight = (~np.isnan(target) & ~np.isnan(lagged).any(axis=-1)).astype(np.float64)
+    X = np.nan_to_num(X) * weight[:, :, None]
+    y = np.nan_to_num(target) * weight
+
+    n_columns = X.shape[-1]
+    gram = np.einsum('stk,stl->skl', X, X)
+    penalty = np.full(n_columns, ridge)
+    penalty[0] = 0
+    gram[:, np.arange(n_columns), np.arange(n_columns)] += penalty
+    # The intercept needs at least one row; empty series are solved against identity
+    empty = weight.sum(axis=1) == 0
+    gram[empty] = np.eye(n_columns)
+    coef = np.linalg.solve(gram, np.einsum('stk,st->sk', X, y)[:, :, None])[:, :, 0]
+    coef[weight.sum(axis=1) < n_columns] = np.nan
+    return {'coef': coef, 'scale': scale, 'filled': filled, 'lags': tuple(lags)}
+
+def forecast_regression(model, calendar, covariates):
+    """
+    Recursive forecasts: each step's prediction becomes the lagged sales of the
+    next steps, all series advancing together
+    Args: model (dict): Output of fit_regression
+          calendar (numpy.ndarray): (horizon x column) design of the forecast periods
+          covariates (numpy.ndarray): (series x horizon x covariate) features
+    Returns: numpy.ndarray: (series x horizon) forecasts in the original units
+    """
+    history = model['filled']
+    n_series, n_periods = history.shape
+    horizon = len(calendar)
+    extended = np.concatenate([history, np.full((n_series, horizon), np.nan)], axis=1)
+    for step in range(horizon):
+        t = n_periods + step
+        lagged = np.stack([extended[:, t - lag] for lag in model['lags']], axis=-1)[:, None]
+        X = _design(calendar[step:step + 1], covariates[:, step:step + 1], lagged)[:, 0]
+        extended[:, t] = np.einsum('sk,sk->s', X, model['coef'])
+    return extended[:, n_periods:] * model['scale'][:, None]
+
+def _regression_rows(start, stop, calendar, covariates, horizon, lags, ridge):
+    """Pool task: fit and forecast rows [start, stop) of the shared series matrix"""
+    n_periods = _shared['values'].shape[1]
+    store_rows = _shared['store_rows'][start:stop]
+    row_covariates = np.where(store_rows[:, None, None] >= 0, covariates[np.maximum(store_rows, 0)], 0)
+    model = fit_regression(_shared['values'][start:stop], calendar[:n_periods],
+                           row_covariates[:, :n_periods], lags, ridge)
+    return forecast_regression(model, calendar[n_periods:n_periods + horizon],
+                               row_covariates[:, n_periods:n_periods + horizon])
+
+def regression_block(values, store_ids, dates, features, horizon, workers=1, chunk_size=256,
+                     ridge=RIDGE):
+    """
+    Regression forecasts of a series matrix whose rows belong to stores
+    Args: values (numpy.ndarray): (series x period) matrix, NaN for missing periods
+          store_ids (array-like): Store of each series
+          dates (pandas.DatetimeIndex): Periods of the matrix
+          features (pandas.DataFrame): Store features (see store_covariates), covering
+                                       the forecast periods too
+          horizon (int): Periods to forecast
+          workers (int): Worker processes (1 runs in-process)
+          chunk_size (int): Series per solve
+          ridge (float): Penalty on every coefficient but the intercept
+    Returns: numpy.ndarray: (series x horizon) forecasts (NaN for series too short to fit)
+    """
+    frequency = infer_frequency(dates)
+    all_dates = dates.append(future_dates(dates[-1], horizon, frequency, dates))
+    covariates, stores, _ = store_covariates(features, all_dates)
+    store_ids = np.asarray(store_ids)
+    # Row of each series' store in the covariates (-1 for stores without features)
+    position = np.clip(np.searchsorted(stores, store_ids), 0, len(stores) - 1)
+    store_rows = np.where(stores[position] == store_ids, position, -1)
+
+    lags = (1, season_length(frequency))
+    if len(dates) <= max(lags):
+        lags = (1,)
+    blocks = map_row_chunks(_regression_rows, {'values': values, 'store_rows': store_rows}, len(values),
+                            (calendar_design(all_dates), covariates, horizon, lags, ridge),
+                            workers=workers, chunk_size=chunk_size)
+    return np.concatenate(blocks) if blocks else np.empty((0, horizon))
+
+def regression_forecast(dataset, features, horizon=39, workers=1, chunk_size=256, keys=('Store', 'Dept'),
+                        value_col='Weekly_Sales', ridge=RIDGE):
+    """
+    Forecast every Store x Dept series from its lagged sales, month-of-year dummies
+    and the store's features (Temperature, Fuel_Price, MarkDown1-5, CPI, Unemployment,
+    IsHoliday) with one stacked least-squares solve per chunk of series
+    Args: dataset (pandas.DataFrame): Long-format rows (e.g. walmart_data.load_walmart_dataset)
+          features (pandas.DataFrame): Output of walmart_data.read_features
+          horizon (int): Periods to forecast per series
+          workers (int): Worker processes (1 runs in-process)
+          chunk_size (int): Series per solve
+          keys (tuple): Columns identifying a series (must include Store)
+          value_col (str): Column holding the observations
+          ridge (float): Penalty on every coefficient but the intercept
+    Returns: pandas.DataFrame: One row per series and forecast date, 'Regression_Forecast'
+    """
+    print("\n" + "="*50)
+    print("📐 EXOGENOUS REGRESSION FORECASTING")
+    print("="*50)
+
+    start_time = time.time()
+    matrix, series_keys, dates = series_matrix(dataset, keys, value_col)
+    forecasts = regression_block(matrix, series_keys['Store'].to_numpy(), dates, features, horizon,
+                                 workers, chunk_size, ridge)
+
+    forecast_dates = future_dates(dates[-1], horizon, infer_frequency(dates), dates)
+    forecast_df = series_keys.loc[series_keys.index.repeat(horizon)].reset_index(drop=True)
+    forecast_df['Date'] = np.tile(forecast_dates, len(series_keys))
+    forecast_df['Regression_Forecast'] = forecasts.ravel()
+
+    unfitted = int(np.isnan(forecasts).all(axis=1).sum()) if len(forecasts) else 0
+    print(f"✅ Fitted {len(series_keys) - unfitted:,} of {len(series_keys):,} series x {horizon} periods "
+          f"in {time.time() - start_time:.2f}s")
+    return forecast_df
+
+if __name__ == "__main__":
+    from batch_forecasting import forecast_block
+    from forecasting import forecast_metrics
+    from walmart_data import read_features, load_walmart_dataset
+
+    # Holdout: fit on all but the last 13 weeks and compare with the univariate methods
+    train = load_walmart_dataset()
+    features = read_features()
+    values, series_keys, dates = series_matrix(train)
+    holdout = 13
+    history, actual = values[:, :-holdout], values[:, -holdout:]
+    start_time = time.time()
+    predicted = {'Regression_Forecast': regression_block(history, series_keys['Store'].to_numpy(),
+                                                         dates[:-holdout], features, holdout)}
+    print(f"📐 Regression fitted {len(values):,} series in {time.time() - start_time:.2f}s")
+    predicted.update(forecast_block(history, holdout))
+
+    print(f"\n📊 HOLDOUT ACCURACY (last {holdout} weeks):")
+    for method, forecast in predicted.items():
+        usable = ~np.isnan(actual) & ~np.isnan(forecast)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            metrics = forecast_metrics(actual[usable], forecast[usable])
+        print(f"   {method}: MAE {metrics['MAE']:,.2f}, RMSE {metrics['RMSE']:,.2f}")
@@ -1,34 +1,40 @@
 # EDA and visualization
 
-import matplotlib.pyplot as plt
-import seaborn as sns
 import pandas as pd
+from rendering import RENDER_SETTINGS, load_pyplot, save_figure
+from aggregate_cube import build_cube, cube_columns, measure_totals, monthly_means, row_statistics
+from time_index import build_time_index, period_totals
+from sketches import QUANTILE_ACCURACY
 
 def setup_plot_style():
-    """Set up consistent plot style across all visualizations"""
+    """
+    Set up consistent plot style across all visualizations
+    Returns: tuple: (matplotlib.pyplot, seaborn), imported on first use
+    """
+    import seaborn as sns
+    plt = load_pyplot()
     plt.style.use('seaborn-v0_8')
     sns.set_palette("husl")
     plt.rcParams['figure.figsize'] = (12, 8)
     plt.rcParams['font.size'] = 12
+    return plt, sns
 
-def exploratory_analysis(df):
+def plot_exploratory_dashboard(cube, columns, row_stats):
     """
-    Perform exploratory data analysis with comprehensive visualizations
-    Args: df (pandas.DataFrame): Cleaned data
+    Draw and save the EDA dashboard
+    Args: cube (pandas.DataFrame): Aggregate cube
+          columns (list): Columns available in the cube (see aggregate_cube.cube_columns)
+          row_stats (dict): Row-level statistics (see aggregate_cube.row_statistics)
     """
-    print("\n" + "="*50)
-    print("🔍 EXPLORATORY DATA ANALYSIS")
-    print("="*50)
-    
-    setup_plot_style()
+    plt, sns = setup_plot_style()
     
     # Create a comprehensive EDA dashboard
     fig, axes = plt.subplots(2, 3, figsize=(18, 12))
     fig.suptitle('Retail Sales - Exploratory Data Analysis Dashboard', fontsize=16, fontweight='bold')
     
     # 1. Total sales over time
-    if 'Date' in df.columns and 'Sales' in df.columns:
-        monthly_sales = df.groupby('Date')['Sales'].sum().reset_index()
+    if 'Date' in columns and 'Sales' in columns:
+        monthly_sales = measure_totals(cube, ['Date']).reset_index()
         axes[0, 0].plot(monthly_sales['Date'], monthly_sales['Sales'], linewidth=2, color='blue')
         axes[0, 0].set_title('Total Monthly Sales Over Time', fontweight='bold')
         axes[0, 0].set_xlabel('Date')
@@ -37,8 +43,8 @@ def exploratory_analysis(df):
         axes[0, 0].tick_params(axis='x', rotation=45)
     
     # 2. Sales by product
-    if 'Product' in df.columns and 'Sales' in df.columns:
-        product_sales = df.groupby('Product')['Sales'].sum().sort_values(ascending=False)
+    if 'Product' in columns and 'Sales' in columns:
+        product_sales = measure_totals(cube, ['Product']).sort_values(ascending=False)
         bars = axes[0, 1].bar(product_sales.index, product_sales.values, color=sns.color_palette())
         axes[0, 1].set_title('Total Sales by Product', fontweight='bold')
         axes[0, 1].set_xlabel('Product')
@@ -52,8 +58,8 @@ def exploratory_analysis(df):
                           f'{height:,.0f}', ha='center', va='bottom')
     
     # 3. Sales by region
-    if 'Region' in df.columns and 'Sales' in df.columns:
-        region_sales = df.groupby('Region')['Sales'].sum().sort_values(ascending=False)
+    if 'Region' in columns and 'Sales' in columns:
+        region_sales = measure_totals(cube, ['Region']).sort_values(ascending=False)
         bars = axes[0, 2].bar(region_sales.index, region_sales.values, color=sns.color_palette())
         axes[0, 2].set_title('Total Sales by Region', fontweight='bold')
         axes[0, 2].set_xlabel('Region')
@@ -66,16 +72,18 @@ def exploratory_analysis(df):
                           f'{height:,.0f}', ha='center', va='bottom')
     
     # 4. Sales distribution
-    if 'Sales' in df.columns:
-        axes[1, 0].hist(df['Sales'], bins=50, alpha=0.7, edgecolor='black', color='skyblue')
+    if 'Sales' in columns and row_stats['histogram'] is not None:
+        edges = row_stats['histogram']['edges']
+        axes[1, 0].hist(edges[:-1], bins=edges, weights=row_stats['histogram']['counts'],
+                        alpha=0.7, edgecolor='black', color='skyblue')
         axes[1, 0].set_title('Sales Distribution', fontweight='bold')
         axes[1, 0].set_xlabel('Sales Amount')
         axes[1, 0].set_ylabel('Frequency')
         axes[1, 0].grid(True, alpha=0.3)
     
     # 5. Monthly sales pattern
-    if 'Month' in df.columns and 'Sales' in df.columns:
-        monthly_avg = df.groupby('Month')['Sales'].mean()
+    if 'Month' in columns and 'Sales' in columns:
+        monthly_avg = monthly_means(cube)
         axes[1, 1].plot(monthly_avg.index, monthly_avg.values, marker='o', linewidth=2, color='green')
         axes[1, 1].set_title('Average Sales by Month', fontweight='bold')
         axes[1, 1].set_xlabel('Month')
@@ -84,8 +92,10 @@ def exploratory_analysis(df):
         axes[1, 1].set_xticks(range(1, 13))
     
     # 6. Yearly sales trend
-    if 'Year' in df.columns and 'Sales' in df.columns:
-        yearly_sales = df.groupby('Year')['Sales'].sum()
+    if 'Year' in columns and 'Sales' in columns:
+        date_sales = measure_totals(cube, ['Date']).to_frame()
+        yearly_sales = period_totals(date_sales, build_time_index(date_sales.index), 'year', ['Sales'])['Sales']
+        yearly_sales.index = yearly_sales.index.year
         axes[1, 2].plot(yearly_sales.index, yearly_sales.values, marker='s', linewidth=2, color='red')
         axes[1, 2].set_title('Yearly Sales Trend', fontweight='bold')
         axes[1, 2].set_xlabel('Year')
@@ -93,22 +103,52 @@ def exploratory_analysis(df):
         axes[1, 2].grid(True, alpha=0.3)
     
     plt.tight_layout()
-    plt.savefig('exploratory_analysis.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    save_figure(fig, 'exploratory_analysis')
+
+def exploratory_analysis(df, cube=None, row_stats=None):
+    """
+    Perform exploratory data analysis with comprehensive visualizations
+    Args: df (pandas.DataFrame): Cleaned data (None when cube and row_stats are given)
+          cube (pandas.DataFrame): Aggregate cube of df (see aggregate_cube.build_cube)
+          row_stats (dict): Row-level statistics of df (see aggregate_cube.row_statistics)
+    """
+    print("\n" + "="*50)
+    print("🔍 EXPLORATORY DATA ANALYSIS")
+    print("="*50)
+    
+    if cube is None:
+        cube = build_cube(df)
+    if row_stats is None:
+        row_stats = row_statistics(df)
+    columns = cube_columns(cube)
     
-    # Print summary statistics
+    if RENDER_SETTINGS['figures']:
+        plot_exploratory_dashboard(cube, columns, row_stats)
+    
+    print_summary_statistics(row_stats)
+
+def print_summary_statistics(row_stats):
+    """
+    Print the describe() figures of the measures; sketched statistics also show
+    their approximate quartiles
+    Args: row_stats (dict): Row-level statistics (see aggregate_cube.row_statistics)
+    """
+    describe = row_stats['describe']
     print("\n📈 SUMMARY STATISTICS:")
-    if 'Sales' in df.columns:
-        sales_stats = df['Sales'].describe()
+    if 'Sales' in describe:
+        sales_stats = describe['Sales']
         print("Sales Statistics:")
         print(f"   Count: {sales_stats['count']:,.0f}")
         print(f"   Mean: {sales_stats['mean']:,.2f}")
         print(f"   Std: {sales_stats['std']:,.2f}")
         print(f"   Min: {sales_stats['min']:,.2f}")
+        if '50%' in sales_stats:
+            print(f"   Quartiles (±{QUANTILE_ACCURACY:.0%}): {sales_stats['25%']:,.2f} / "
+                  f"{sales_stats['50%']:,.2f} / {sales_stats['75%']:,.2f}")
         print(f"   Max: {sales_stats['max']:,.2f}")
     
-    if 'Revenue' in df.columns:
-        revenue_stats = df['Revenue'].describe()
+    if 'Revenue' in describe:
+        revenue_stats = describe['Revenue']
         print("\nRevenue Statistics:")
         print(f"   Count: {revenue_stats['count']:,.0f}")
         print(f"   Mean: {revenue_stats['mean']:,.2f}")
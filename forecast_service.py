@@ -0,0 +1,403 @@
+# Local forecast service: warm in-memory state served over asyncio HTTP
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+import pandas as pd
+
+from aggregate_cube import build_cube, roll_up
+from batch_forecasting import FORECAST_METHODS, fit_forecast_state, forecast_from_fitted, series_matrix
+from data_cache import cached_clean_data
+from data_cleaner import clean_data
+from data_loader import DATA_FILE, load_and_prepare_data
+from frequency import future_dates, infer_frequency
+from revenue_analysis import summary_from_moments
+from walmart_data import FEATURES_FILE, STORES_FILE, TEST_FILE, TRAIN_FILE, load_walmart_dataset
+
+HOST = '127.0.0.1'
+PORT = 8765
+MAX_HORIZON = 104        # Longest horizon a /forecast request may ask for
+DEFAULT_HORIZON = 13
+CACHE_SIZE = 4096        # Response bodies kept in the LRU cache
+BATCH_WINDOW = 0.001     # Seconds the batcher waits for more forecast requests
+MAX_BATCH = 512          # Forecast requests answered by one vectorised call
+RELOAD_INTERVAL = 1.0    # Seconds between data file checks
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           503: 'Service Unavailable'}
+
+def watched_files(data_dir='.'):
+    """
+    Source files whose changes trigger a reload
+    Args: data_dir (str): Directory holding the data files
+    Returns: list: Existing paths
+    """
+    names = [DATA_FILE, TRAIN_FILE, TEST_FILE, FEATURES_FILE, STORES_FILE]
+    return [path for path in (os.path.join(data_dir, name) for name in names) if os.path.exists(path)]
+
+def file_versions(paths):
+    """Modification time and size of each path (missing files map to None)"""
+    versions = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            versions[path] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            versions[path] = None
+    return versions
+
+def _load_sales(data_dir):
+    """Cleaned sales rows, served from the columnar cache when the source is unchanged"""
+    path = os.path.join(data_dir, DATA_FILE)
+    build = lambda: clean_data(load_and_prepare_data(path), verbose=False)
+    return cached_clean_data([path], build) if os.path.exists(path) else build()
+
+def load_service_state(data_dir='.', generation=0):
+    """
+    Load the data once and fit everything the endpoints need: forecast states
+    of every Store x Dept series and the Product x Region revenue moments
+    Args: data_dir (str): Directory holding the data files
+          generation (int): Reload counter, part of every cache key
+    Returns: dict: Service state
+    """
+    start_time = time.time()
+    versions = file_versions(watched_files(data_dir))
+    
+    # Forecasts: fitted states, so any horizon is a gather plus a few products
+    dataset = load_walmart_dataset(data_dir)
+    values, series_keys, dates = series_matrix(dataset)
+    fitted = fit_forecast_state(values)
+    rows = {(int(store), int(dept)): i for i, (store, dept) in
+            enumerate(zip(series_keys['Store'], series_keys['Dept']))}
+    forecast_dates = future_dates(dates[-1], MAX_HORIZON, infer_frequency(dates), dates)
+    
+    # Summaries: additive moments per Product x Region cell
+    cube = build_cube(_load_sales(data_dir), verbose=False)
+    cells = roll_up(cube, ['Product', 'Region'])
+    
+    print(f"✅ Service state loaded in {time.time() - start_time:.2f}s: {len(rows):,} series, "
+          f"{len(cells)} Product x Region cells")
+    return {
+        'generation': generation,
+        'loaded_at': time.time(),
+        'versions': versions,
+        'fitted': fitted,
+        'rows': rows,
+        'future_dates': forecast_dates.strftime('%Y-%m-%d').tolist(),
+        'cells': cells
+    }
+
+def _json_values(array):
+    """Rounded floats for JSON, with None for missing forecasts"""
+    return [None if np.isnan(value) else round(value, 2) for value in array.tolist()]
+
+def forecast_bodies(state, requests):
+    """
+    Answer many forecast requests with one vectorised call
+    Args: state (dict): Service state
+          requests (list): (store, dept, horizon) tuples of known series
+    Returns: list: JSON response bodies (bytes), in request order
+    """
+    rows = np.array([state['rows'][(store, dept)] for store, dept, _ in requests])
+    horizon = max(h for _, _, h in requests)
+    forecasts = forecast_from_fitted(state['fitted'], horizon, rows)
+    bodies = []
+    for i, (store, dept, h) in enumerate(requests):
+        body = {'store': store, 'dept': dept, 'horizon': h, 'dates': state['future_dates'][:h]}
+        for method in FORECAST_METHODS:
+            body[method] = _json_values(forecasts[method][i, :h])
+        bodies.append(json.dumps(body).encode())
+    return bodies
+
+def summary_body(state, product=None, region=None):
+    """
+    Sales and revenue summary of the rows matching a product and/or region
+    Args: state (dict): Service state
+          product, region (str): Labels to filter on (None for all)
+    Returns: dict or None: Summary, or None when no cell matches
+    """
+    cells = state['cells']
+    match = np.ones(len(cells), dtype=bool)
+    if product:
+        match &= cells.index.get_level_values('Product') == product
+    if region:
+        match &= cells.index.get_level_values('Region') == region
+    if not match.any():
+        return None
+    totals = cells[match].sum()
+    moments = pd.DataFrame({'sum': [totals['Revenue_sum']], 'count': [totals['Revenue_count']],
+                            'sumsq': [totals['Revenue_sumsq']]})
+    revenue = summary_from_moments(moments).iloc[0]
+    grand_total = cells['Revenue_sum'].sum()
+    return {
+        'product': product,
+        'region': region,
+        'rows': int(totals['rows']),
+        'sales': round(float(totals['Sales_sum']), 2),
+        'revenue': round(float(revenue['sum']), 2),
+        'revenue_mean': round(float(revenue['mean']), 2),
+        'revenue_std': None if np.isnan(revenue['std']) else round(float(revenue['std']), 2),
+        'revenue_share': round(float(totals['Revenue_sum'] / grand_total * 100), 2) if grand_total else None
+    }
+
+def cache_get(service, key):
+    """LRU lookup: a hit becomes the most recently used entry"""
+    cache = service['cache']
+    body = cache.get(key)
+    if body is not None:
+        cache.move_to_end(key)
+        service['stats']['cache_hits'] += 1
+    return body
+
+def cache_put(service, key, body):
+    """LRU insert, evicting the least recently used entry beyond CACHE_SIZE"""
+    cache = service['cache']
+    cache[key] = body
+    cache.move_to_end(key)
+    while len(cache) > service['cache_size']:
+        cache.popitem(last=False)
+
+async def batch_worker(service):
+    """
+    Collect forecast requests that arrive within BATCH_WINDOW of each other and
+    answer them with one forecast_from_fitted call per state generation
+    Args: service (dict): Running service
+    """
+    queue = service['queue']
+    while True:
+        batch = [await queue.get()]
+        await asyncio.sleep(service['batch_window'])
+        while not queue.empty() and len(batch) < MAX_BATCH:
+            batch.append(queue.get_nowait())
+        service['stats']['batches'] += 1
+        service['stats']['batched_requests'] += len(batch)
+        
+        # Requests queued before a reload are answered from the state they saw
+        by_state = {}
+        for state, request, future in batch:
+            by_state.setdefault(id(state), (state, []))[1].append((request, future))
+        for state, items in by_state.values():
+            try:
+                bodies = forecast_bodies(state, [request for request, _ in items])
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), body in zip(items, bodies):
+                if not future.done():
+                    future.set_result(body)
+
+async def watch_files(service):
+    """
+    Poll the data files and swap in a freshly loaded state when one changes.
+    Loading runs in a worker thread; requests keep being served from the old
+    state until the new one is ready.
+    Args: service (dict): Running service
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(service['reload_interval'])
+        state = service['state']
+        if file_versions(state['versions']) == state['versions'] and \
+                set(watched_files(service['data_dir'])) == set(state['versions']):
+            continue
+        print("🔄 Data files changed, reloading...")
+        try:
+            fresh = await loop.run_in_executor(None, load_service_state, service['data_dir'],
+                                               state['generation'] + 1)
+        except Exception as e:
+            print(f"❌ Reload failed, still serving the previous data: {e}")
+            state['versions'] = file_versions(state['versions'])
+            continue
+        service['state'] = fresh
+        service['cache'].clear()
+        service['stats']['reloads'] += 1
+
+def _int_param(query, name, default=None):
+    """Integer query parameter; raises ValueError with a client-facing message"""
+    value = query.get(name, default)
+    if value is None:
+        raise ValueError(f"missing parameter '{name}'")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"parameter '{name}' must be an integer")
+
+async def route(service, method, target):
+    """
+    Dispatch one request
+    Args: service (dict): Running service
+          method (str): HTTP method
+          target (str): Request target (path and query string)
+    Returns: tuple: (status code, JSON body bytes)
+    """
+    if method != 'GET':
+        return 405, b'{"error": "only GET is supported"}'
+    url = urlsplit(target)
+    query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+    state = service['state']
+    service['stats']['requests'] += 1
+    
+    if url.path == '/forecast':
+        try:
+            store, dept = _int_param(query, 'store'), _int_param(query, 'dept')
+            horizon = _int_param(query, 'horizon', DEFAULT_HORIZON)
+        except ValueError as e:
+            return 400, json.dumps({'error': str(e)}).encode()
+        if not 1 <= horizon <= MAX_HORIZON:
+            return 400, json.dumps({'error': f"horizon must be between 1 and {MAX_HORIZON}"}).encode()
+        if (store, dept) not in state['rows']:
+            return 404, json.dumps({'error': f"no series for store {store}, dept {dept}"}).encode()
+        key = (state['generation'], 'forecast', store, dept, horizon)
+        body = cache_get(service, key)
+        if body is None:
+            future = asyncio.get_running_loop().create_future()
+            service['queue'].put_nowait((state, (store, dept, horizon), future))
+            body = await future
+            cache_put(service, key, body)
+        return 200, body
+    
+    if url.path == '/summary':
+        product, region = query.get('product'), query.get('region')
+        key = (state['generation'], 'summary', product, region)
+        body = cache_get(service, key)
+        if body is None:
+            summary = summary_body(state, product, region)
+            if summary is None:
+                return 404, json.dumps({'error': "no rows for this product/region"}).encode()
+            body = json.dumps(summary).encode()
+            cache_put(service, key, body)
+        return 200, body
+    
+    if url.path == '/health':
+        cells = state['cells'].index
+        return 200, json.dumps({
+            'status': 'ok',
+            'generation': state['generation'],
+            'loaded_at': state['loaded_at'],
+            'series': len(state['rows']),
+            'products': sorted(map(str, cells.get_level_values('Product').unique())),
+            'regions': sorted(map(str, cells.get_level_values('Region').unique())),
+            'stats': dict(service['stats'], cache_entries=len(service['cache']))
+        }).encode()
+    
+    if url.path == '/series':
+        return 200, json.dumps(sorted(state['rows'])).encode()
+    
+    return 404, json.dumps({'error': f"unknown path {url.path}"}).encode()
+
+async def handle_connection(service, reader, writer):
+    """Serve HTTP/1.1 requests on one connection (keep-alive until the client closes)"""
+    service['connections'].add(writer)
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            
+            parts = request_line.decode('latin-1').split()
+            if len(parts) != 3:
+                status, body, version = 400, b'{"error": "malformed request line"}', 'HTTP/1.0'
+            else:
+                method, target, version = parts
+                try:
+                    status, body = await route(service, method, target)
+                except Exception as e:
+                    status, body = 503, json.dumps({'error': str(e)}).encode()
+            
+            keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+            writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                         f"Content-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\n"
+                         f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        service['connections'].discard(writer)
+        writer.close()
+
+async def start_service(host=HOST, port=PORT, data_dir='.', cache_size=CACHE_SIZE,
+                        batch_window=BATCH_WINDOW, reload_interval=RELOAD_INTERVAL):
+    """
+    Load the state and start listening (call from a running event loop)
+    Args: host (str): Interface to bind (localhost by default)
+          port (int): TCP port (0 picks a free one)
+          data_dir (str): Directory holding the data files
+          cache_size (int): LRU cache entries
+          batch_window (float): Seconds the batcher waits for more requests
+          reload_interval (float): Seconds between data file checks
+    Returns: dict: Running service ('server', 'port', 'state', 'tasks', ...)
+    """
+    loop = asyncio.get_running_loop()
+    service = {
+        'data_dir': data_dir,
+        'state': await loop.run_in_executor(None, load_service_state, data_dir),
+        'cache': OrderedDict(),
+        'cache_size': cache_size,
+        'queue': asyncio.Queue(),
+        'batch_window': batch_window,
+        'reload_interval': reload_interval,
+        'connections': set(),
+        'stats': {'requests': 0, 'cache_hits': 0, 'batches': 0, 'batched_requests': 0, 'reloads': 0}
+    }
+    service['tasks'] = [asyncio.create_task(batch_worker(service)),
+                        asyncio.create_task(watch_files(service))]
+    service['server'] = await asyncio.start_server(
+        lambda reader, writer: handle_connection(service, reader, writer), host, port)
+    service['port'] = service['server'].sockets[0].getsockname()[1]
+    return service
+
+async def stop_service(service):
+    """Close the listener and open keep-alive connections, then cancel the background tasks"""
+    service['server'].close()
+    for writer in list(service['connections']):
+        writer.close()
+    await service['server'].wait_closed()
+    for task in service['tasks']:
+        task.cancel()
+    await asyncio.gather(*service['tasks'], return_exceptions=True)
+
+async def run_service(host=HOST, port=PORT, data_dir='.', **options):
+    """Serve until interrupted"""
+    service = await start_service(host, port, data_dir, **options)
+    print("\n" + "="*50)
+    print(f"🌐 FORECAST SERVICE on http://{host}:{service['port']}")
+    print("="*50)
+    print("   /forecast?store=1&dept=1&horizon=13")
+    print("   /summary?product=&region=")
+    print("   /health, /series")
+    try:
+        await service['server'].serve_forever()
+    finally:
+        await stop_service(service)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve forecasts and summaries from memory")
+    parser.add_argument('--host', default=HOST, help="interface to bind")
+    parser.add_argument('--port', type=int, default=PORT, help="TCP port")
+    parser.add_argument('--data-dir', default='.', help="directory holding the data files")
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help="LRU cache entries")
+    parser.add_argument('--batch-window', type=float, default=BATCH_WINDOW,
+                        help="seconds to wait for more forecast requests before answering a batch")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run_service(args.host, args.port, args.data_dir, cache_size=args.cache_size,
+                                batch_window=args.batch_window))
+    except KeyboardInterrupt:
+        print("\n👋 Service stopped")
\ No newline at end of file
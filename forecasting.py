@@ -1,15 +1,109 @@
  # Forecasting models
 
-import matplotlib.pyplot as plt
-import seaborn as sns
 import pandas as pd
 import numpy as np
-from sklearn.metrics import mean_absolute_error, mean_squared_error
+from holt_winters import holt_winters_forecast
+from frequency import FREQUENCIES, future_dates, infer_frequency, same_week_last_year, season_length, window_periods
+from rendering import RENDER_SETTINGS, load_pyplot, save_figure
+from profiler import stage
 
 def setup_plot_style():
-    """Set up consistent plot style"""
+    """
+    Set up consistent plot style
+    Returns: tuple: (matplotlib.pyplot, seaborn), imported on first use
+    """
+    import seaborn as sns
+    plt = load_pyplot()
     plt.style.use('seaborn-v0_8')
     sns.set_palette("husl")
+    return plt, sns
+
+# Parameters of simple_forecasting unless tuned ones are passed (see tuning.py)
+DEFAULT_PARAMS = {'window': 12, 'alpha': 0.3, 'season_lag': 12}
+
+def default_params(frequency='monthly'):
+    """
+    DEFAULT_PARAMS in periods of the data frequency (a 12-month window, one-year lag)
+    Args: frequency (str): Key of frequency.FREQUENCIES
+    Returns: dict: 'window', 'alpha' and 'season_lag'
+    """
+    return {
+        'window': window_periods(DEFAULT_PARAMS['window'], frequency),
+        'alpha': DEFAULT_PARAMS['alpha'],
+        'season_lag': season_length(frequency)
+    }
+
+# Periods per block of the blocked smoothing recursion
+SMOOTHING_BLOCK = 64
+
+def _smoothing_weights(alphas, block):
+    """
+    Lower-triangular weights W[a, i, j] = alpha_a * (1 - alpha_a)^(i - j) for j <= i
+    and carry decay D[a, i] = (1 - alpha_a)^(i + 1) for one block of the recursion
+    """
+    lags = np.arange(block)[:, None] - np.arange(block)[None, :]
+    damping = (1 - alphas)[:, None, None]
+    weights = np.where(lags >= 0, alphas[:, None, None] * damping ** np.maximum(lags, 0), 0.0)
+    decay = (1 - alphas)[:, None] ** (np.arange(block) + 1)[None, :]
+    return weights, decay
+
+def exponential_smoothing_matrix(values, alphas=0.3, block=SMOOTHING_BLOCK):
+    """
+    Simple exponential smoothing of many series for one or many alphas at once.
+    The recursion is evaluated block by block: inside a block the smoothed values
+    are a matrix product with a small weight matrix, and only the last level is
+    carried into the next block.
+    Args: values (array-like): (series x period) array without gaps, or a single series
+          alphas (float or array-like): Smoothing parameter(s) (0-1)
+          block (int): Periods per block
+    Returns: numpy.ndarray: Smoothed values, shape (alphas x series x period) for a
+                            vector of alphas, (series x period) for a scalar alpha,
+                            with the series axis dropped for 1-D input
+    """
+    values = np.asarray(values, dtype=np.float64)
+    single_series = values.ndim == 1
+    values = np.atleast_2d(values)
+    scalar_alpha = np.ndim(alphas) == 0
+    alphas = np.atleast_1d(np.asarray(alphas, dtype=np.float64))
+    
+    n_periods = values.shape[1]
+    result = np.empty((len(alphas),) + values.shape)
+    # 0 * NaN is NaN in the matrix product, so non-finite values are zeroed here
+    # and their rows finished by the sequential recursion below
+    finite = np.isfinite(values)
+    masked = np.where(finite, values, 0.0)
+    
+    weights, decay = _smoothing_weights(alphas, max(min(block, n_periods), 1))
+    # First value is same as series: a carry of x[0] reproduces s[0] = x[0]
+    level = np.repeat(masked[None, :, 0], len(alphas), axis=0) if n_periods else None
+    for start in range(0, n_periods, block):
+        stop = min(start + block, n_periods)
+        width = stop - start
+        smoothed = masked[None, :, start:stop] @ weights[:, :width, :width].transpose(0, 2, 1)
+        smoothed += level[:, :, None] * decay[:, None, :width]
+        result[:, :, start:stop] = smoothed
+        level = smoothed[:, :, -1]
+    
+    # Values before the first NaN or inf are exact; from there on it spreads forward only
+    for row in np.flatnonzero(~finite.all(axis=1)):
+        first = int(np.argmin(finite[row]))
+        level = values[row, 0] if first == 0 else result[:, row, first - 1]
+        for n in range(max(first, 1), n_periods):
+            level = alphas * values[row, n] + (1 - alphas) * level
+            result[:, row, n] = level
+        if first == 0:
+            result[:, row, 0] = values[row, 0]
+    
+    if single_series:
+        result = result[:, 0]
+    return result[0] if scalar_alpha else result
+
+def _exponential_smoothing_loop(series, alpha=0.3):
+    """Reference per-element recursion, kept for tolerance checks and benchmarks"""
+    result = [series[0]]  # First value is same as series
+    for n in range(1, len(series)):
+        result.append(alpha * series[n] + (1 - alpha) * result[n-1])
+    return result
 
 def exponential_smoothing(series, alpha=0.3):
     """
@@ -18,56 +112,95 @@ def exponential_smoothing(series, alpha=0.3):
           alpha (float): Smoothing parameter (0-1)
     Returns: list: Smoothed values
     """
-    result = [series[0]]  # First value is same as series
-    for n in range(1, len(series)):
-        result.append(alpha * series[n] + (1 - alpha) * result[n-1])
-    return result
+    return exponential_smoothing_matrix(series, alpha).tolist()
 
-def simple_forecasting(monthly_data):
+def benchmark_exponential_smoothing(n_series=1000, n_periods=143, alphas=(0.1, 0.2, 0.3, 0.5, 0.7)):
     """
-    Implement simple forecasting using rolling mean and exponential smoothing
-    Args: monthly_data (pandas.DataFrame): Monthly aggregated data
+    Micro-benchmark: per-element loop vs the vectorised kernel on an alpha grid
+    Args: n_series (int): Number of series
+          n_periods (int): Periods per series
+          alphas (tuple): Smoothing parameters evaluated
     """
-    print("\n" + "="*50)
-    print("🔮 SIMPLE FORECASTING")
-    print("="*50)
-    
-    setup_plot_style()
-    
-    # Prepare data for forecasting
-    sales_series = monthly_data['Sales'].dropna()
+    import time
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(10, 0.5, (n_series, n_periods))
     
-    if len(sales_series) < 12:
-        print("❌ Insufficient data for forecasting. Need at least 12 months of data.")
-        return
+    start = time.perf_counter()
+    loop = np.array([[_exponential_smoothing_loop(row, alpha) for row in values] for alpha in alphas])
+    loop_time = time.perf_counter() - start
     
-    # Method 1: Rolling Mean Forecast
-    forecast_horizon = 6  # Forecast next 6 months
-    last_rolling_mean = sales_series.rolling(window=12).mean().iloc[-1]
-    rolling_forecast = [last_rolling_mean] * forecast_horizon
+    start = time.perf_counter()
+    vectorised = exponential_smoothing_matrix(values, alphas)
+    vectorised_time = time.perf_counter() - start
     
-    # Method 2: Simple Exponential Smoothing
-    exp_smooth = exponential_smoothing(sales_series.values, alpha=0.3)
-    last_exp_smooth = exp_smooth[-1]
-    exp_forecast = [last_exp_smooth] * forecast_horizon
+    max_error = np.max(np.abs(loop - vectorised) / np.abs(loop))
+    print(f"⏱️  Exponential smoothing: {n_series:,} series x {n_periods} periods x {len(alphas)} alphas")
+    print(f"   Python loop: {loop_time:.3f}s")
+    print(f"   Vectorised:  {vectorised_time:.3f}s ({loop_time / vectorised_time:,.0f}x faster)")
+    print(f"   Max relative difference: {max_error:.2e}")
     
-    # Method 3: Seasonal Naive (using same month last year)
-    seasonal_forecast = []
-    if len(sales_series) >= 12:
-        last_year_data = sales_series[-12:]
-        for i in range(forecast_horizon):
-            seasonal_forecast.append(last_year_data.iloc[i % 12])
-    
-    # Create future dates for forecast
-    last_date = sales_series.index[-1]
-    future_dates = pd.date_range(
-        start=last_date + pd.DateOffset(months=1),
-        periods=forecast_horizon,
-        freq='M'
-    )
+    # A missing value only spreads forward, as in the loop
+    gaps = values[:10].copy()
+    gaps[:, n_periods // 2] = np.nan
+    loop = np.array([_exponential_smoothing_loop(row, alphas[0]) for row in gaps])
+    vectorised = exponential_smoothing_matrix(gaps, alphas[0])
+    matches = np.array_equal(np.isnan(loop), np.isnan(vectorised)) and \
+        np.allclose(loop, vectorised, rtol=1e-9, equal_nan=True)
+    print(f"   NaN handling matches the loop: {'yes' if matches else 'no'}")
+
+def method_column(method):
+    """Forecast column of a method name, e.g. 'Seasonal Naive' -> 'Seasonal_Naive_Forecast'"""
+    return f"{method.replace(' ', '_').replace('-', '_')}_Forecast"
+
+def forecast_metrics(actual, predicted):
+    """
+    Holdout accuracy of one forecast
+    Args: actual (array-like): Observed values
+          predicted (array-like): Forecast values
+    Returns: dict: 'MAE', 'RMSE' and 'MAPE' (percent)
+    """
+    actual = np.asarray(actual, dtype=np.float64)
+    errors = actual - np.asarray(predicted, dtype=np.float64)
+    return {
+        'MAE': np.mean(np.abs(errors)),
+        'RMSE': np.sqrt(np.mean(errors ** 2)),
+        'MAPE': np.mean(np.abs(errors / actual)) * 100
+    }
+
+def seasonal_naive(history, horizon, season_lag, targets=None, iso_aligned=False):
+    """
+    Seasonal naive forecast: the value one season earlier
+    Args: history (pandas.Series): Observations with a DatetimeIndex
+          horizon (int): Periods to forecast
+          season_lag (int): Periods per season
+          targets (pandas.DatetimeIndex): Forecast dates (needed when iso_aligned)
+          iso_aligned (bool): Weekly data: take the same ISO week of the previous year,
+                              falling back to the lag where that week was not observed
+    Returns: list: Forecast values (empty with less than one season of history)
+    """
+    if len(history) < season_lag:
+        return []
+    last_season = history.iloc[-season_lag:]
+    forecast = [last_season.iloc[i % season_lag] for i in range(horizon)]
+    if iso_aligned:
+        positions = same_week_last_year(history.index, targets)
+        forecast = [history.iloc[p] if p >= 0 else value for p, value in zip(positions, forecast)]
+    return forecast
+
+def plot_forecasts(sales_series, exp_smooth, future_dates, rolling_forecast, exp_forecast,
+                   seasonal_forecast, hw_forecast):
+    """
+    Draw and save the history with every method's forecast
+    Args: sales_series (pandas.Series): Historical sales
+          exp_smooth (list): Exponential smoothing of the history
+          future_dates (pandas.DatetimeIndex): Forecast dates
+          rolling_forecast, exp_forecast, seasonal_forecast, hw_forecast (list): Forecasts
+                                      (seasonal and Holt-Winters may be empty)
+    """
+    plt, _ = setup_plot_style()
     
     # Plot historical data and forecasts
-    plt.figure(figsize=(14, 8))
+    fig = plt.figure(figsize=(14, 8))
     
     # Plot historical data
     plt.plot(sales_series.index, sales_series.values, 
@@ -87,17 +220,84 @@ def simple_forecasting(monthly_data):
         plt.plot(future_dates, seasonal_forecast, 
                  label='Seasonal Naive Forecast', linewidth=3, color='purple', linestyle='--', marker='^')
     
+    if hw_forecast:
+        plt.plot(future_dates, hw_forecast, 
+                 label='Holt-Winters Forecast', linewidth=3, color='brown', linestyle='--', marker='D')
+    
     plt.title('Sales Forecasting using Multiple Methods', fontsize=16, fontweight='bold')
     plt.xlabel('Date')
     plt.ylabel('Sales')
     plt.legend()
     plt.grid(True, alpha=0.3)
-    plt.savefig('sales_forecasting.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    save_figure(fig, 'sales_forecasting')
+
+def simple_forecasting(monthly_data, params=None, forecast_horizon=None):
+    """
+    Implement simple forecasting using rolling mean and exponential smoothing
+    Args: monthly_data (pandas.DataFrame): Aggregated data (monthly, weekly or daily,
+                                           see time_series_analysis.build_monthly_data)
+          params (dict): 'window', 'alpha' and 'season_lag' (default: default_params of
+                         the data frequency), e.g. one row of tuning.tune_parameters; its
+                         'method' adds that method's forecast as 'Recommended_Forecast'
+          forecast_horizon (int): Periods to forecast and to hold out for accuracy
+                                  (default: 6 months of periods)
+    """
+    print("\n" + "="*50)
+    print("🔮 SIMPLE FORECASTING")
+    print("="*50)
+    
+    # Prepare data for forecasting
+    sales_series = monthly_data['Sales'].dropna()
+    frequency = infer_frequency(sales_series.index)
+    unit = FREQUENCIES[frequency]['unit']
+    min_history = window_periods(12, frequency)
+    season = season_length(frequency)
+    if forecast_horizon is None:
+        forecast_horizon = window_periods(6, frequency)
+    
+    if len(sales_series) < min_history:
+        print(f"❌ Insufficient data for forecasting. Need at least {min_history} {unit}s of data.")
+        return
+    
+    tuned = bool(params)
+    recommended = (params or {}).get('method')
+    # Weekly data without a tuned lag follows the ISO calendar (52 or 53 weeks back)
+    iso_aligned = frequency == 'weekly' and 'season_lag' not in (params or {})
+    params = dict(default_params(frequency), **(params or {}))
+    window, alpha, season_lag = int(params['window']), float(params['alpha']), int(params['season_lag'])
+    if tuned:
+        print(f"🎛️  Tuned parameters: window={window}, alpha={alpha:g}, season lag={season_lag}")
+    
+    # Method 1: Rolling Mean Forecast
+    with stage('forecast Rolling Mean', rows=len(sales_series)):
+        last_rolling_mean = sales_series.rolling(window=window).mean().iloc[-1]
+        rolling_forecast = [last_rolling_mean] * forecast_horizon
+    
+    # Method 2: Simple Exponential Smoothing
+    with stage('forecast Exponential Smoothing', rows=len(sales_series)):
+        exp_smooth = exponential_smoothing(sales_series.values, alpha=alpha)
+        last_exp_smooth = exp_smooth[-1]
+        exp_forecast = [last_exp_smooth] * forecast_horizon
+    
+    # Create future dates for forecast
+    forecast_dates = future_dates(sales_series.index[-1], forecast_horizon, frequency, sales_series.index)
+    
+    # Method 3: Seasonal Naive (using same month, or ISO week, last year)
+    seasonal_forecast = seasonal_naive(sales_series, forecast_horizon, season_lag, forecast_dates, iso_aligned)
+    
+    # Method 4: Holt-Winters (additive trend and one-year seasonality)
+    hw_forecast = []
+    if len(sales_series) >= 2 * season:
+        with stage('forecast Holt-Winters', rows=len(sales_series)):
+            hw_forecast = list(holt_winters_forecast(sales_series.values, forecast_horizon, season_length=season))
+    
+    if RENDER_SETTINGS['figures']:
+        plot_forecasts(sales_series, exp_smooth, forecast_dates, rolling_forecast, exp_forecast,
+                       seasonal_forecast, hw_forecast)
     
     # Create forecast dataframe
     forecast_data = {
-        'Date': future_dates,
+        'Date': forecast_dates,
         'Rolling_Mean_Forecast': rolling_forecast,
         'Exponential_Smoothing_Forecast': exp_forecast
     }
@@ -105,56 +305,57 @@ def simple_forecasting(monthly_data):
     if seasonal_forecast:
         forecast_data['Seasonal_Naive_Forecast'] = seasonal_forecast
     
+    if hw_forecast:
+        forecast_data['Holt_Winters_Forecast'] = hw_forecast
+    
+    # Method with the lowest backtest error in the grid search
+    if recommended and method_column(recommended) in forecast_data:
+        forecast_data['Recommended_Forecast'] = forecast_data[method_column(recommended)]
+        print(f"🏅 Recommended method (lowest backtest MAE): {recommended}")
+    
     forecast_df = pd.DataFrame(forecast_data)
     
-    print("📅 FORECAST FOR NEXT 6 MONTHS:")
+    print(f"📅 FORECAST FOR NEXT {forecast_horizon} {unit.upper()}S:")
     print(forecast_df.round(2))
     
-    # Calculate forecast accuracy on last 6 months of historical data
-    if len(sales_series) >= 18:  # Need enough data for holdout test
-        train_data = sales_series[:-6]
-        test_data = sales_series[-6:]
+    # Calculate forecast accuracy on the last forecast_horizon periods of historical data
+    if len(sales_series) >= min_history + forecast_horizon:  # Need enough data for holdout test
+        train_data = sales_series[:-forecast_horizon]
+        test_data = sales_series[-forecast_horizon:]
         
         # Rolling mean forecast for test period
-        rolling_pred = [train_data.rolling(window=12).mean().iloc[-1]] * 6
+        rolling_pred = [train_data.rolling(window=window).mean().iloc[-1]] * forecast_horizon
         
         # Exponential smoothing forecast for test period
-        exp_train = exponential_smoothing(train_data.values, alpha=0.3)
-        exp_pred = [exp_train[-1]] * 6
+        exp_train = exponential_smoothing(train_data.values, alpha=alpha)
+        exp_pred = [exp_train[-1]] * forecast_horizon
         
         # Seasonal naive forecast for test period
-        seasonal_pred = []
-        if len(train_data) >= 12:
-            seasonal_train = train_data[-12:]
-            for i in range(6):
-                seasonal_pred.append(seasonal_train.iloc[i % 12])
+        seasonal_pred = seasonal_naive(train_data, forecast_horizon, season_lag, test_data.index, iso_aligned)
+        
+        # Holt-Winters forecast for test period
+        hw_pred = []
+        if len(train_data) >= 2 * season:
+            hw_pred = holt_winters_forecast(train_data.values, forecast_horizon, season_length=season)
         
         # Calculate metrics
         metrics = {}
         
         # Rolling Mean metrics
-        metrics['Rolling Mean'] = {
-            'MAE': mean_absolute_error(test_data, rolling_pred),
-            'RMSE': np.sqrt(mean_squared_error(test_data, rolling_pred)),
-            'MAPE': np.mean(np.abs((test_data - rolling_pred) / test_data)) * 100
-        }
+        metrics['Rolling Mean'] = forecast_metrics(test_data, rolling_pred)
         
         # Exponential Smoothing metrics
-        metrics['Exponential Smoothing'] = {
-            'MAE': mean_absolute_error(test_data, exp_pred),
-            'RMSE': np.sqrt(mean_squared_error(test_data, exp_pred)),
-            'MAPE': np.mean(np.abs((test_data - exp_pred) / test_data)) * 100
-        }
+        metrics['Exponential Smoothing'] = forecast_metrics(test_data, exp_pred)
         
         # Seasonal Naive metrics
         if seasonal_pred:
-            metrics['Seasonal Naive'] = {
-                'MAE': mean_absolute_error(test_data, seasonal_pred),
-                'RMSE': np.sqrt(mean_squared_error(test_data, seasonal_pred)),
-                'MAPE': np.mean(np.abs((test_data - seasonal_pred) / test_data)) * 100
-            }
+            metrics['Seasonal Naive'] = forecast_metrics(test_data, seasonal_pred)
         
-        print(f"\n📊 FORECAST ACCURACY (Last 6 months holdout):")
+        # Holt-Winters metrics
+        if len(hw_pred):
+            metrics['Holt-Winters'] = forecast_metrics(test_data, hw_pred)
+        
+        print(f"\n📊 FORECAST ACCURACY (Last {forecast_horizon} {unit}s holdout):")
         for method, method_metrics in metrics.items():
             print(f"\n{method}:")
             print(f"   MAE:  {method_metrics['MAE']:.2f}")
@@ -164,10 +365,21 @@ def simple_forecasting(monthly_data):
     return forecast_df
 
 if __name__ == "__main__":
-    from data_loader import create_sample_data
-    from data_cleaner import clean_data
+    import sys
+    if '--benchmark' in sys.argv:
+        benchmark_exponential_smoothing()
+        sys.exit()
+    
     from time_series_analysis import time_series_analysis
-    test_df = create_sample_data()
-    cleaned_df = clean_data(test_df)
-    monthly_data = time_series_analysis(cleaned_df)
+    if '--walmart' in sys.argv:
+        # Weekly totals: 52/53-week seasonality and ISO-week seasonal naive
+        from walmart_data import load_walmart_dataset
+        weekly = load_walmart_dataset().rename(columns={'Weekly_Sales': 'Sales'})
+        monthly_data = time_series_analysis(weekly[['Date', 'Sales', 'IsHoliday']])
+    else:
+        from data_loader import create_sample_data
+        from data_cleaner import clean_data
+        test_df = create_sample_data()
+        cleaned_df = clean_data(test_df)
+        monthly_data = time_series_analysis(cleaned_df)
     forecast_df = simple_forecasting(monthly_data)
\ No newline at end of file
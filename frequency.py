@@ -0,0 +1,156 @@
+# Frequency inference and calendar helpers for daily, weekly and monthly series
+
+import numpy as np
+import pandas as pd
+
+def _month_end_alias():
+    """'ME' on pandas 2.2+, where the old 'M' alias is deprecated"""
+    try:
+        pd.tseries.frequencies.to_offset('ME')
+        return 'ME'
+    except ValueError:
+        return 'M'
+
+MONTH_END = _month_end_alias()
+
+# Supported frequencies: typical spacing in days, periods per year and the unit
+# used in reports. Weekly seasonality follows ISO weeks (52 or 53 per year).
+FREQUENCIES = {
+    'daily': {'days': 1, 'periods_per_year': 365, 'unit': 'day'},
+    'weekly': {'days': 7, 'periods_per_year': 52, 'unit': 'week'},
+    'monthly': {'days': 30.44, 'periods_per_year': 12, 'unit': 'month'}
+}
+
+# Moving averages as spans of time (months), whatever the data frequency
+MOVING_AVERAGE_MONTHS = [3, 6, 12]
+
+def infer_frequency(dates):
+    """
+    Infer the sampling frequency from the median spacing of the distinct dates
+    Args: dates (array-like): Datetime values (any order, duplicates allowed)
+    Returns: str: 'daily', 'weekly' or 'monthly' (monthly with fewer than two dates)
+    """
+    values = np.unique(np.asarray(pd.DatetimeIndex(dates).dropna(), dtype='datetime64[D]'))
+    if len(values) < 2:
+        return 'monthly'
+    spacing = np.median(np.diff(values).astype(np.float64))
+    # Nearest supported spacing on a log scale
+    return min(FREQUENCIES, key=lambda name: abs(np.log(spacing / FREQUENCIES[name]['days'])))
+
+def window_periods(months, frequency):
+    """
+    Number of periods spanning a number of months
+    Args: months (float): Span in months
+          frequency (str): Key of FREQUENCIES
+    Returns: int: Periods (at least 1)
+    """
+    return max(int(round(months * FREQUENCIES[frequency]['periods_per_year'] / 12)), 1)
+
+def season_length(frequency):
+    """Periods per seasonal cycle (one year)"""
+    return FREQUENCIES[frequency]['periods_per_year']
+
+def period_alias(frequency, dates=None):
+    """
+    pandas offset alias of the frequency, anchored like the observed dates
+    (weekly dates keep their weekday, monthly dates their month start or end)
+    Args: frequency (str): Key of FREQUENCIES
+          dates (pandas.DatetimeIndex): Observed dates (optional)
+    Returns: str or None: Alias, or None when the dates are not regularly anchored
+    """
+    if frequency == 'daily':
+        return 'D'
+    if frequency == 'weekly':
+        if dates is None or not len(dates):
+            return 'W-FRI'
+        weekdays = np.unique(dates.dayofweek)
+        return f"W-{dates[0].day_name()[:3].upper()}" if len(weekdays) == 1 else None
+    if dates is None or dates.is_month_end.all():
+        return MONTH_END
+    return 'MS' if dates.is_month_start.all() else None
+
+def future_dates(last_date, horizon, frequency, dates=None):
+    """
+    Dates of the next periods after the last observation
+    Args: last_date (pandas.Timestamp): Last observed date
+          horizon (int): Number of periods
+          frequency (str): Key of FREQUENCIES
+          dates (pandas.DatetimeIndex): Observed dates, to anchor weekly periods
+    Returns: pandas.DatetimeIndex: Forecast dates
+    """
+    if frequency == 'monthly':
+        # One month on, rolled to the month end (the convention of the monthly reports)
+        return pd.date_range(start=last_date + pd.DateOffset(months=1), periods=horizon, freq=MONTH_END)
+    alias = period_alias(frequency, dates) or period_alias(frequency, pd.DatetimeIndex([last_date]))
+    return pd.date_range(start=last_date, periods=horizon + 1, freq=alias)[1:]
+
+def regular_index(index, frequency):
+    """
+    Complete, gap-free period grid covering the observed dates, so that rolling
+    windows count time rather than rows. Irregularly anchored dates are kept as they are.
+    Args: index (pandas.DatetimeIndex): Sorted observed dates
+          frequency (str): Key of FREQUENCIES
+    Returns: pandas.DatetimeIndex: Grid (the input when no regular grid applies)
+    """
+    alias = period_alias(frequency, index)
+    if alias is None or len(index) < 2:
+        return index
+    grid = pd.date_range(index[0], index[-1], freq=alias, name=index.name)
+    return grid if grid.isin(index).sum() == len(index) else index
+
+def iso_weeks(dates):
+    """
+    ISO year and week number (1-53) of each date
+    Args: dates (pandas.DatetimeIndex): Dates
+    Returns: tuple: (iso_year, iso_week) as int arrays
+    """
+    calendar = dates.isocalendar()
+    return calendar['year'].to_numpy(dtype=np.int64), calendar['week'].to_numpy(dtype=np.int64)
+
+def same_week_last_year(history, targets):
+    """
+    Position in history of the same ISO week one ISO year before each target.
+    Week 53 falls back to week 52 when the previous year had only 52 weeks.
+    Args: history (pandas.DatetimeIndex): Observed dates, sorted
+          targets (pandas.DatetimeIndex): Dates to align
+    Returns: numpy.ndarray: Positions into history, -1 when that week was not observed
+    """
+    years, weeks = iso_weeks(history)
+    keys = years * 100 + weeks
+    target_years, target_weeks = iso_weeks(targets)
+    wanted = (target_years - 1) * 100 + target_weeks
+    positions = np.searchsorted(keys, wanted)
+    found = (positions < len(keys)) & (keys[np.minimum(positions, len(keys) - 1)] == wanted)
+    # 53rd weeks without a counterpart use week 52 of the previous year
+    fallback = ~found & (target_weeks == 53)
+    if fallback.any():
+        positions[fallback] = np.searchsorted(keys, wanted[fallback] - 1)
+        found[fallback] = (positions[fallback] < len(keys)) & \
+            (keys[np.minimum(positions[fallback], len(keys) - 1)] == wanted[fallback] - 1)
+    return np.where(found, positions, -1)
+
+def seasonal_key(dates, frequency):
+    """
+    Position of each date within its seasonal cycle: ISO week for weekly data,
+    calendar month for monthly data, day of year for daily data
+    Args: dates (pandas.DatetimeIndex): Dates
+          frequency (str): Key of FREQUENCIES
+    Returns: pandas.Index: Keys named 'Week', 'Month' or 'Day'
+    """
+    if frequency == 'weekly':
+        return pd.Index(iso_weeks(dates)[1], name='Week')
+    if frequency == 'monthly':
+        return pd.Index(dates.month, name='Month')
+    return pd.Index(dates.dayofyear, name='Day')
+
+if __name__ == "__main__":
+    from walmart_data import load_walmart_dataset
+    train = load_walmart_dataset()
+    dates = pd.DatetimeIndex(train['Date'].unique()).sort_values()
+    frequency = infer_frequency(dates)
+    print(f"📅 Inferred frequency: {frequency} ({period_alias(frequency, dates)}), "
+          f"season length {season_length(frequency)}")
+    print(f"   Moving average windows: {[window_periods(m, frequency) for m in MOVING_AVERAGE_MONTHS]} periods")
+    upcoming = future_dates(dates[-1], 8, frequency, dates)
+    print(f"   Next periods: {[str(d.date()) for d in upcoming]}")
+    print(f"   Same ISO week last year: {[str(dates[p].date()) for p in same_week_last_year(dates, upcoming)]}")
\ No newline at end of file
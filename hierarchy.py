@@ -0,0 +1,324 @@
+# Hierarchical forecasts reconciled across Store -> Dept and Product -> Region
+
+import time
+import numpy as np
+import pandas as pd
+
+from aggregate_cube import build_cube, roll_up
+from backtesting import rolling_origin_cutoffs
+from batch_forecasting import forecast_block, series_matrix
+from dimensions import group_codes
+from frequency import future_dates, infer_frequency, season_length, window_periods
+
+# Aggregation levels of the supported hierarchies, coarsest first; the last level
+# holds the bottom series. Product and Region are crossed (a grouped hierarchy).
+HIERARCHIES = {
+    'walmart': [(), ('Store',), ('Store', 'Dept')],
+    'sales': [(), ('Product',), ('Region',), ('Product', 'Region')]
+}
+
+RECONCILIATION_METHODS = ['Base', 'Bottom_Up', 'Top_Down', 'OLS', 'MinT']
+
+MINT_FOLDS = 4  # Rolling-origin folds whose residuals estimate the MinT weights
+
+def level_name(level):
+    """Display name of an aggregation level, e.g. 'Store x Dept' ('Total' for the top)"""
+    return ' x '.join(level) if level else 'Total'
+
+def build_hierarchy(series_keys, levels):
+    """
+    Sparse summing matrix S of a hierarchy, stored as one node number per level
+    and bottom series (S has a single 1 per level in every column)
+    Args: series_keys (pandas.DataFrame): Key columns, one row per bottom series
+          levels (list): Key tuples of each aggregation level, coarsest first
+    Returns: dict: 'nodes' (level x bottom) node numbers, 'levels', 'offsets' (first node
+                   of each level), 'n_nodes', 'n_bottom' and 'keys' (one row per node)
+    """
+    n_bottom = len(series_keys)
+    nodes, offsets, frames = [], [], []
+    n_nodes = 0
+    for level in levels:
+        if level:
+            codes, _, index = group_codes([series_keys[key] for key in level], names=list(level))
+            frame = index.to_frame(index=False)
+        else:
+            codes, frame = np.zeros(n_bottom, dtype=np.int64), pd.DataFrame(index=[0])
+        frame.insert(0, 'Level', level_name(level))
+        nodes.append(codes + n_nodes)
+        offsets.append(n_nodes)
+        frames.append(frame)
+        n_nodes += len(frame)
+    return {
+        'nodes': np.stack(nodes),
+        'levels': [level_name(level) for level in levels],
+        'offsets': np.array(offsets + [n_nodes]),
+        'n_nodes': n_nodes,
+        'n_bottom': n_bottom,
+        'keys': pd.concat(frames, ignore_index=True)
+    }
+
+def aggregate(hierarchy, bottom):
+    """
+    S @ bottom: every node's values summed from its bottom series with bincount
+    Args: hierarchy (dict): Output of build_hierarchy
+          bottom (numpy.ndarray): (bottom x column) values
+    Returns: numpy.ndarray: (node x column) totals
+    """
+    n_columns = bottom.shape[1]
+    cells = hierarchy['nodes'][:, :, None] * n_columns + np.arange(n_columns)
+    weights = np.broadcast_to(bottom, cells.shape)
+    totals = np.bincount(cells.ravel(), weights=weights.ravel(), minlength=hierarchy['n_nodes'] * n_columns)
+    return totals.reshape(hierarchy['n_nodes'], n_columns)
+
+def aggregate_transpose(hierarchy, values):
+    """
+    S.T @ values: for every bottom series, the sum of its ancestors' values
+    Args: hierarchy (dict): Output of build_hierarchy
+          values (numpy.ndarray): (node x column) values
+    Returns: numpy.ndarray: (bottom x column) sums
+    """
+    return values[hierarchy['nodes']].sum(axis=0)
+
+def aggregate_history(hierarchy, values):
+    """
+    Node histories from a bottom (series x period) matrix: missing bottom periods
+    count as zero, and a node period is missing only if none of its series was observed
+    Args: hierarchy (dict): Output of build_hierarchy
+          values (numpy.ndarray): (bottom x period) matrix, NaN for missing periods
+    Returns: numpy.ndarray: (node x period) matrix
+    """
+    totals = aggregate(hierarchy, np.nan_to_num(values))
+    observed = aggregate(hierarchy, (~np.isnan(values)).astype(np.float64))
+    return np.where(observed > 0, totals, np.nan)
+
+def bottom_up(hierarchy, base):
+    """Bottom-up: the bottom base forecasts summed through S"""
+    return aggregate(hierarchy, base[hierarchy['offsets'][-2]:])
+
+def top_down(hierarchy, base, history):
+    """
+    Top-down by historical proportions: the total forecast split in each bottom
+    series' share of the historical total
+    Args: hierarchy (dict): Output of build_hierarchy
+          base (numpy.ndarray): (node x horizon) base forecasts (node 0 is the total)
+          history (numpy.ndarray): (node x period) node histories
+    Returns: numpy.ndarray: (node x horizon) coherent forecasts
+    """
+    bottom_history = np.nansum(history[hierarchy['offsets'][-2]:], axis=1)
+    shares = bottom_history / bottom_history.sum() if bottom_history.sum() else \
+        np.full(hierarchy['n_bottom'], 1 / hierarchy['n_bottom'])
+    return aggregate(hierarchy, shares[:, None] * base[0][None, :])
+
+def _conjugate_gradient(apply, rhs, diagonal, tolerance=1e-10, max_iterations=500):
+    """
+    Jacobi-preconditioned conjugate gradient for A x = rhs, one system per column
+    Args: apply (callable): x -> A x for (bottom x column) arrays, A symmetric positive definite
+          rhs (numpy.ndarray): (bottom x column) right-hand sides
+          diagonal (numpy.ndarray): Diagonal of A (preconditioner)
+          tolerance (float): Relative residual norm at which a column stops
+          max_iterations (int): Iteration cap
+    Returns: tuple: (solution, iterations used)
+    """
+    x = np.zeros_like(rhs)
+    residual = rhs.copy()
+    z = residual / diagonal[:, None]
+    direction = z.copy()
+    rz = (residual * z).sum(axis=0)
+    target = tolerance * np.linalg.norm(rhs, axis=0)
+    for iteration in range(1, max_iterations + 1):
+        a_direction = apply(direction)
+        curvature = (direction * a_direction).sum(axis=0)
+        step = np.divide(rz, curvature, out=np.zeros_like(rz), where=curvature > 0)
+        x += step * direction
+        residual -= step * a_direction
+        if (np.linalg.norm(residual, axis=0) <= target).all():
+            return x, iteration
+        z = residual / diagonal[:, None]
+        rz_next = (residual * z).sum(axis=0)
+        direction = z + np.divide(rz_next, rz, out=np.zeros_like(rz), where=rz > 0) * direction
+        rz = rz_next
+    return x, max_iterations
+
+def least_squares(hierarchy, base, weights=None):
+    """
+    Optimal combination S (S' W^-1 S)^-1 S' W^-1 base with a diagonal W: OLS for
+    W = I, MinT (variance scaling) for W = the base forecast error variances.
+    The normal equations are solved matrix-free with conjugate gradient, so only
+    the sparse summing operators are ever applied.
+    Args: hierarchy (dict): Output of build_hierarchy
+          base (numpy.ndarray): (node x horizon) base forecasts
+          weights (numpy.ndarray): Diagonal of W per node (default: identity)
+    Returns: numpy.ndarray: (node x horizon) coherent forecasts
+    """
+    precision = np.ones(hierarchy['n_nodes']) if weights is None else 1 / weights
+    apply = lambda x: aggregate_transpose(hierarchy, precision[:, None] * aggregate(hierarchy, x))
+    diagonal = precision[hierarchy['nodes']].sum(axis=0)
+    bottom, _ = _conjugate_gradient(apply, aggregate_transpose(hierarchy, precision[:, None] * base), diagonal)
+    return aggregate(hierarchy, bottom)
+
+def base_forecasts(history, horizon, method, params):
+    """
+    Base forecasts of every node from its own history; exponential smoothing stands in
+    where the method has no forecast, zero where a node was never observed
+    Args: history (numpy.ndarray): (node x period) node histories
+          horizon (int): Periods to forecast
+          method (str): Column of FORECAST_METHODS
+          params (dict): Parameters of forecast_block
+    Returns: numpy.ndarray: (node x horizon) forecasts
+    """
+    forecasts = forecast_block(history, horizon, **params)
+    base = np.where(np.isnan(forecasts[method]), forecasts['Exponential_Smoothing_Forecast'], forecasts[method])
+    return np.nan_to_num(base)
+
+def forecast_error_variance(actual, predicted):
+    """
+    Mean squared error of every node's base forecast on held-out periods (the
+    diagonal of W in MinT), the overall average where a node could not be scored
+    Args: actual (numpy.ndarray): (node x horizon) observations, NaN if missing
+          predicted (numpy.ndarray): (node x horizon) base forecasts made before them
+    Returns: numpy.ndarray: Variance per node
+    """
+    with np.errstate(invalid='ignore'):
+        errors = np.nanmean((actual - predicted) ** 2, axis=1)
+    fallback = np.nanmean(errors) if np.isfinite(errors).any() else 1.0
+    errors = np.where(np.isfinite(errors) & (errors > 0), errors, fallback)
+    return np.maximum(errors, 1e-12 * max(fallback, 1.0))
+
+def backtest_error_variance(history, horizon, method, params, n_folds=MINT_FOLDS):
+    """
+    Diagonal of W in MinT from rolling-origin residuals: base forecasts made at
+    every fold cutoff (see backtesting.rolling_origin_cutoffs) are scored on the
+    horizon that follows, and the squared errors are pooled over folds, so the
+    weights do not hinge on a single holdout window
+    Args: history (numpy.ndarray): (node x period) node histories
+          horizon (int): Periods forecast per fold
+          method (str): Base forecasting method (column of FORECAST_METHODS)
+          params (dict): Parameters of forecast_block
+          n_folds (int): Number of folds
+    Returns: numpy.ndarray: Variance per node (ones when no fold fits)
+    """
+    cutoffs = rolling_origin_cutoffs(history.shape[1], horizon, n_folds, min_train=horizon)
+    if not cutoffs:
+        return np.ones(len(history))
+    actual = np.concatenate([history[:, cutoff:cutoff + horizon] for cutoff in cutoffs], axis=1)
+    predicted = np.concatenate([base_forecasts(history[:, :cutoff], horizon, method, params)
+                                for cutoff in cutoffs], axis=1)
+    return forecast_error_variance(actual, predicted)
+
+def reconcile(hierarchy, base, history, weights):
+    """
+    Coherent forecasts of every reconciliation method
+    Args: hierarchy (dict): Output of build_hierarchy
+          base (numpy.ndarray): (node x horizon) base forecasts
+          history (numpy.ndarray): (node x period) node histories
+          weights (numpy.ndarray): Base forecast error variance per node
+    Returns: dict: Method name (RECONCILIATION_METHODS) -> (node x horizon) forecasts
+    """
+    return {
+        'Base': base,
+        'Bottom_Up': bottom_up(hierarchy, base),
+        'Top_Down': top_down(hierarchy, base, history),
+        'OLS': least_squares(hierarchy, base),
+        'MinT': least_squares(hierarchy, base, weights)
+    }
+
+def coherence_error(hierarchy, forecasts):
+    """Largest gap between a node's forecast and the sum of its bottom forecasts"""
+    return np.abs(forecasts - bottom_up(hierarchy, forecasts)).max()
+
+def hierarchical_forecast(values, series_keys, dates, levels, horizon=13, method='Holt_Winters_Forecast',
+                          evaluate=True, **params):
+    """
+    Base forecasts at every level of a hierarchy, reconciled so that they add up
+    Args: values (numpy.ndarray): (bottom x period) matrix, NaN for missing periods
+          series_keys (pandas.DataFrame): Key columns of the bottom series
+          dates (pandas.DatetimeIndex): Periods of the matrix columns
+          levels (list): Key tuples of each level, coarsest first (see HIERARCHIES)
+          horizon (int): Periods to forecast
+          method (str): Base forecasting method (column of FORECAST_METHODS); the linear
+                        methods (rolling mean, smoothing, seasonal naive) are coherent
+                        already on gap-free data, Holt-Winters is not
+          evaluate (bool): Also score every method on the last horizon periods
+          params: window, alpha and season_length passed to forecast_block
+                  (default: 12 months of periods and a one-year season)
+    Returns: tuple: (pandas.DataFrame with node keys, 'Date' and one column per
+                     reconciliation method, pandas.DataFrame of holdout MAE per
+                     level and method or None)
+    """
+    print("\n" + "="*50)
+    print("🧮 HIERARCHICAL FORECASTING")
+    print("="*50)
+    
+    start_time = time.time()
+    frequency = infer_frequency(dates)
+    params = dict({'window': window_periods(12, frequency), 'season_length': season_length(frequency)}, **params)
+    hierarchy = build_hierarchy(series_keys, levels)
+    history = aggregate_history(hierarchy, values)
+    level_sizes = np.diff(hierarchy['offsets'])
+    sizes = ', '.join(f"{name}: {size:,}" for name, size in zip(hierarchy['levels'], level_sizes))
+    print(f"🌳 {hierarchy['n_nodes']:,} nodes ({sizes}) x {len(dates)} periods, base method: {method}")
+    
+    # MinT weights come from the residuals of rolling-origin folds of the history in use
+    n_periods = history.shape[1]
+    evaluate = evaluate and n_periods > 3 * horizon
+    
+    # Holdout accuracy per level: fit and weight on the history before the last horizon periods
+    accuracy = None
+    if evaluate:
+        cutoff = n_periods - horizon
+        train = history[:, :cutoff]
+        weights = backtest_error_variance(train, horizon, method, params)
+        forecasts = reconcile(hierarchy, base_forecasts(train, horizon, method, params), train, weights)
+        actual = history[:, cutoff:]
+        level_of = np.repeat(np.arange(len(level_sizes)), level_sizes)
+        scores = {}
+        for name, predicted in forecasts.items():
+            with np.errstate(invalid='ignore'):
+                node_error = np.nanmean(np.abs(actual - predicted), axis=1)
+            scores[name] = pd.Series(node_error).groupby(level_of).mean().to_numpy()
+        accuracy = pd.DataFrame(scores, index=pd.Index(hierarchy['levels'], name='Level'))
+    
+    weights = backtest_error_variance(history, horizon, method, params)
+    forecasts = reconcile(hierarchy, base_forecasts(history, horizon, method, params), history, weights)
+    
+    # Tidy table: one row per node and forecast date
+    forecast_dates = future_dates(dates[-1], horizon, frequency, dates)
+    forecast_df = hierarchy['keys'].loc[hierarchy['keys'].index.repeat(horizon)].reset_index(drop=True)
+    forecast_df['Date'] = np.tile(forecast_dates, hierarchy['n_nodes'])
+    for name, predicted in forecasts.items():
+        forecast_df[name] = predicted.ravel()
+    
+    print(f"✅ Reconciled {hierarchy['n_nodes']:,} nodes x {horizon} periods in {time.time() - start_time:.2f}s")
+    print("\n🔗 COHERENCE (largest gap between a node and the sum of its bottom series):")
+    for name, predicted in forecasts.items():
+        print(f"   {name}: {coherence_error(hierarchy, predicted):,.4f}")
+    if accuracy is not None:
+        print(f"\n📊 HOLDOUT MAE PER LEVEL (last {horizon} periods):")
+        print(accuracy.round(2))
+    return forecast_df, accuracy
+
+def sales_series_matrix(df, cube=None, value='Sales'):
+    """
+    Product x Region series matrix of the sales data (the revenue_breakdown dimensions)
+    Args: df (pandas.DataFrame): Cleaned data (None when cube is given)
+          cube (pandas.DataFrame): Aggregate cube of df (see aggregate_cube.build_cube)
+          value (str): Measure to forecast
+    Returns: tuple: Output of batch_forecasting.series_matrix
+    """
+    if cube is None:
+        cube = build_cube(df, verbose=False)
+    cells = roll_up(cube, ['Product', 'Region', 'Date']).reset_index()
+    return series_matrix(cells, ('Product', 'Region'), f'{value}_sum')
+
+if __name__ == "__main__":
+    import sys
+    if '--walmart' in sys.argv:
+        from walmart_data import load_walmart_dataset
+        values, series_keys, dates = series_matrix(load_walmart_dataset())
+        hierarchical_forecast(values, series_keys, dates, HIERARCHIES['walmart'], horizon=13)
+    else:
+        from data_loader import create_sample_data
+        from data_cleaner import clean_data
+        values, series_keys, dates = sales_series_matrix(clean_data(create_sample_data()))
+        forecast_df, _ = hierarchical_forecast(values, series_keys, dates, HIERARCHIES['sales'], horizon=6)
+        print(forecast_df[forecast_df['Level'] == 'Total'].round({name: 2 for name in RECONCILIATION_METHODS}))
\ No newline at end of file
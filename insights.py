@@ -2,22 +2,35 @@
 
 import pandas as pd
 import numpy as np
+from aggregate_cube import build_cube, cube_columns, measure_totals, monthly_means, roll_up
+from frequency import FREQUENCIES, infer_frequency, window_periods
 
-def generate_insights(df, monthly_data, forecast_df=None):
+ANOMALIES_SHOWN = 3  # Strongest level shifts and outliers listed in the report
+
+def generate_insights(df, monthly_data, forecast_df=None, cube=None, anomalies=None):
     """
     Generate final insights and business recommendations
-    Args: df (pandas.DataFrame): Original cleaned data
+    Args: df (pandas.DataFrame): Original cleaned data (None when cube is given)
           monthly_data (pandas.DataFrame): Monthly aggregated data
           forecast_df (pandas.DataFrame): Forecast results
+          cube (pandas.DataFrame): Aggregate cube of df (see aggregate_cube.build_cube)
+          anomalies (pandas.DataFrame): Findings of anomalies.detect_anomalies
     """
     print("\n" + "="*50)
     print("💡 FINAL INSIGHTS AND BUSINESS RECOMMENDATIONS")
     print("="*50)
     
+    if cube is None:
+        cube = build_cube(df, verbose=False)
+    columns = cube_columns(cube)
+    
     # Key metrics calculation
-    total_sales = df['Sales'].sum()
-    total_revenue = df['Revenue'].sum() if 'Revenue' in df.columns else 0
+    totals = roll_up(cube, [])
+    total_sales = totals['Sales_sum']
+    total_revenue = totals['Revenue_sum'] if 'Revenue' in columns else 0
     avg_monthly_sales = monthly_data['Sales'].mean()
+    frequency = infer_frequency(monthly_data.index)
+    unit = FREQUENCIES[frequency]['unit']
     
     # Growth calculation
     if len(monthly_data) > 1:
@@ -26,34 +39,32 @@ def generate_insights(df, monthly_data, forecast_df=None):
     else:
         sales_growth = 0
     
-    # Top performing products and regions
-    top_product = df.groupby('Product')['Sales'].sum().idxmax() if 'Product' in df.columns else "N/A"
-    top_region = df.groupby('Region')['Sales'].sum().idxmax() if 'Region' in df.columns else "N/A"
-    
-    # Seasonal insights
-    monthly_avg = df.groupby('Month')['Sales'].mean()
-    best_month = monthly_avg.idxmax()
-    worst_month = monthly_avg.idxmin()
-    
-    # Product performance
-    if 'Product' in df.columns:
-        product_performance = df.groupby('Product')['Sales'].sum().sort_values(ascending=False)
+    # Product and region performance (one roll-up each, reused for the top performer)
+    top_product = top_region = "N/A"
+    if 'Product' in columns:
+        product_performance = measure_totals(cube, ['Product']).sort_values(ascending=False)
+        top_product = product_performance.idxmax()
         best_product = product_performance.index[0]
         worst_product = product_performance.index[-1]
     
-    # Region performance
-    if 'Region' in df.columns:
-        region_performance = df.groupby('Region')['Sales'].sum().sort_values(ascending=False)
+    if 'Region' in columns:
+        region_performance = measure_totals(cube, ['Region']).sort_values(ascending=False)
+        top_region = region_performance.idxmax()
         best_region = region_performance.index[0]
         worst_region = region_performance.index[-1]
     
+    # Seasonal insights
+    monthly_avg = monthly_means(cube)
+    best_month = monthly_avg.idxmax()
+    worst_month = monthly_avg.idxmin()
+    
     print("📊 KEY BUSINESS METRICS:")
     print(f"   • Total Sales: ${total_sales:,.2f}")
     if total_revenue > 0:
         print(f"   • Total Revenue: ${total_revenue:,.2f}")
-    print(f"   • Average Monthly Sales: ${avg_monthly_sales:,.2f}")
+    print(f"   • Average {frequency.title()} Sales: ${avg_monthly_sales:,.2f}")
     print(f"   • Overall Sales Growth: {sales_growth:.1f}%")
-    print(f"   • Data Period: {len(monthly_data)} months")
+    print(f"   • Data Period: {len(monthly_data)} {unit}s")
     
     print("\n🏆 PERFORMANCE HIGHLIGHTS:")
     print(f"   • Top Performing Product: {top_product}")
@@ -62,10 +73,11 @@ def generate_insights(df, monthly_data, forecast_df=None):
     print(f"   • Worst Sales Month: {worst_month} ({monthly_avg[worst_month]:,.0f} avg sales)")
     
     print("\n📈 TREND ANALYSIS:")
-    # Calculate recent trend (last 6 months vs previous 6 months)
-    if len(monthly_data) >= 12:
-        recent_sales = monthly_data['Sales'].tail(6).mean()
-        previous_sales = monthly_data['Sales'].tail(12).head(6).mean()
+    # Calculate recent trend (last 6 months vs previous 6 months, in periods)
+    half_year = window_periods(6, frequency)
+    if len(monthly_data) >= 2 * half_year:
+        recent_sales = monthly_data['Sales'].tail(half_year).mean()
+        previous_sales = monthly_data['Sales'].tail(2 * half_year).head(half_year).mean()
         recent_trend = ((recent_sales - previous_sales) / previous_sales) * 100
         print(f"   • Recent Trend (last 6 months): {recent_trend:+.1f}%")
     
@@ -73,6 +85,18 @@ def generate_insights(df, monthly_data, forecast_df=None):
     seasonal_strength = (monthly_avg.max() - monthly_avg.min()) / monthly_avg.mean() * 100
     print(f"   • Seasonal Variation: {seasonal_strength:.1f}%")
     
+    if anomalies is not None:
+        outliers = anomalies[anomalies['Type'] == 'Outlier']
+        shifts = anomalies[anomalies['Type'] == 'Level shift']
+        print("\n🚨 ANOMALIES AND LEVEL SHIFTS:")
+        print(f"   • Outliers: {len(outliers):,} in {outliers['Series'].nunique():,} series")
+        print(f"   • Level Shifts: {len(shifts):,} in {shifts['Series'].nunique():,} series")
+        # Strongest of each type, listed separately (findings are sorted by severity)
+        for kind, findings in (('shift', shifts), ('outlier', outliers)):
+            for _, finding in findings.head(ANOMALIES_SHOWN).iterrows():
+                print(f"   • {finding['Date']:%Y-%m-%d} {finding['Series']}: {kind} to {finding['Value']:,.0f} "
+                      f"(expected {finding['Expected']:,.0f}, {finding['Change_%']:+.1f}%)")
+    
     print("\n💡 STRATEGIC RECOMMENDATIONS:")
     print("1. 📦 PRODUCT STRATEGY:")
     print(f"   • Focus on expanding {top_product} product line")
@@ -92,7 +116,10 @@ def generate_insights(df, monthly_data, forecast_df=None):
     
     if forecast_df is not None:
         print("\n5. 🔮 FORECAST INSIGHTS:")
-        avg_forecast = forecast_df['Exponential_Smoothing_Forecast'].mean()
+        # The tuned method's forecast when the grid search picked one
+        column = 'Recommended_Forecast' if 'Recommended_Forecast' in forecast_df.columns \
+            else 'Exponential_Smoothing_Forecast'
+        avg_forecast = forecast_df[column].mean()
         forecast_growth = ((avg_forecast - monthly_data['Sales'].mean()) / monthly_data['Sales'].mean()) * 100
         print(f"   • Expected average sales: ${avg_forecast:,.0f}")
         print(f"   • Projected growth: {forecast_growth:+.1f}%")
@@ -102,6 +129,9 @@ def generate_insights(df, monthly_data, forecast_df=None):
     print("   • Conduct deep-dive analysis on top-performing categories")
     print("   • Develop region-specific marketing strategies")
     print("   • Monitor seasonal patterns for promotional planning")
+    if anomalies is not None and len(anomalies):
+        print(f"   • Investigate {anomalies['Series'].iloc[0]} around {anomalies['Date'].iloc[0]:%Y-%m-%d} "
+              f"(most severe anomaly); check level shifts before re-forecasting")
     
     print("\n" + "="*50)
     print("✅ ANALYSIS COMPLETED SUCCESSFULLY!")
@@ -112,9 +142,10 @@ if __name__ == "__main__":
     from data_cleaner import clean_data
     from time_series_analysis import time_series_analysis
     from forecasting import simple_forecasting
+    from anomalies import detect_anomalies
     
     test_df = create_sample_data()
     cleaned_df = clean_data(test_df)
     monthly_data = time_series_analysis(cleaned_df)
     forecast_df = simple_forecasting(monthly_data)
-    generate_insights(cleaned_df, monthly_data, forecast_df)
\ No newline at end of file
+    generate_insights(cleaned_df, monthly_data, forecast_df, anomalies=detect_anomalies(cleaned_df))
\ No newline at end of file
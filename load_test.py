@@ -0,0 +1,180 @@
+# Load test for the forecast service: request latency percentiles on localhost
+
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from urllib.parse import urlencode
+import numpy as np
+
+from forecast_service import HOST, MAX_HORIZON, PORT
+
+async def fetch(reader, writer, path, host=HOST):
+    """
+    Send one GET over a keep-alive connection and read the whole response
+    Args: reader, writer: Connection streams
+          path (str): Request target
+          host (str): Host header
+    Returns: tuple: (status code, body bytes)
+    """
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+async def get_json(host, port, path):
+    """One request on a fresh connection, decoded as JSON"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        status, body = await fetch(reader, writer, path, host)
+    finally:
+        writer.close()
+    if status != 200:
+        raise RuntimeError(f"{path} returned HTTP {status}")
+    return json.loads(body)
+
+def build_paths(series, products, regions, n_requests, summary_share=0.2, horizons=(4, 13, 26, 52),
+                seed=0):
+    """
+    Random mix of /forecast and /summary requests
+    Args: series (list): Known [store, dept] pairs
+          products, regions (list): Known summary labels
+          n_requests (int): Number of requests
+          summary_share (float): Fraction of /summary requests
+          horizons (tuple): Horizons drawn for /forecast
+          seed (int): Random seed
+    Returns: list: Request targets
+    """
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(series), n_requests)
+    steps = rng.choice([h for h in horizons if h <= MAX_HORIZON], n_requests)
+    is_summary = rng.random(n_requests) < summary_share
+    product_picks = rng.integers(-1, len(products), n_requests)
+    region_picks = rng.integers(-1, len(regions), n_requests)
+    paths = []
+    for i in range(n_requests):
+        if is_summary[i]:
+            filters = {}
+            if product_picks[i] >= 0:
+                filters['product'] = products[product_picks[i]]
+            if region_picks[i] >= 0:
+                filters['region'] = regions[region_picks[i]]
+            paths.append("/summary?" + urlencode(filters))
+        else:
+            store, dept = series[picks[i]]
+            paths.append(f"/forecast?store={store}&dept={dept}&horizon={steps[i]}")
+    return paths
+
+async def _client(host, port, paths, latencies, failures):
+    """Issue paths one after another on a single keep-alive connection"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for path in paths:
+            start = time.perf_counter()
+            status, _ = await fetch(reader, writer, path, host)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                failures.append((path, status))
+    finally:
+        writer.close()
+
+async def run_load_test(host=HOST, port=PORT, n_requests=5000, concurrency=32, summary_share=0.2, seed=0):
+    """
+    Fire requests from concurrent keep-alive clients and report latency percentiles
+    Args: host (str): Service host
+          port (int): Service port
+          n_requests (int): Total requests
+          concurrency (int): Concurrent connections
+          summary_share (float): Fraction of /summary requests
+          seed (int): Random seed of the request mix
+    Returns: dict: 'p50', 'p90', 'p99', 'max' (milliseconds), 'throughput' (requests/second),
+                   'failures'
+    """
+    print("\n" + "="*50)
+    print("🏋️  FORECAST SERVICE LOAD TEST")
+    print("="*50)
+    
+    health = await get_json(host, port, '/health')
+    series = await get_json(host, port, '/series')
+    paths = build_paths(series, health['products'], health['regions'], n_requests, summary_share, seed=seed)
+    print(f"📦 {n_requests:,} requests ({summary_share:.0%} /summary) over {concurrency} connections, "
+          f"{len(series):,} series")
+    
+    latencies, failures = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, paths[i::concurrency], latencies, failures)
+                           for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    
+    latencies = np.array(latencies) * 1000
+    report = {
+        'p50': np.percentile(latencies, 50),
+        'p90': np.percentile(latencies, 90),
+        'p99': np.percentile(latencies, 99),
+        'max': latencies.max(),
+        'throughput': len(latencies) / elapsed,
+        'failures': len(failures)
+    }
+    stats = (await get_json(host, port, '/health'))['stats']
+    
+    print(f"✅ {len(latencies):,} requests in {elapsed:.2f}s ({report['throughput']:,.0f} requests/second)")
+    print(f"⏱️  Latency p50: {report['p50']:.2f} ms, p90: {report['p90']:.2f} ms, "
+          f"p99: {report['p99']:.2f} ms, max: {report['max']:.2f} ms")
+    if stats['batches']:
+        print(f"📦 Forecast batches: {stats['batches']:,} "
+              f"(avg {stats['batched_requests'] / stats['batches']:.1f} requests), "
+              f"cache hits: {stats['cache_hits']:,}")
+    if failures:
+        print(f"❌ {len(failures)} failed requests, e.g. {failures[0]}")
+    return report
+
+def spawn_service(port, data_dir='.', timeout=300):
+    """
+    Start forecast_service.py in a child process and wait until /health answers
+    Args: port (int): Port to serve on
+          data_dir (str): Directory holding the data files
+          timeout (float): Seconds to wait for the state to load
+    Returns: subprocess.Popen: The service process
+    """
+    process = subprocess.Popen([sys.executable, 'forecast_service.py', '--port', str(port),
+                                '--data-dir', data_dir], stdout=subprocess.DEVNULL)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"forecast_service.py exited with code {process.returncode}")
+        try:
+            asyncio.run(get_json(HOST, port, '/health'))
+            return process
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise TimeoutError(f"forecast service did not start within {timeout}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure forecast service latency")
+    parser.add_argument('--host', default=HOST, help="service host")
+    parser.add_argument('--port', type=int, default=PORT, help="service port")
+    parser.add_argument('--spawn', action='store_true', help="start the service for the test and stop it after")
+    parser.add_argument('--data-dir', default='.', help="with --spawn, directory holding the data files")
+    parser.add_argument('--requests', type=int, default=5000, help="total requests")
+    parser.add_argument('--concurrency', type=int, default=32, help="concurrent connections")
+    parser.add_argument('--summary-share', type=float, default=0.2, help="fraction of /summary requests")
+    args = parser.parse_args()
+    
+    process = spawn_service(args.port, args.data_dir) if args.spawn else None
+    try:
+        asyncio.run(run_load_test(args.host, args.port, args.requests, args.concurrency, args.summary_share))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
\ No newline at end of file
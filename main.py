@@ -10,18 +10,148 @@ This project analyzes retail sales data to identify trends, seasonal patterns,
 and provide revenue breakdowns by product and region.
 """
 
+import argparse
+import os
 import time
-from data_loader import load_and_prepare_data
+import pandas as pd
+from data_loader import DATA_FILE, load_and_prepare_data, stream_and_aggregate
 from data_cleaner import clean_data
-from exploratory_analysis import exploratory_analysis
-from time_series_analysis import time_series_analysis
-from revenue_analysis import revenue_breakdown
+from data_cache import cached_clean_data, clear_cache, source_fingerprint
+from exploratory_analysis import exploratory_analysis, print_summary_statistics
+from time_series_analysis import build_monthly_data, time_series_analysis
+from revenue_analysis import revenue_breakdown, streamed_revenue_summary
 from forecasting import simple_forecasting
+from tuning import PARAMS_FILE, tune_series
+from frequency import infer_frequency, window_periods
 from insights import generate_insights
+from anomalies import detect_anomalies
+from aggregate_cube import build_cube, row_statistics, sketch_row_statistics
+from time_index import build_time_index
+from query_backend import BACKENDS, compute_aggregates
+from incremental import incremental_update
+from rendering import RENDER_SETTINGS, configure_rendering, render_dashboards_parallel
+from profiler import enable_profiling, print_profile, stage, write_profile
 
-def main():
+# Pipeline steps selectable with --steps, and the dashboard each one draws
+STEPS = {
+    'eda': 'exploratory_analysis',
+    'timeseries': 'time_series_analysis',
+    'revenue': 'revenue_breakdown',
+    'forecast': 'simple_forecasting',
+    'anomalies': None,
+    'insights': None
+}
+FIGURES = {
+    'eda': 'exploratory_analysis.png',
+    'timeseries': 'time_series_analysis.png',
+    'revenue': 'revenue_breakdown.png',
+    'forecast': 'sales_forecasting.png'
+}
+
+def run_streaming(chunksize, approx=False):
+    """
+    Run the aggregate-based steps over a CSV streamed in bounded-size chunks
+    Args: chunksize (int): Rows per chunk
+          approx (bool): Sketch every chunk for approximate summary statistics
+    Returns: pandas.DataFrame: Forecast results
+    """
+    # Step 1-2: Stream, clean and aggregate data chunk by chunk
+    print("📁 STEP 1-2: Streaming and cleaning data...")
+    with stage('1-2 Stream and aggregate'):
+        aggregates = stream_and_aggregate(DATA_FILE, chunksize=chunksize, approx=approx)
+    
+    if approx:
+        # Step 3: Summary statistics from the merged chunk sketches
+        print("\n🔍 STEP 3: Approximate summary statistics...")
+        print_summary_statistics(sketch_row_statistics(aggregates['measure_sketches']))
+        for col, count in aggregates['distinct'].items():
+            print(f"   Distinct {col}: ~{count:,}")
+        print("\n⏭️  Skipping the exploratory dashboard and insights in streaming mode")
+    else:
+        # Step 3 and 7 need the row-level frame
+        print("\n⏭️  Skipping exploratory analysis and insights in streaming mode")
+    
+    # Step 4: Time Series Analysis on the Date-level totals
+    print("\n📈 STEP 4: Time series analysis...")
+    with stage('4 Time series analysis'):
+        monthly_data = time_series_analysis(aggregates['date_totals'])
+    
+    # Step 5: Revenue summaries from the streamed moments
+    print("\n💰 STEP 5: Revenue breakdown analysis...")
+    with stage('5 Revenue summary'):
+        streamed_revenue_summary(aggregates)
+    
+    # Step 6: Forecasting (Bonus)
+    print("\n🔮 STEP 6: Sales forecasting...")
+    with stage('6 Forecasting', rows=len(monthly_data)):
+        return simple_forecasting(monthly_data)
+
+def load_clean_data(use_cache=True, rebuild_cache=False, approx=False):
+    """
+    Load and clean the data, serving the cleaned frame from the columnar cache
+    when the source file and cleaner version are unchanged
+    Args: use_cache (bool): Read and write the cleaned-data cache
+          rebuild_cache (bool): Rebuild the cache entry even if it is current
+          approx (bool): Approximate distinct counts in the cleaning report
+    Returns: pandas.DataFrame: Cleaned data
+    """
+    def build():
+        # Step 1: Load and prepare data
+        print("📁 STEP 1: Loading data...")
+        with stage('1 Load data'):
+            df = load_and_prepare_data()
+        
+        # Step 2: Clean and preprocess data
+        print("\n🧹 STEP 2: Cleaning data...")
+        with stage('2 Clean data', rows=len(df)):
+            return clean_data(df, approx=approx)
+    
+    # Sample data is regenerated on every run, so only real input files are cached
+    if not use_cache or not os.path.exists(DATA_FILE):
+        return build()
+    
+    print("📁 STEP 1-2: Loading cleaned data...")
+    with stage('1-2 Cached load'):
+        return cached_clean_data([DATA_FILE], build, refresh=rebuild_cache)
+
+def run_incremental(append_path, use_cache=True, rebuild_cache=False):
+    """
+    Fold a new batch of sales rows into the saved pipeline state and refresh
+    the time series outputs and forecasts without reprocessing the history
+    Args: append_path (str): CSV with the new rows
+          use_cache (bool): Reuse the cleaned-data cache when bootstrapping the state
+          rebuild_cache (bool): Force a rebuild of the cleaned-data cache
+    Returns: pandas.DataFrame: Forecast results
+    """
+    print(f"📁 STEP 1-2: Loading and cleaning new rows from {append_path}...")
+    with stage('1-2 Load new rows'):
+        df_new = clean_data(pd.read_csv(append_path, parse_dates=['Date']))
+    
+    print("\n➕ STEP 4-6: Updating time series state and forecasts...")
+    with stage('4-6 Incremental update', rows=len(df_new)):
+        _, forecast_df = incremental_update(df_new, bootstrap=lambda: load_clean_data(use_cache, rebuild_cache),
+                                            batch_id=source_fingerprint([append_path]))
+    return forecast_df
+
+def main(chunksize=None, use_cache=True, rebuild_cache=False, render_workers=1, append_path=None,
+         backend='pandas', backend_options=None, steps=None, tune=False, retune=False, approx=False):
     """
     Main function to run the complete retail sales analysis
+    Args: chunksize (int): Stream the input CSV in chunks of this many rows
+          use_cache (bool): Reuse the cleaned-data cache
+          rebuild_cache (bool): Force a rebuild of the cleaned-data cache
+          render_workers (int): Render the dashboards in this many processes (headless)
+          append_path (str): Fold this CSV of new rows into the saved state instead
+                             of recomputing everything
+          backend (str): Aggregation engine; 'duckdb' scans the source file out-of-core
+                         and the row-level frame is never loaded
+          backend_options (dict): Engine options (threads, memory_limit, temp_dir)
+          steps (list): Steps of STEPS to run after loading (default: all)
+          tune (bool): Forecast with parameters picked by grid search, reusing the
+                       ones saved in PARAMS_FILE for the same data
+          retune (bool): Search the forecasting parameters again
+          approx (bool): Summary statistics and distinct counts from mergeable sketches
+                         (see sketches.py for the error bounds)
     """
     print("🚀 RETAIL SALES TIME SERIES ANALYSIS")
     print("=====================================")
@@ -29,35 +159,100 @@ def main():
     print("Starting comprehensive analysis...\n")
     
     start_time = time.time()
+    steps = [step for step in STEPS if step in (steps or STEPS)]
+    dashboards = [STEPS[step] for step in steps if STEPS[step]]
     
     try:
-        # Step 1: Load and prepare data
-        print("📁 STEP 1: Loading data...")
-        df = load_and_prepare_data()
+        if chunksize:
+            run_streaming(chunksize, approx)
+            print(f"\n⏱️  Total execution time: {time.time() - start_time:.2f} seconds")
+            return
         
-        # Step 2: Clean and preprocess data
-        print("\n🧹 STEP 2: Cleaning data...")
-        df_clean = clean_data(df)
+        if append_path:
+            run_incremental(append_path, use_cache, rebuild_cache)
+            print(f"\n⏱️  Total execution time: {time.time() - start_time:.2f} seconds")
+            return
+        
+        if backend == 'pandas':
+            # Step 1-2: Load and clean data
+            df_clean = load_clean_data(use_cache, rebuild_cache, approx)
+            n_rows = len(df_clean)
+            row_stats = None
+            if approx:
+                with stage('Sketch row statistics', rows=n_rows):
+                    row_stats = row_statistics(df_clean, approx=True)
+            
+            # Period boundaries over the date-sorted rows, then the aggregate cube
+            # shared by every step below
+            with stage('Time index', rows=n_rows):
+                time_index = build_time_index(df_clean['Date'])
+            with stage('Aggregate cube', rows=n_rows):
+                cube = build_cube(df_clean, time_index=time_index)
+        else:
+            # Step 1-2: Clean and aggregate inside the engine; only the cube reaches pandas
+            print(f"📁 STEP 1-2: Aggregating {DATA_FILE} with the {backend} backend...")
+            with stage('1-2 Out-of-core aggregation'):
+                aggregates = compute_aggregates(backend, path=DATA_FILE, **(backend_options or {}))
+            df_clean, cube, row_stats = None, aggregates['cube'], aggregates['row_stats']
+            n_rows = aggregates['n_rows']
         
-        # Step 3: Exploratory Data Analysis
-        print("\n🔍 STEP 3: Exploratory analysis...")
-        exploratory_analysis(df_clean)
+        # Forecasts and insights need the monthly series even when its dashboard is skipped
+        monthly_data, forecast_df = None, None
+        if 'timeseries' not in steps and ('forecast' in steps or 'insights' in steps):
+            with stage('4 Monthly data', rows=n_rows):
+                monthly_data = build_monthly_data(df_clean, cube)
         
-        # Step 4: Time Series Analysis
-        print("\n📈 STEP 4: Time series analysis...")
-        monthly_data = time_series_analysis(df_clean)
+        # Tuned forecasting parameters, searched once per dataset and then reused
+        forecast_params = None
+        if (tune or retune) and 'forecast' in steps:
+            with stage('Tune forecasting parameters', rows=n_rows):
+                sales = (monthly_data if monthly_data is not None else build_monthly_data(df_clean, cube))['Sales']
+                frequency = infer_frequency(sales.index)
+                forecast_params = tune_series(sales.dropna(), window_periods(6, frequency), frequency, retune)
         
-        # Step 5: Revenue Breakdown
-        print("\n💰 STEP 5: Revenue breakdown analysis...")
-        revenue_breakdown(df_clean)
+        if render_workers > 1:
+            # Step 3-6: Dashboards rendered concurrently, reports replayed in order
+            print("\n🖼️  STEP 3-6: Rendering dashboards in parallel...")
+            with stage('3-6 Parallel dashboards', rows=n_rows):
+                monthly_data, forecast_df = render_dashboards_parallel(df_clean, render_workers, cube, row_stats,
+                                                                       dashboards, monthly_data, forecast_params)
+        else:
+            # Step 3: Exploratory Data Analysis
+            if 'eda' in steps:
+                print("\n🔍 STEP 3: Exploratory analysis...")
+                with stage('3 Exploratory analysis', rows=n_rows):
+                    exploratory_analysis(df_clean, cube, row_stats)
+            
+            # Step 4: Time Series Analysis
+            if 'timeseries' in steps:
+                print("\n📈 STEP 4: Time series analysis...")
+                with stage('4 Time series analysis', rows=n_rows):
+                    monthly_data = time_series_analysis(df_clean, cube)
+            
+            # Step 5: Revenue Breakdown
+            if 'revenue' in steps:
+                print("\n💰 STEP 5: Revenue breakdown analysis...")
+                with stage('5 Revenue breakdown', rows=n_rows):
+                    revenue_breakdown(df_clean, cube)
+            
+            # Step 6: Forecasting (Bonus)
+            if 'forecast' in steps:
+                print("\n🔮 STEP 6: Sales forecasting...")
+                with stage('6 Forecasting', rows=len(monthly_data)):
+                    forecast_df = simple_forecasting(monthly_data, forecast_params)
         
-        # Step 6: Forecasting (Bonus)
-        print("\n🔮 STEP 6: Sales forecasting...")
-        forecast_df = simple_forecasting(monthly_data)
+        # Step 7: Anomalies and level shifts in every series
+        anomalies = None
+        if 'anomalies' in steps:
+            print("\n🚨 STEP 7: Detecting anomalies...")
+            with stage('7 Anomaly detection', rows=n_rows):
+                anomalies = detect_anomalies(df_clean, cube)
         
-        # Step 7: Generate Insights
-        print("\n💡 STEP 7: Generating insights...")
-        generate_insights(df_clean, monthly_data, forecast_df)
+        # Step 8: Generate Insights
+        if 'insights' in steps:
+            print("\n💡 STEP 8: Generating insights...")
+            with stage('8 Insights', rows=n_rows):
+                generate_insights(df_clean, monthly_data, forecast_df, cube, anomalies)
         
         # Calculate execution time
         end_time = time.time()
@@ -66,15 +261,78 @@ def main():
         print(f"\n⏱️  Total execution time: {execution_time:.2f} seconds")
         
         print("\n🎉 ANALYSIS COMPLETED!")
-        print("Generated files:")
-        print("   - exploratory_analysis.png")
-        print("   - time_series_analysis.png")
-        print("   - revenue_breakdown.png")
-        print("   - sales_forecasting.png")
-        
+        if RENDER_SETTINGS['figures'] and dashboards:
+            print("Generated files:")
+            for step in steps:
+                if step in FIGURES:
+                    print(f"   - {FIGURES[step]}")
+    
     except Exception as e:
         print(f"❌ Error during analysis: {e}")
         print("Please check your data and try again.")
 
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Retail sales time series analysis")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="stream the input CSV in chunks of this many rows")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="bypass the cleaned-data cache")
+    parser.add_argument('--rebuild-cache', action='store_true',
+                        help="rebuild the cleaned-data cache even if it is current")
+    parser.add_argument('--clear-cache', action='store_true',
+                        help="delete every cached dataset and exit")
+    parser.add_argument('--append', metavar='CSV', default=None,
+                        help="fold new rows into the saved pipeline state and refresh the forecasts")
+    parser.add_argument('--backend', choices=BACKENDS, default='pandas',
+                        help="aggregation engine; duckdb aggregates the source file out-of-core")
+    parser.add_argument('--threads', type=int, default=None,
+                        help="with --backend duckdb, worker threads (default: all cores)")
+    parser.add_argument('--memory-limit', default=None, metavar='SIZE',
+                        help="with --backend duckdb, memory cap such as 2GB (larger states spill to disk)")
+    parser.add_argument('--steps', nargs='+', choices=list(STEPS), default=None,
+                        help="run only these steps after loading (default: all)")
+    parser.add_argument('--no-figures', action='store_true',
+                        help="print the reports without drawing dashboards (matplotlib is never loaded)")
+    parser.add_argument('--tune', action='store_true',
+                        help=f"forecast with grid-searched parameters (saved in {PARAMS_FILE} and reused)")
+    parser.add_argument('--retune', action='store_true',
+                        help="search the forecasting parameters again instead of reusing saved ones")
+    parser.add_argument('--approx', action='store_true',
+                        help="approximate describe/histogram/distinct counts with mergeable sketches")
+    parser.add_argument('--profile', nargs='?', const='profile', default=None, metavar='PREFIX',
+                        help="time every pipeline stage and write PREFIX.json/.csv/.folded")
+    parser.add_argument('--profile-memory', action='store_true',
+                        help="with --profile, also trace Python allocation peaks (slower)")
+    parser.add_argument('--headless', action='store_true',
+                        help="save dashboards without opening plot windows")
+    parser.add_argument('--render-workers', type=int, default=1,
+                        help="render the dashboards in this many processes (implies --headless)")
+    parser.add_argument('--dpi', type=int, default=300,
+                        help="resolution of saved raster dashboards")
+    parser.add_argument('--formats', default='png',
+                        help="comma-separated output formats, e.g. png,svg")
+    parser.add_argument('--thumbnails', type=int, default=None, metavar='DPI',
+                        help="also save low-resolution PNG thumbnails at this DPI")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.clear_cache:
+        clear_cache()
+        print("🗑️  Cleaned-data cache cleared")
+    else:
+        configure_rendering(headless=args.headless or args.render_workers > 1, dpi=args.dpi,
+                            formats=args.formats.split(','), thumbnail_dpi=args.thumbnails,
+                            figures=not args.no_figures)
+        if args.profile:
+            enable_profiling(trace_memory=args.profile_memory)
+        with stage('main'):
+            main(chunksize=args.chunksize, use_cache=not args.no_cache,
+                 rebuild_cache=args.rebuild_cache, render_workers=args.render_workers,
+                 append_path=args.append, backend=args.backend,
+                 backend_options={'threads': args.threads, 'memory_limit': args.memory_limit},
+                 steps=args.steps, tune=args.tune, retune=args.retune, approx=args.approx)
+        if args.profile:
+            print_profile()
+            print(f"📝 Profile written to {', '.join(write_profile(args.profile))}")
\ No newline at end of file
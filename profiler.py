@@ -0,0 +1,136 @@
+# Pipeline stage timing and memory profiler
+
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS is not reported
+    resource = None
+
+# Profiler state; stage() is a no-op unless enable_profiling() was called
+PROFILE = {
+    'enabled': False,
+    'trace_memory': False,
+    'records': [],
+    'stack': []
+}
+_NO_OP = contextlib.nullcontext()
+# ru_maxrss is in bytes on macOS and in KiB on Linux
+RSS_UNITS_PER_MB = 1024 * 1024 if sys.platform == 'darwin' else 1024
+
+def enable_profiling(trace_memory=False):
+    """
+    Start recording stages
+    Args: trace_memory (bool): Also record Python allocation peaks with tracemalloc
+                               (accurate but slows allocation-heavy code down)
+    """
+    PROFILE.update(enabled=True, trace_memory=trace_memory, records=[], stack=[])
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def _peak_rss_mb():
+    """Process high-water mark of resident memory in MB (None where unsupported)"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / RSS_UNITS_PER_MB
+
+def stage(name, rows=None):
+    """
+    Context manager timing one pipeline stage. Stages nest; each record keeps
+    its full path so the trace can be folded into a flame graph.
+    Args: name (str): Stage name
+          rows (int): Rows processed by the stage (optional)
+    Returns: context manager
+    """
+    if not PROFILE['enabled']:
+        return _NO_OP
+    return _stage(name, rows)
+
+@contextlib.contextmanager
+def _stage(name, rows):
+    """Recording implementation of stage()"""
+    stack = PROFILE['stack']
+    frame = {'name': name, 'children_wall': 0.0, 'peak': 0}
+    if PROFILE['trace_memory']:
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+        tracemalloc.reset_peak()
+        frame['start_memory'] = current
+    path = ';'.join([f['name'] for f in stack] + [name])
+    stack.append(frame)
+    rss_before = _peak_rss_mb()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        stack.pop()
+        record = {
+            'stage': name,
+            'path': path,
+            'depth': len(stack),
+            'wall_s': wall,
+            'cpu_s': cpu,
+            'self_wall_s': wall - frame['children_wall'],
+            'rows': rows,
+            'peak_rss_mb': _peak_rss_mb(),
+            'rss_growth_mb': None if rss_before is None else _peak_rss_mb() - rss_before,
+            'alloc_peak_mb': None
+        }
+        if PROFILE['trace_memory']:
+            _, peak = tracemalloc.get_traced_memory()
+            frame['peak'] = max(frame['peak'], peak)
+            record['alloc_peak_mb'] = (frame['peak'] - frame['start_memory']) / 1024 ** 2
+        if stack:
+            stack[-1]['children_wall'] += wall
+            stack[-1]['peak'] = max(stack[-1]['peak'], frame['peak'])
+        PROFILE['records'].append(record)
+
+def write_profile(prefix='profile'):
+    """
+    Write the trace as <prefix>.json and <prefix>.csv, plus <prefix>.folded with
+    self time per stack in microseconds (input for flamegraph.pl or speedscope)
+    Args: prefix (str): Output path without extension
+    Returns: list: Written files
+    """
+    with open(f'{prefix}.json', 'w') as f:
+        json.dump(PROFILE['records'], f, indent=2)
+    pd.DataFrame(PROFILE['records']).to_csv(f'{prefix}.csv', index=False)
+    with open(f'{prefix}.folded', 'w') as f:
+        for record in PROFILE['records']:
+            f.write(f"{record['path']} {max(int(record['self_wall_s'] * 1e6), 0)}\n")
+    return [f'{prefix}.json', f'{prefix}.csv', f'{prefix}.folded']
+
+def print_profile(top=15):
+    """
+    Print the slowest stages
+    Args: top (int): Number of stages shown
+    """
+    records = pd.DataFrame(PROFILE['records'])
+    if records.empty:
+        return
+    print("\n" + "="*50)
+    print("⏱️  PIPELINE PROFILE")
+    print("="*50)
+    columns = ['path', 'wall_s', 'self_wall_s', 'cpu_s', 'rows', 'peak_rss_mb', 'alloc_peak_mb']
+    slowest = records.sort_values('self_wall_s', ascending=False).head(top)[columns]
+    slowest['path'] = slowest['path'].str.replace(';', ' > ')
+    with pd.option_context('display.max_colwidth', 70, 'display.width', 200):
+        print(slowest.round(3).to_string(index=False))
+
+if __name__ == "__main__":
+    import numpy as np
+    enable_profiling(trace_memory=True)
+    with stage('demo'):
+        with stage('allocate', rows=1_000_000):
+            values = np.random.default_rng(0).normal(size=1_000_000)
+        with stage('sort', rows=len(values)):
+            np.sort(values)
+    print_profile()
\ No newline at end of file
@@ -0,0 +1,179 @@
+# Pluggable execution backends for the analysis aggregates
+
+import os
+import time
+import numpy as np
+
+from aggregate_cube import CUBE_DIMENSIONS, CUBE_MEASURES, HISTOGRAM_BINS, build_cube, row_statistics
+from data_cleaner import CLEANING_PLAN, DATE_COLUMNS
+
+BACKENDS = ['pandas', 'duckdb']
+
+def duckdb_available():
+    """Check whether the DuckDB engine is installed"""
+    try:
+        import duckdb  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def pandas_aggregates(df_clean):
+    """
+    Aggregates of an in-memory cleaned frame
+    Args: df_clean (pandas.DataFrame): Cleaned data
+    Returns: dict: 'cube', 'row_stats' and 'n_rows'
+    """
+    return {
+        'cube': build_cube(df_clean),
+        'row_stats': row_statistics(df_clean),
+        'n_rows': len(df_clean)
+    }
+
+def _quote(name):
+    """Quote an SQL identifier"""
+    return '"' + name.replace('"', '""') + '"'
+
+def _literal(text):
+    """Quote an SQL string literal"""
+    return "'" + text.replace("'", "''") + "'"
+
+def _clean_query(con, path):
+    """
+    SQL applying clean_data's rules (date parsing, numeric coercion and fills)
+    to the columns the aggregates need, read lazily from the file
+    Args: con (duckdb.DuckDBPyConnection): Connection
+          path (str): CSV or Parquet file
+    Returns: tuple: (SQL text, dimension columns, measure columns)
+    """
+    reader = 'read_parquet' if path.endswith('.parquet') else 'read_csv_auto'
+    source = f"{reader}({_literal(path)})"
+    columns = [row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()]
+    
+    select, dimensions = [], []
+    date_col = next((col for col in DATE_COLUMNS if col in columns), None)
+    if date_col:
+        select.append(f"TRY_CAST({_quote(date_col)} AS TIMESTAMP) AS Date")
+        dimensions.append('Date')
+    for col in CUBE_DIMENSIONS[1:]:
+        if col in columns:
+            fill = CLEANING_PLAN[col]['fill'].replace("'", "''")
+            select.append(f"COALESCE(CAST({_quote(col)} AS VARCHAR), '{fill}') AS {_quote(col)}")
+            dimensions.append(col)
+    measures = [col for col in CUBE_MEASURES if col in columns]
+    for col in measures:
+        select.append(f"COALESCE(TRY_CAST({_quote(col)} AS DOUBLE), {CLEANING_PLAN[col]['fill']}) "
+                      f"AS {_quote(col)}")
+    return f"SELECT {', '.join(select)} FROM {source}", dimensions, measures
+
+def _duckdb_histogram(con, clean, column, low, high, bins=HISTOGRAM_BINS):
+    """
+    Equal-width histogram with numpy.histogram's exact bin assignment
+    (same index arithmetic and the same edge corrections)
+    """
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    edges = np.linspace(low, high, bins + 1)
+    norm = bins / (high - low)
+    edge_list = '[' + ', '.join(repr(float(e)) for e in edges) + ']'
+    col = _quote(column)
+    query = f"""
+        WITH raw AS (
+            SELECT {col} AS x,
+                   LEAST(CAST(FLOOR(({col} - {low!r}) * {norm!r}) AS BIGINT), {bins - 1}) AS i
+            FROM ({clean}) WHERE {col} BETWEEN {low!r} AND {high!r}
+        ), fixed AS (
+            SELECT x, CASE WHEN x < list_extract({edge_list}, i + 1) THEN i - 1 ELSE i END AS i FROM raw
+        )
+        SELECT CASE WHEN x >= list_extract({edge_list}, i + 2) AND i != {bins - 1} THEN i + 1 ELSE i END
+               AS bin, COUNT(*) FROM fixed GROUP BY 1
+    """
+    counts = np.zeros(bins, dtype=np.int64)
+    for index, count in con.execute(query).fetchall():
+        counts[index] = count
+    return {'counts': counts, 'edges': edges}
+
+def duckdb_aggregates(path, threads=None, memory_limit=None, temp_dir=None):
+    """
+    Aggregates computed out-of-core by DuckDB straight from the file: the rows
+    are scanned lazily and in parallel, and only the cube and row statistics
+    are materialised in pandas
+    Args: path (str): CSV or Parquet file
+          threads (int): Worker threads (default: all cores)
+          memory_limit (str): DuckDB memory cap, e.g. '2GB'; larger states spill to temp_dir
+          temp_dir (str): Spill directory
+    Returns: dict: 'cube', 'row_stats' and 'n_rows' (same layout as pandas_aggregates)
+    """
+    import duckdb
+    
+    con = duckdb.connect()
+    if threads:
+        con.execute(f"SET threads = {int(threads)}")
+    if memory_limit:
+        con.execute(f"SET memory_limit = {_literal(memory_limit)}")
+    if temp_dir:
+        con.execute(f"SET temp_directory = {_literal(temp_dir)}")
+    
+    clean, dimensions, measures = _clean_query(con, path)
+    
+    # Cube: the same additive moments as build_cube
+    moments = ['COUNT(*) AS rows']
+    for col in measures:
+        q = _quote(col)
+        moments += [f"SUM({q}) AS {_quote(col + '_sum')}", f"COUNT({q}) AS {_quote(col + '_count')}",
+                    f"SUM({q} * {q}) AS {_quote(col + '_sumsq')}"]
+    keys = ', '.join(_quote(d) for d in dimensions)
+    cube = con.execute(f"SELECT {keys}, {', '.join(moments)} FROM ({clean}) "
+                       f"GROUP BY {keys} ORDER BY {keys}").df()
+    for col in dimensions:
+        cube[col] = cube[col].astype('datetime64[ns]' if col == 'Date' else object)
+    cube = cube.set_index(dimensions)
+    
+    # describe() figures per measure in one scan, then the histogram of Sales
+    describe = {}
+    if measures:
+        stats = [f"COUNT({_quote(c)}), AVG({_quote(c)}), STDDEV_SAMP({_quote(c)}), "
+                 f"MIN({_quote(c)}), MAX({_quote(c)})" for c in measures]
+        values = con.execute(f"SELECT {', '.join(stats)} FROM ({clean})").fetchone()
+        for i, col in enumerate(measures):
+            count, mean, std, low, high = values[5 * i:5 * i + 5]
+            describe[col] = {'count': float(count), 'mean': mean, 'std': std, 'min': low, 'max': high}
+    histogram = None
+    if 'Sales' in measures and describe['Sales']['count']:
+        histogram = _duckdb_histogram(con, clean, 'Sales', describe['Sales']['min'], describe['Sales']['max'])
+    
+    n_rows = int(cube['rows'].sum())
+    con.close()
+    return {'cube': cube, 'row_stats': {'describe': describe, 'histogram': histogram}, 'n_rows': n_rows}
+
+def compute_aggregates(backend='pandas', path=None, df_clean=None, **options):
+    """
+    Build the cube and row statistics with the chosen backend
+    Args: backend (str): 'pandas' (needs df_clean) or 'duckdb' (needs path)
+          path (str): Source file for out-of-core backends
+          df_clean (pandas.DataFrame): Cleaned data for the pandas backend
+          options: Backend options (threads, memory_limit, temp_dir for DuckDB)
+    Returns: dict: 'cube', 'row_stats' and 'n_rows'
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+    start_time = time.time()
+    if backend == 'pandas':
+        aggregates = pandas_aggregates(df_clean)
+    else:
+        if not duckdb_available():
+            raise ImportError("The duckdb backend needs the duckdb package (pip install duckdb)")
+        if path is None or not os.path.exists(path):
+            raise FileNotFoundError(f"The duckdb backend reads the source file directly; '{path}' not found")
+        aggregates = duckdb_aggregates(path, **options)
+    print(f"🧊 {backend} backend: {aggregates['n_rows']:,} rows -> {len(aggregates['cube']):,} cells "
+          f"in {time.time() - start_time:.2f}s")
+    return aggregates
+
+if __name__ == "__main__":
+    from data_loader import DATA_FILE, load_and_prepare_data
+    from data_cleaner import clean_data
+    pandas_result = compute_aggregates('pandas', df_clean=clean_data(load_and_prepare_data(), verbose=False))
+    if duckdb_available() and os.path.exists(DATA_FILE):
+        duckdb_result = compute_aggregates('duckdb', path=DATA_FILE)
+        difference = (pandas_result['cube'] - duckdb_result['cube']).abs().max().max()
+        print(f"Largest cube difference between backends: {difference:.3g}")
\ No newline at end of file
@@ -0,0 +1,157 @@
+# Figure output: interactive or headless, sequential or parallel
+
+import contextlib
+import io
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from profiler import stage
+
+# Output settings shared by every dashboard (see configure_rendering)
+RENDER_SETTINGS = {
+    'figures': True,
+    'headless': False,
+    'dpi': 300,
+    'formats': ['png'],
+    'thumbnail_dpi': None
+}
+
+def configure_rendering(headless=False, dpi=300, formats=('png',), thumbnail_dpi=None, figures=True):
+    """
+    Configure how dashboards are written
+    Args: headless (bool): Use the Agg backend and never call plt.show()
+          dpi (int): Resolution of raster outputs
+          formats (iterable): Output formats, e.g. ('png', 'svg')
+          thumbnail_dpi (int): Also write a low-resolution PNG thumbnail at this DPI
+          figures (bool): Draw the dashboards at all; False prints the reports only
+                          and matplotlib is never imported
+    """
+    RENDER_SETTINGS.update(figures=figures, headless=headless, dpi=dpi, formats=list(formats),
+                           thumbnail_dpi=thumbnail_dpi)
+
+def load_pyplot():
+    """
+    Import pyplot on first use (on the Agg backend when headless), so runs
+    that draw nothing never pay for matplotlib
+    Returns: module: matplotlib.pyplot
+    """
+    import matplotlib
+    if RENDER_SETTINGS['headless']:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+def save_figure(fig, name):
+    """
+    Write a dashboard in every configured format, show it unless headless,
+    and close it so figures never accumulate in memory
+    Args: fig (matplotlib.figure.Figure): Figure to save
+          name (str): Output file name without extension
+    Returns: float: Seconds spent rendering
+    """
+    start = time.perf_counter()
+    for fmt in RENDER_SETTINGS['formats']:
+        with stage(f'savefig {name}.{fmt}'):
+            fig.savefig(f'{name}.{fmt}', dpi=RENDER_SETTINGS['dpi'], bbox_inches='tight')
+    if RENDER_SETTINGS['thumbnail_dpi']:
+        with stage(f'savefig {name}_thumb.png'):
+            fig.savefig(f'{name}_thumb.png', dpi=RENDER_SETTINGS['thumbnail_dpi'], bbox_inches='tight')
+    elapsed = time.perf_counter() - start
+    
+    outputs = ', '.join(f'{name}.{fmt}' for fmt in RENDER_SETTINGS['formats'])
+    print(f"🖼️  Rendered {outputs} in {elapsed:.2f}s")
+    
+    plt = load_pyplot()
+    if not RENDER_SETTINGS['headless']:
+        plt.show()
+    plt.close(fig)
+    return elapsed
+
+# Dashboard steps in pipeline order
+DASHBOARDS = ('exploratory_analysis', 'time_series_analysis', 'revenue_breakdown', 'simple_forecasting')
+
+# Data handed to forked workers without pickling (set before the pool starts)
+_dashboard_data = {}
+
+def _run_dashboard(name, settings, *args, **kwargs):
+    """
+    Pool task: run one dashboard with captured output
+    Returns: tuple: (name, result, printed text, seconds)
+    """
+    from exploratory_analysis import exploratory_analysis
+    from time_series_analysis import time_series_analysis
+    from revenue_analysis import revenue_breakdown
+    from forecasting import simple_forecasting
+    
+    configure_rendering(**settings)
+    steps = {
+        'exploratory_analysis': exploratory_analysis,
+        'time_series_analysis': time_series_analysis,
+        'revenue_breakdown': revenue_breakdown,
+        'simple_forecasting': simple_forecasting
+    }
+    args = args or (_dashboard_data['df'], _dashboard_data['cube'])
+    
+    start = time.perf_counter()
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        result = steps[name](*args, **kwargs)
+    return name, result, output.getvalue(), time.perf_counter() - start
+
+def render_dashboards_parallel(df_clean, workers=4, cube=None, row_stats=None, dashboards=DASHBOARDS,
+                               monthly_data=None, forecast_params=None):
+    """
+    Run the dashboards concurrently in a process pool (headless). Forecasting
+    starts as soon as the time series step has produced monthly_data. Each step's
+    printed report is replayed in pipeline order.
+    Args: df_clean (pandas.DataFrame): Cleaned data
+          workers (int): Worker processes
+          cube (pandas.DataFrame): Aggregate cube of df_clean, shared by the dashboards
+          row_stats (dict): Row-level statistics for the exploratory dashboard
+                            (needed when df_clean is None)
+          dashboards (iterable): Subset of DASHBOARDS to run
+          monthly_data (pandas.DataFrame): Forecasting input when the time series
+                                           dashboard is not run
+          forecast_params (dict): Tuned forecasting parameters (see tuning.tune_series)
+    Returns: tuple: (monthly_data, forecast_df), None for steps not run
+    """
+    settings = dict(RENDER_SETTINGS, headless=True)
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    
+    # Forked workers inherit the frames; other start methods receive them pickled
+    _dashboard_data.update(df=df_clean, cube=cube)
+    frame_args = () if context.get_start_method() == 'fork' else (df_clean, cube)
+    
+    start = time.perf_counter()
+    results = {}
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            tasks = {}
+            if 'exploratory_analysis' in dashboards:
+                tasks['exploratory_analysis'] = pool.submit(_run_dashboard, 'exploratory_analysis', settings,
+                                                            *frame_args, row_stats=row_stats)
+            for name in ('time_series_analysis', 'revenue_breakdown'):
+                if name in dashboards:
+                    tasks[name] = pool.submit(_run_dashboard, name, settings, *frame_args)
+            if 'simple_forecasting' in dashboards:
+                if 'time_series_analysis' in tasks:
+                    monthly_data = tasks['time_series_analysis'].result()[1]
+                tasks['simple_forecasting'] = pool.submit(_run_dashboard, 'simple_forecasting',
+                                                          settings, monthly_data, forecast_params)
+            for name, task in tasks.items():
+                results[name] = task.result()
+    finally:
+        _dashboard_data.clear()
+    
+    for name, (_, _, text, seconds) in results.items():
+        print(text, end='')
+        print(f"⏱️  {name} finished in {seconds:.2f}s")
+    
+    print(f"\n⏱️  Dashboards rendered in parallel in {time.perf_counter() - start:.2f}s "
+          f"(sum of steps: {sum(r[3] for r in results.values()):.2f}s)")
+    if 'time_series_analysis' in results:
+        monthly_data = results['time_series_analysis'][1]
+    forecast_df = results['simple_forecasting'][1] if 'simple_forecasting' in results else None
+    return monthly_data, forecast_df
@@ -1,37 +1,118 @@
 # Product and region breakdown
 
-import matplotlib.pyplot as plt
-import seaborn as sns
 import pandas as pd
+import numpy as np
+from rendering import RENDER_SETTINGS, load_pyplot, save_figure
+from profiler import stage
+from aggregate_cube import build_cube, cube_columns, roll_up
+from revenue_pivots import materialized_pivots, pivot_table, query_pivots
 
 def setup_plot_style():
-    """Set up consistent plot style"""
+    """
+    Set up consistent plot style
+    Returns: tuple: (matplotlib.pyplot, seaborn), imported on first use
+    """
+    import seaborn as sns
+    plt = load_pyplot()
     plt.style.use('seaborn-v0_8')
     sns.set_palette("husl")
+    return plt, sns
 
-def revenue_breakdown(df):
+def format_money(values):
     """
-    Analyze revenue breakdown by product and region over time
-    Args: df (pandas.DataFrame): Cleaned data
+    Money labels such as '$1,234.56', built with whole-column string operations
+    rather than one format call per cell
+    Args: values (pandas.Series): Amounts
+    Returns: pandas.Series: Labels ('$nan' where the amount is missing)
+    """
+    cents = np.round(values.to_numpy(dtype=np.float64) * 100)
+    missing = ~np.isfinite(cents)
+    cents = np.where(missing, 0, np.abs(cents)).astype(np.int64)
+    # Thousands separators before every group of three digits counted from the right
+    whole = pd.Series(cents // 100, index=values.index).astype(str).str.replace(r'\B(?=(\d{3})+$)', ',', regex=True)
+    fraction = pd.Series(cents % 100, index=values.index).astype(str).str.zfill(2)
+    sign = pd.Series(np.where(values.to_numpy(dtype=np.float64) < 0, '$-', '$'), index=values.index)
+    return (sign + whole + '.' + fraction).where(~missing, '$nan')
+
+def format_revenue_summary(summary):
+    """
+    Round a sum/mean/std/count revenue summary and format the money columns
+    Args: summary (pandas.DataFrame): Columns 'sum', 'mean', 'std', 'count'
+    Returns: pandas.DataFrame: Display-ready summary
+    """
+    summary = summary.round(2)
+    summary['sum'] = format_money(summary['sum'])
+    summary['mean'] = format_money(summary['mean'])
+    return summary
+
+def summary_from_moments(moments):
+    """
+    Derive the sum/mean/std/count summary from additive revenue moments
+    Args: moments (pandas.DataFrame): Columns 'sum', 'count' and 'sumsq' per group, or
+                                      Welford 'count', 'mean' and 'm2' (see sketches.welford_moments)
+    Returns: pandas.DataFrame: Columns 'sum', 'mean', 'std', 'count'
+    """
+    count = moments['count']
+    if 'm2' in moments.columns:
+        mean = moments['mean']
+        total = mean * count
+        variance = moments['m2'] / (count - 1)
+    else:
+        mean = moments['sum'] / count
+        total = moments['sum']
+        # Sample variance (ddof=1) to match pandas' std; clip tiny negative rounding residue
+        variance = ((moments['sumsq'] - moments['sum'] * mean) / (count - 1)).clip(lower=0)
+    summary = pd.DataFrame({
+        'sum': total,
+        'mean': mean,
+        'std': np.sqrt(variance.where(count > 1)),
+        'count': count.astype('int64')
+    })
+    return summary.sort_index()
+
+def streamed_revenue_summary(aggregates):
+    """
+    Print the revenue summary from streamed aggregates (see data_loader.stream_and_aggregate)
+    Args: aggregates (dict): Output of stream_and_aggregate
     """
     print("\n" + "="*50)
     print("💰 REVENUE BREAKDOWN ANALYSIS")
     print("="*50)
     
-    setup_plot_style()
+    print("\n📊 REVENUE ANALYSIS SUMMARY:")
+    
+    if aggregates['product_moments'] is not None:
+        print("\n📦 Revenue by Product:")
+        print(format_revenue_summary(summary_from_moments(aggregates['product_moments'])))
+    
+    if aggregates['region_moments'] is not None:
+        print("\n🌍 Revenue by Region:")
+        print(format_revenue_summary(summary_from_moments(aggregates['region_moments'])))
+    
+    if 'Revenue' in aggregates['date_totals'].columns:
+        total_revenue = aggregates['date_totals']['Revenue'].sum()
+        n_rows = aggregates['n_rows']
+        print("\n💰 Overall Revenue Metrics:")
+        print(f"   Total Revenue: ${total_revenue:,.2f}")
+        print(f"   Average Transaction: ${total_revenue / n_rows:,.2f}")
+        print(f"   Total Transactions: {n_rows:,}")
+
+def plot_revenue_dashboard(pivots, columns):
+    """
+    Draw and save the revenue dashboard from the materialized revenue pivots
+    Args: pivots (dict): Output of revenue_pivots.materialized_pivots
+          columns (list): Columns available in the cube (see aggregate_cube.cube_columns)
+    """
+    plt, sns = setup_plot_style()
     
     # Create comprehensive revenue analysis dashboard
     fig, axes = plt.subplots(2, 2, figsize=(16, 12))
     fig.suptitle('Revenue Breakdown by Product and Region Over Time', fontsize=16, fontweight='bold')
     
     # 1. Revenue by product over time (stacked area)
-    if 'Product' in df.columns:
-        product_time_series = df.pivot_table(
-            index='Date', 
-            columns='Product', 
-            values='Revenue', 
-            aggfunc='sum'
-        ).fillna(0)
+    if 'Product' in columns:
+        with stage('pivot Date x Product'):
+            product_time_series = pivot_table(pivots, 'Date', 'Product').fillna(0)
         
         product_time_series.plot.area(ax=axes[0, 0], alpha=0.8)
         axes[0, 0].set_title('Revenue by Product Over Time', fontweight='bold')
@@ -41,13 +122,9 @@ def revenue_breakdown(df):
         axes[0, 0].grid(True, alpha=0.3)
     
     # 2. Revenue by region over time (stacked area)
-    if 'Region' in df.columns:
-        region_time_series = df.pivot_table(
-            index='Date', 
-            columns='Region', 
-            values='Revenue', 
-            aggfunc='sum'
-        ).fillna(0)
+    if 'Region' in columns:
+        with stage('pivot Date x Region'):
+            region_time_series = pivot_table(pivots, 'Date', 'Region').fillna(0)
         
         region_time_series.plot.area(ax=axes[0, 1], alpha=0.8)
         axes[0, 1].set_title('Revenue by Region Over Time', fontweight='bold')
@@ -57,21 +134,18 @@ def revenue_breakdown(df):
         axes[0, 1].grid(True, alpha=0.3)
     
     # 3. Product-region heatmap (average revenue)
-    if 'Product' in df.columns and 'Region' in df.columns:
-        product_region_heatmap = df.pivot_table(
-            index='Product',
-            columns='Region',
-            values='Revenue',
-            aggfunc='mean'
-        )
+    if 'Product' in columns and 'Region' in columns:
+        with stage('pivot Product x Region'):
+            product_region_heatmap = pivot_table(pivots, 'Product', 'Region', stat='mean')
         
         sns.heatmap(product_region_heatmap, annot=True, fmt='.0f', 
                    cmap='YlOrRd', ax=axes[1, 0], cbar_kws={'label': 'Average Revenue'})
         axes[1, 0].set_title('Average Revenue: Product vs Region', fontweight='bold')
     
     # 4. Monthly revenue trend by product (line plot)
-    if 'Product' in df.columns:
-        monthly_product_revenue = df.groupby(['Date', 'Product'])['Revenue'].sum().unstack()
+    if 'Product' in columns:
+        with stage('pivot Date x Product (trend)'):
+            monthly_product_revenue = pivot_table(pivots, 'Date', 'Product')
         monthly_product_revenue.plot(ax=axes[1, 1], linewidth=2)
         axes[1, 1].set_title('Monthly Revenue Trend by Product', fontweight='bold')
         axes[1, 1].set_xlabel('Date')
@@ -80,34 +154,47 @@ def revenue_breakdown(df):
         axes[1, 1].grid(True, alpha=0.3)
     
     plt.tight_layout()
-    plt.savefig('revenue_breakdown.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    save_figure(fig, 'revenue_breakdown')
+
+def revenue_breakdown(df, cube=None):
+    """
+    Analyze revenue breakdown by product and region over time
+    Args: df (pandas.DataFrame): Cleaned data (None when cube is given)
+          cube (pandas.DataFrame): Aggregate cube of df (see aggregate_cube.build_cube)
+    """
+    print("\n" + "="*50)
+    print("💰 REVENUE BREAKDOWN ANALYSIS")
+    print("="*50)
+    
+    if cube is None:
+        cube = build_cube(df)
+    columns = cube_columns(cube)
+    # Breakdowns are read from the pivots materialized once per dataset version
+    pivots = materialized_pivots(cube) if 'Revenue' in columns else None
+    
+    if RENDER_SETTINGS['figures'] and pivots is not None:
+        plot_revenue_dashboard(pivots, columns)
     
     # Print detailed revenue analysis
     print("\n📊 REVENUE ANALYSIS SUMMARY:")
     
-    if 'Product' in df.columns:
+    if 'Product' in columns and pivots is not None:
         print("\n📦 Revenue by Product:")
-        product_summary = df.groupby('Product')['Revenue'].agg(['sum', 'mean', 'std', 'count']).round(2)
-        product_summary['sum'] = product_summary['sum'].apply(lambda x: f"${x:,.2f}")
-        product_summary['mean'] = product_summary['mean'].apply(lambda x: f"${x:,.2f}")
-        print(product_summary)
+        print(format_revenue_summary(query_pivots(pivots, ['Product'])))
     
-    if 'Region' in df.columns:
+    if 'Region' in columns and pivots is not None:
         print("\n🌍 Revenue by Region:")
-        region_summary = df.groupby('Region')['Revenue'].agg(['sum', 'mean', 'std', 'count']).round(2)
-        region_summary['sum'] = region_summary['sum'].apply(lambda x: f"${x:,.2f}")
-        region_summary['mean'] = region_summary['mean'].apply(lambda x: f"${x:,.2f}")
-        print(region_summary)
+        print(format_revenue_summary(query_pivots(pivots, ['Region'])))
     
     # Calculate overall revenue metrics
-    if 'Revenue' in df.columns:
-        total_revenue = df['Revenue'].sum()
-        avg_revenue = df['Revenue'].mean()
+    if 'Revenue' in columns:
+        totals = roll_up(cube, [])
+        total_revenue = totals['Revenue_sum']
+        avg_revenue = total_revenue / totals['Revenue_count']
         print(f"\n💰 Overall Revenue Metrics:")
         print(f"   Total Revenue: ${total_revenue:,.2f}")
         print(f"   Average Transaction: ${avg_revenue:,.2f}")
-        print(f"   Total Transactions: {len(df):,}")
+        print(f"   Total Transactions: {int(totals['rows']):,}")
 
 if __name__ == "__main__":
     from data_loader import create_sample_data
@@ -0,0 +1,310 @@
+# Materialized revenue pivots with slice, dice and drill-down queries
+
+import hashlib
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from aggregate_cube import CUBE_DIMENSIONS, MOMENTS
+
+PIVOT_DIR = '.revenue_pivots'
+PIVOT_VERSION = '1'     # Bump when the stored layout changes
+MAX_PIVOT_FILES = 8     # Materialized versions kept, most recently used first
+
+# Time grains a query can drill down to, with the pandas period of their labels
+TIME_GRAINS = {'Year': 'Y', 'Quarter': 'Q', 'Month': 'M', 'Date': None}
+
+# Queries compared with a pandas groupby of the rows by check_pivots
+CHECK_QUERIES = [['Product'], ['Month', 'Region'], ['Quarter', 'Product'], ['Date', 'Region'],
+                 ['Product', 'Region'], ['Year', 'Region', 'Product']]
+
+def pivots_fingerprint(cube):
+    """
+    Identify a dataset version by its aggregate cube
+    Args: cube (pandas.DataFrame): Output of aggregate_cube.build_cube
+    Returns: str: Hex digest
+    """
+    digest = hashlib.sha256(f"pivots={PIVOT_VERSION}".encode())
+    digest.update(pd.util.hash_pandas_object(cube, index=True).to_numpy().tobytes())
+    digest.update(','.join(cube.columns).encode())
+    return digest.hexdigest()
+
+def materialize_pivots(cube):
+    """
+    Dense Date x Product x Region arrays of every cube column, stored as prefix sums
+    over dates, so that any date range of any cell is one subtraction
+    Args: cube (pandas.DataFrame): Output of aggregate_cube.build_cube
+    Returns: dict: 'dimensions' (non-date dimensions), 'labels' (dimension -> labels),
+                   'dates' (datetime64 array) and 'prefix' (column -> (date + 1) x ... array)
+    """
+    index = cube.index if isinstance(cube.index, pd.MultiIndex) else pd.MultiIndex.from_arrays([cube.index])
+    names = list(index.names)
+    if 'Date' not in names:
+        raise ValueError("Revenue pivots need a cube with a Date dimension")
+    dimensions = [dim for dim in CUBE_DIMENSIONS if dim in names and dim != 'Date']
+    axes = ['Date'] + dimensions
+    codes = [np.asarray(index.codes[names.index(dim)]) for dim in axes]
+    levels = [index.levels[names.index(dim)] for dim in axes]
+    # Cells with a missing key have no place on the axes
+    kept = np.logical_and.reduce([c >= 0 for c in codes])
+    codes = [c[kept] for c in codes]
+    # Date ranges are found by binary search, so the date axis must be sorted
+    if not levels[0].is_monotonic_increasing:
+        order = np.argsort(levels[0].to_numpy())
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        codes[0], levels[0] = rank[codes[0]], levels[0][order]
+    shape = tuple(len(level) for level in levels)
+    flat = np.ravel_multi_index(tuple(codes), shape)
+
+    prefix = {}
+    for column in cube.columns:
+        weights = cube[column].to_numpy(dtype=np.float64)[kept]
+        dense = np.bincount(flat, weights=weights, minlength=int(np.prod(shape))).reshape(shape)
+        prefix[column] = np.concatenate([np.zeros((1,) + shape[1:]), np.cumsum(dense, axis=0)])
+    return {
+        'dimensions': dimensions,
+        'labels': {dim: level.astype(str).to_numpy() for dim, level in zip(dimensions, levels[1:])},
+        'dates': levels[0].to_numpy(dtype='datetime64[ns]'),
+        'prefix': prefix
+    }
+
+def save_pivots(pivots, path):
+    """Write materialized pivots to one .npz file atomically"""
+    arrays = {'dates': pivots['dates'], 'dimensions': np.array(pivots['dimensions'], dtype=str)}
+    arrays.update({f'labels/{dim}': labels for dim, labels in pivots['labels'].items()})
+    arrays.update({f'prefix/{column}': values for column, values in pivots['prefix'].items()})
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+def load_pivots(path):
+    """Read pivots written by save_pivots"""
+    with np.load(path, allow_pickle=False) as stored:
+        dimensions = [str(dim) for dim in stored['dimensions']]
+        return {
+            'dimensions': dimensions,
+            'labels': {dim: stored[f'labels/{dim}'] for dim in dimensions},
+            'dates': stored['dates'],
+            'prefix': {key.split('/', 1)[1]: stored[key] for key in stored.files if key.startswith('prefix/')}
+        }
+
+def materialized_pivots(cube, directory=PIVOT_DIR, refresh=False):
+    """
+    Pivots of this dataset version, materialized on first use and read back afterwards
+    Args: cube (pandas.DataFrame): Output of aggregate_cube.build_cube
+          directory (str): Where the .npz files are kept (None keeps them in memory only)
+          refresh (bool): Materialize again even if a stored version exists
+    Returns: dict: Output of materialize_pivots
+    """
+    if directory is None:
+        return materialize_pivots(cube)
+    path = os.path.join(directory, f"{pivots_fingerprint(cube)[:32]}.npz")
+    if os.path.exists(path) and not refresh:
+        try:
+            pivots = load_pivots(path)
+            os.utime(path)
+            return pivots
+        except (OSError, ValueError, KeyError):
+            pass
+
+    pivots = materialize_pivots(cube)
+    os.makedirs(directory, exist_ok=True)
+    save_pivots(pivots, path)
+    # Keep the most recently used versions only
+    stored = sorted((os.path.join(directory, name) for name in os.listdir(directory)
+                     if name.endswith('.npz') and not name.endswith('.tmp.npz')),
+                    key=os.path.getmtime, reverse=True)
+    for old_path in stored[MAX_PIVOT_FILES:]:
+        os.remove(old_path)
+    print(f"💾 Revenue pivots materialized to {path}")
+    return pivots
+
+def parse_period(period):
+    """
+    Date range of a period label: '2014', 'Q3 2014' / '2014Q3', '2014-07' or a date
+    Args: period (str): Period label
+    Returns: tuple: (first, last) pandas.Timestamp, both inclusive
+    """
+    text = period.strip().upper()
+    if text.startswith('Q') and ' ' in text:
+        quarter, year = text.split()
+        text = f"{year}{quarter}"
+    freq = 'Q' if 'Q' in text else 'Y' if len(text) == 4 else 'M' if len(text) == 7 else 'D'
+    span = pd.Period(text, freq=freq)
+    return span.start_time, span.end_time
+
+def query_pivots(pivots, by=(), filters=None, period=None, start=None, end=None, measure='Revenue'):
+    """
+    Slice, dice and drill down the materialized pivots without touching the fact
+    table: filters select members, the period or start/end select a date range
+    (prefix-sum differences), and by lists the dimensions or time grain to keep
+    Args: pivots (dict): Output of materialized_pivots
+          by (list): Dimensions ('Product', 'Region') and at most one time grain
+                     of TIME_GRAINS ('Year', 'Quarter', 'Month', 'Date')
+          filters (dict): Dimension -> label or list of labels, e.g. {'Region': 'West'}
+          period (str): Period label (see parse_period), e.g. 'Q3 2014'
+          start, end (str or pandas.Timestamp): Inclusive date range (instead of period)
+          measure (str): Measure whose moments are read ('Revenue' or 'Sales')
+    Returns: pandas.DataFrame: Columns 'sum', 'mean', 'std', 'count' per group
+                               (see revenue_analysis.summary_from_moments)
+    """
+    from revenue_analysis import summary_from_moments
+    by = list(by)
+    grains = [name for name in by if name in TIME_GRAINS]
+    if len(grains) > 1:
+        raise ValueError(f"At most one time grain per query, got {grains}")
+    unknown = [name for name in by + list(filters or {}) if name not in TIME_GRAINS and name not in pivots['labels']]
+    if unknown:
+        raise ValueError(f"Unknown dimensions: {unknown}")
+
+    # Date range -> positions on the date axis
+    dates = pivots['dates']
+    if period is not None:
+        start, end = parse_period(period)
+    first = np.searchsorted(dates, np.datetime64(pd.Timestamp(start), 'ns'), 'left') if start is not None else 0
+    last = np.searchsorted(dates, np.datetime64(pd.Timestamp(end), 'ns'), 'right') if end is not None else len(dates)
+    last = max(last, first)
+
+    # Period boundaries inside the range: one prefix difference per period
+    if grains:
+        in_range = pd.DatetimeIndex(dates[first:last])
+        freq = TIME_GRAINS[grains[0]]
+        keys = in_range.to_period(freq) if freq else in_range
+        changes = np.flatnonzero(keys[1:] != keys[:-1]) + 1 if len(keys) > 1 else np.empty(0, dtype=np.int64)
+        if len(keys):
+            bounds = np.concatenate([[first], first + changes, [last]])
+            time_labels = pd.Index(keys[np.concatenate([[0], changes])].astype(str), name=grains[0])
+        else:
+            bounds, time_labels = np.array([first]), pd.Index([], name=grains[0])
+    else:
+        bounds, time_labels = np.array([first, last]), None
+
+    # Member selection per dimension, then sum every axis that is not kept
+    selection = []
+    for dim in pivots['dimensions']:
+        labels = pivots['labels'][dim]
+        wanted = (filters or {}).get(dim)
+        if wanted is None:
+            selection.append(np.arange(len(labels)))
+        else:
+            wanted = [wanted] if np.ndim(wanted) == 0 else list(wanted)
+            selection.append(np.flatnonzero(np.isin(labels, np.asarray(wanted, dtype=str))))
+    kept_dims = [dim for dim in pivots['dimensions'] if dim in by]
+    summed_axes = tuple(1 + i for i, dim in enumerate(pivots['dimensions']) if dim not in by)
+
+    moments = {}
+    for moment in MOMENTS:
+        prefix = pivots['prefix'][f'{measure}_{moment}']
+        values = prefix[bounds[1:]] - prefix[bounds[:-1]]
+        values = values[np.ix_(np.arange(len(values)), *selection)]
+        # Periods x kept members, flattened period-major
+        moments[moment] = values.sum(axis=summed_axes).reshape(-1)
+
+    # Group labels in the order of the result arrays: one flat array per level,
+    # time labels repeated per member and member labels tiled per period
+    members = [pivots['labels'][dim][selection[pivots['dimensions'].index(dim)]] for dim in kept_dims]
+    names = list(kept_dims)
+    levels = [members[0]] if len(members) == 1 else \
+        [pd.MultiIndex.from_product(members).get_level_values(i) for i in range(len(members))]
+    if grains:
+        n_members = int(np.prod([len(labels) for labels in members]))
+        levels = [np.repeat(np.asarray(time_labels), n_members)] + [np.tile(level, len(time_labels)) for level in levels]
+        names = [grains[0]] + names
+    if not levels:
+        index = pd.Index(['All'])
+    elif len(levels) == 1:
+        index = pd.Index(levels[0], name=names[0])
+    else:
+        index = pd.MultiIndex.from_arrays(levels, names=names)
+    moments = pd.DataFrame(moments, index=index)
+    summary = summary_from_moments(moments[moments['count'] > 0])
+    # Order by the requested keys
+    order = [name for name in by if name in summary.index.names]
+    if order and isinstance(summary.index, pd.MultiIndex) and order != list(summary.index.names):
+        summary = summary.reorder_levels(order).sort_index()
+    return summary
+
+def pivot_table(pivots, rows, columns, measure='Revenue', stat='sum'):
+    """
+    Two-way pivot read from the materialized arrays (e.g. Date x Product revenue)
+    Args: pivots (dict): Output of materialized_pivots
+          rows (str): Row dimension or time grain
+          columns (str): Column dimension
+          measure (str): Measure
+          stat (str): 'sum', 'mean', 'std' or 'count'
+    Returns: pandas.DataFrame: rows x columns (a DatetimeIndex when rows is 'Date')
+    """
+    table = query_pivots(pivots, by=[rows, columns], measure=measure)[stat].unstack()
+    if rows == 'Date':
+        table.index = pd.DatetimeIndex(table.index, name='Date')
+    return table
+
+def check_pivots(df, pivots, measure='Revenue'):
+    """
+    Compare the sums and counts of the pivot queries in CHECK_QUERIES with a
+    pandas groupby of the rows the pivots were built from
+    Args: df (pandas.DataFrame): Cleaned rows
+          pivots (dict): Output of materialized_pivots for the cube of df
+          measure (str): Measure to compare
+    Returns: dict: Query -> largest absolute difference of the sums (inf when the
+                   groups, their labels or their counts differ)
+    """
+    dates = pd.DatetimeIndex(df['Date'])
+    results = {}
+    for by in CHECK_QUERIES:
+        if any(name not in TIME_GRAINS and name not in pivots['labels'] for name in by):
+            continue
+        keys = []
+        for name in by:
+            if name in TIME_GRAINS:
+                values = dates.to_period(TIME_GRAINS[name]) if TIME_GRAINS[name] else dates
+            else:
+                values = df[name]
+            keys.append(pd.Series(np.asarray(values.astype(str)), index=df.index, name=name))
+        expected = df[measure].groupby(keys).agg(['sum', 'count'])
+        expected = expected[expected['count'] > 0]
+        actual = query_pivots(pivots, by, measure=measure)
+        
+        matched = expected.reindex(actual.index)
+        if len(actual) != len(expected) or matched['count'].isna().any() or \
+                (matched['count'].to_numpy() != actual['count'].to_numpy()).any():
+            results[' x '.join(by)] = np.inf
+        else:
+            results[' x '.join(by)] = float(np.abs(matched['sum'].to_numpy() - actual['sum'].to_numpy()).max())
+    return results
+
+if __name__ == "__main__":
+    import argparse
+    from aggregate_cube import build_cube
+    from data_loader import load_and_prepare_data
+    from data_cleaner import clean_data
+    from revenue_analysis import format_revenue_summary
+
+    parser = argparse.ArgumentParser(description="Query the materialized revenue pivots")
+    parser.add_argument('--by', nargs='*', default=['Product'], help="dimensions and/or time grain to keep")
+    parser.add_argument('--product', nargs='*', default=None, help="products to keep")
+    parser.add_argument('--region', nargs='*', default=None, help="regions to keep")
+    parser.add_argument('--period', default=None, help="period such as 2014, 'Q3 2014' or 2014-07")
+    parser.add_argument('--measure', default='Revenue', help="Revenue or Sales")
+    parser.add_argument('--refresh', action='store_true', help="materialize the pivots again")
+    parser.add_argument('--check', action='store_true', help="compare queries with a pandas groupby of the rows")
+    args = parser.parse_args()
+
+    cleaned_df = clean_data(load_and_prepare_data(), verbose=False)
+    cube = build_cube(cleaned_df, verbose=False)
+    start_time = time.perf_counter()
+    pivots = materialized_pivots(cube, refresh=args.refresh)
+    print(f"📦 Pivots ready in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+    if args.check:
+        tolerance = 1e-9 * cleaned_df[args.measure].abs().sum()  # Rounding of the prefix sums
+        for query, difference in check_pivots(cleaned_df, pivots, args.measure).items():
+            print(f"   {'✅' if difference <= tolerance else '❌'} {query}: max difference {difference:.2e}")
+
+    filters = {dim: members for dim, members in (('Product', args.product), ('Region', args.region)) if members}
+    start_time = time.perf_counter()
+    result = query_pivots(pivots, args.by, filters, args.period, measure=args.measure)
+    print(f"🔎 {args.measure} by {args.by or 'total'}, filters {filters or 'none'}, period {args.period or 'all'} "
+          f"({(time.perf_counter() - start_time) * 1000:.2f} ms):")
+    print(format_revenue_summary(result))
\ No newline at end of file
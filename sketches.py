@@ -0,0 +1,262 @@
+# Mergeable sketches for approximate summaries of very large datasets
+
+import numpy as np
+import pandas as pd
+
+# Error bounds of the approximate mode:
+# - quantiles (and describe's min/25%/50%/75%/max): every estimate is within
+#   QUANTILE_ACCURACY of the true value, relative to its magnitude (min and max exact)
+# - moments (count/mean/std per group): exact up to floating point rounding
+# - distinct counts: standard error 1.04 / sqrt(2^HLL_PRECISION) (0.8%), exact-ish
+#   below a few thousand values thanks to linear counting
+# - histogram counts: a value can land in the neighbouring bin only if it lies within
+#   QUANTILE_ACCURACY (relative) of a bin edge
+QUANTILE_ACCURACY = 0.01
+HLL_PRECISION = 14
+PARTITION_ROWS = 1_000_000  # Rows sketched at a time before merging
+
+def quantile_sketch(values, accuracy=QUANTILE_ACCURACY):
+    """
+    DDSketch of the values: counts per logarithmic bucket of width (1 + accuracy) /
+    (1 - accuracy), separately for positive and negative values
+    Args: values (array-like): Values (NaN ignored)
+          accuracy (float): Relative accuracy of the quantile estimates
+    Returns: dict: 'gamma', 'positive' and 'negative' (bucket keys -> counts as
+                   (keys, counts) arrays), 'zeros', 'count', 'min', 'max'
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    gamma = (1 + accuracy) / (1 - accuracy)
+    
+    def buckets(magnitudes):
+        if not len(magnitudes):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        keys = np.ceil(np.log(magnitudes) / np.log(gamma)).astype(np.int64)
+        low = keys.min()
+        counts = np.bincount(keys - low)
+        present = np.flatnonzero(counts)
+        return present + low, counts[present]
+    
+    return {
+        'gamma': gamma,
+        'positive': buckets(values[values > 0]),
+        'negative': buckets(-values[values < 0]),
+        'zeros': int((values == 0).sum()),
+        'count': len(values),
+        'min': values.min() if len(values) else np.nan,
+        'max': values.max() if len(values) else np.nan
+    }
+
+def _merge_buckets(a, b):
+    """Add two (keys, counts) bucket sets"""
+    keys, inverse = np.unique(np.concatenate([a[0], b[0]]), return_inverse=True)
+    return keys, np.bincount(inverse, weights=np.concatenate([a[1], b[1]]), minlength=len(keys)).astype(np.int64)
+
+def merge_quantile_sketches(a, b):
+    """
+    Combine the sketches of two partitions (same accuracy)
+    Args: a, b (dict): Outputs of quantile_sketch
+    Returns: dict: Sketch of both partitions
+    """
+    return {
+        'gamma': a['gamma'],
+        'positive': _merge_buckets(a['positive'], b['positive']),
+        'negative': _merge_buckets(a['negative'], b['negative']),
+        'zeros': a['zeros'] + b['zeros'],
+        'count': a['count'] + b['count'],
+        'min': np.fmin(a['min'], b['min']),
+        'max': np.fmax(a['max'], b['max'])
+    }
+
+def _bucket_values(sketch):
+    """Representative value and count of every bucket, in ascending value order"""
+    gamma = sketch['gamma']
+    represent = lambda keys: 2 * gamma ** keys.astype(np.float64) / (gamma + 1)
+    negative_keys, negative_counts = sketch['negative']
+    positive_keys, positive_counts = sketch['positive']
+    values = np.concatenate([-represent(negative_keys[::-1]), [0.0], represent(positive_keys)])
+    counts = np.concatenate([negative_counts[::-1], [sketch['zeros']], positive_counts])
+    return values, counts
+
+def sketch_quantiles(sketch, quantiles):
+    """
+    Quantile estimates, each within the sketch's relative accuracy of the true value
+    Args: sketch (dict): Output of quantile_sketch
+          quantiles (list): Probabilities (0-1)
+    Returns: numpy.ndarray: Estimates (NaN for an empty sketch)
+    """
+    quantiles = np.asarray(quantiles, dtype=np.float64)
+    if not sketch['count']:
+        return np.full(len(quantiles), np.nan)
+    values, counts = _bucket_values(sketch)
+    ranks = quantiles * (sketch['count'] - 1)
+    positions = np.searchsorted(np.cumsum(counts), ranks, side='right')
+    return np.clip(values[np.minimum(positions, len(values) - 1)], sketch['min'], sketch['max'])
+
+def sketch_histogram(sketch, bins):
+    """
+    Equal-width histogram between the exact min and max, from the bucket counts
+    Args: sketch (dict): Output of quantile_sketch
+          bins (int): Number of bins
+    Returns: tuple: (counts, edges) as numpy.histogram
+    """
+    values, counts = _bucket_values(sketch)
+    values = np.clip(values, sketch['min'], sketch['max'])
+    return np.histogram(values, bins=bins, range=(sketch['min'], sketch['max']), weights=counts)
+
+def welford_moments(values, groups=None):
+    """
+    Count, mean and sum of squared deviations (M2) per group, computed around each
+    group's own mean so that no large sums of squares are formed
+    Args: values (pandas.Series): Values (NaN ignored)
+          groups (pandas.Series): Group labels aligned with values (default: one group)
+    Returns: pandas.DataFrame: Columns 'count', 'mean', 'm2', indexed by group label
+    """
+    x = values.to_numpy(dtype=np.float64)
+    observed = ~np.isnan(x)
+    if groups is None:
+        codes, labels = np.zeros(len(x), dtype=np.int64), pd.Index(['all'])
+    else:
+        codes, labels = pd.factorize(groups, sort=True)
+        labels = pd.Index(labels, name=groups.name).astype(str)
+        observed &= codes >= 0
+    codes, x = codes[observed], x[observed]
+    count = np.bincount(codes, minlength=len(labels)).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(codes, weights=x, minlength=len(labels)) / count
+    m2 = np.bincount(codes, weights=(x - mean[codes]) ** 2, minlength=len(labels))
+    moments = pd.DataFrame({'count': count, 'mean': mean, 'm2': m2}, index=labels)
+    return moments[moments['count'] > 0]
+
+def merge_moments(a, b):
+    """
+    Chan et al. parallel combination of two partitions' moments, aligned on the group label
+    Args: a (pandas.DataFrame or None): Running moments (output of welford_moments)
+          b (pandas.DataFrame): Moments of the next partition
+    Returns: pandas.DataFrame: Moments of both partitions
+    """
+    if a is None:
+        return b
+    index = a.index.union(b.index)
+    a, b = a.reindex(index, fill_value=0), b.reindex(index, fill_value=0)
+    count = a['count'] + b['count']
+    delta = b['mean'] - a['mean']
+    share = b['count'] / count
+    return pd.DataFrame({
+        'count': count,
+        'mean': a['mean'] + delta * share,
+        'm2': a['m2'] + b['m2'] + delta ** 2 * a['count'] * share
+    }, index=index)
+
+def hyperloglog(values, precision=HLL_PRECISION):
+    """
+    HyperLogLog registers of the distinct values
+    Args: values (pandas.Series): Values of any dtype (missing values ignored)
+          precision (int): log2 of the number of registers (11-18)
+    Returns: numpy.ndarray: uint8 registers
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Hash each category once, then gather by code
+        codes = values.cat.codes.to_numpy()
+        hashes = pd.util.hash_array(values.cat.categories.to_numpy())[codes[codes >= 0]]
+    else:
+        hashes = pd.util.hash_array(values.dropna().to_numpy())
+    index = (hashes >> np.uint64(64 - precision)).astype(np.intp)
+    remainder = hashes & np.uint64((1 << (64 - precision)) - 1)
+    # Position of the leftmost 1-bit in the remaining bits (exact in float64 below 2^53)
+    bit_length = np.frexp(remainder.astype(np.float64))[1]
+    registers = np.zeros(1 << precision, dtype=np.uint8)
+    np.maximum.at(registers, index, (64 - precision - bit_length + 1).astype(np.uint8))
+    return registers
+
+def merge_hyperloglogs(a, b):
+    """Registers of the union of two partitions"""
+    return np.maximum(a, b)
+
+def hyperloglog_count(registers):
+    """
+    Distinct count estimated from HyperLogLog registers (linear counting while
+    many registers are still empty)
+    Args: registers (numpy.ndarray): Output of hyperloglog
+    Returns: float: Estimated number of distinct values
+    """
+    m = len(registers)
+    estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(2.0 ** -registers.astype(np.float64))
+    empty = int((registers == 0).sum())
+    if estimate <= 2.5 * m and empty:
+        estimate = m * np.log(m / empty)
+    return estimate
+
+def distinct_count(values, precision=HLL_PRECISION, partition_rows=PARTITION_ROWS):
+    """
+    Approximate nunique, sketched partition by partition and merged
+    Args: values (pandas.Series): Values of any dtype
+          precision (int): HyperLogLog precision
+          partition_rows (int): Rows per partition
+    Returns: int: Estimated number of distinct values
+    """
+    registers = np.zeros(1 << precision, dtype=np.uint8)
+    for start in range(0, len(values), partition_rows):
+        registers = merge_hyperloglogs(registers, hyperloglog(values.iloc[start:start + partition_rows], precision))
+    return int(round(hyperloglog_count(registers)))
+
+def measure_sketch(values):
+    """Quantile sketch and moments of one partition of a measure"""
+    return {'quantiles': quantile_sketch(values), 'moments': welford_moments(values)}
+
+def merge_measure_sketches(a, b):
+    """Combine two partitions' measure sketches (a may be None)"""
+    if a is None:
+        return b
+    return {'quantiles': merge_quantile_sketches(a['quantiles'], b['quantiles']),
+            'moments': merge_moments(a['moments'], b['moments'])}
+
+def describe_sketch(sketch):
+    """
+    describe()-style figures from a measure sketch: exact count/mean/std/min/max and
+    quartiles within QUANTILE_ACCURACY
+    Args: sketch (dict): Output of measure_sketch (possibly merged)
+    Returns: dict: 'count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'
+                   (count 0 and NaN figures for a measure with no observed values)
+    """
+    if sketch['moments'].empty:
+        return dict({'count': 0.0}, **{name: np.nan for name in ('mean', 'std', 'min', '25%', '50%', '75%', 'max')})
+    moments = sketch['moments'].iloc[0]
+    quartiles = sketch_quantiles(sketch['quantiles'], [0.25, 0.5, 0.75])
+    return {
+        'count': float(moments['count']),
+        'mean': float(moments['mean']),
+        'std': float(np.sqrt(moments['m2'] / (moments['count'] - 1))) if moments['count'] > 1 else np.nan,
+        'min': float(sketch['quantiles']['min']),
+        '25%': float(quartiles[0]),
+        '50%': float(quartiles[1]),
+        '75%': float(quartiles[2]),
+        'max': float(sketch['quantiles']['max'])
+    }
+
+if __name__ == "__main__":
+    import time
+    rng = np.random.default_rng(0)
+    n_rows = 20_000_000
+    values = pd.Series(rng.lognormal(8, 1, n_rows))
+    labels = pd.Series(rng.integers(0, 250_000, n_rows))
+    
+    start = time.time()
+    exact = values.describe()
+    exact_distinct = labels.nunique()
+    exact_time = time.time() - start
+    
+    start = time.time()
+    sketch = None
+    for offset in range(0, n_rows, PARTITION_ROWS):
+        sketch = merge_measure_sketches(sketch, measure_sketch(values.iloc[offset:offset + PARTITION_ROWS]))
+    approx = describe_sketch(sketch)
+    approx_distinct = distinct_count(labels)
+    approx_time = time.time() - start
+    
+    print(f"📐 {n_rows:,} rows: exact {exact_time:.2f}s, sketches {approx_time:.2f}s")
+    for key in ('mean', 'std', '25%', '50%', '75%'):
+        print(f"   {key}: exact {exact[key]:,.2f}, approx {approx[key]:,.2f} "
+              f"({abs(approx[key] / exact[key] - 1):.3%} off)")
+    print(f"   distinct: exact {exact_distinct:,}, approx {approx_distinct:,} "
+          f"({abs(approx_distinct / exact_distinct - 1):.3%} off)")
\ No newline at end of file
@@ -0,0 +1,174 @@
+# Sort-once time index: period boundaries over date-sorted rows
+
+import numpy as np
+import pandas as pd
+
+from dimensions import dimension_codes
+
+# Periods from finest to coarsest; 'date' is every distinct Date value
+PERIODS = ['date', 'day', 'week', 'month', 'quarter', 'year']
+
+def _period_keys(dates, period):
+    """
+    Monotonic integer key identifying the period of each (sorted) date
+    Args: dates (numpy.ndarray): datetime64[ns] values
+          period (str): One of PERIODS
+    Returns: numpy.ndarray: int64 keys (days for day/week, months for month/quarter, years)
+    """
+    if period == 'date':
+        return dates.view(np.int64)
+    if period in ('day', 'week'):
+        days = dates.astype('datetime64[D]').astype(np.int64)
+        # 1970-01-01 was a Thursday: weeks end on Sunday like resample('W')
+        return days + (6 - (days + 3) % 7) if period == 'week' else days
+    if period in ('month', 'quarter'):
+        months = dates.astype('datetime64[M]').astype(np.int64)
+        return months - months % 3 if period == 'quarter' else months
+    return dates.astype('datetime64[Y]').astype(np.int64)
+
+def _period_labels(keys, period):
+    """
+    Label each period by its last day (the resample('ME'/'QE'/'YE'/'W') convention),
+    or by the date itself for 'date' and 'day'
+    Args: keys (numpy.ndarray): Keys from _period_keys
+          period (str): One of PERIODS
+    Returns: pandas.DatetimeIndex: Period labels
+    """
+    if period == 'date':
+        ends = keys.astype('datetime64[ns]')
+    elif period in ('day', 'week'):
+        ends = keys.astype('datetime64[D]')
+    elif period in ('month', 'quarter'):
+        span = 3 if period == 'quarter' else 1
+        ends = (keys + span).astype('datetime64[M]').astype('datetime64[D]') - np.timedelta64(1, 'D')
+    else:
+        ends = (keys + 1).astype('datetime64[Y]').astype('datetime64[D]') - np.timedelta64(1, 'D')
+    return pd.DatetimeIndex(ends.astype('datetime64[ns]'), name='Date')
+
+def build_time_index(dates):
+    """
+    Period boundaries of date-sorted rows, built in one linear pass: the rows
+    are scanned once for changes of Date, and every coarser period is derived
+    from the distinct dates only. Missing dates must come last (as after
+    clean_data's sort).
+    Args: dates (pandas.Series or pandas.Index): Sorted datetime values
+    Returns: dict: 'n_rows', 'stop' (rows before the missing dates) and, per period
+                   in PERIODS, {'starts': row offsets, 'labels': DatetimeIndex}
+    """
+    values = np.asarray(dates, dtype='datetime64[ns]')
+    stop = len(values) - int(np.isnat(values[::-1]).cumprod().sum())
+    ordinals = values[:stop].view(np.int64)
+    if np.any(ordinals[1:] < ordinals[:-1]) or np.isnat(values[:stop]).any():
+        raise ValueError("build_time_index needs rows sorted by Date with missing dates last")
+    
+    # The only pass over the rows: offsets where Date changes
+    starts = np.flatnonzero(np.r_[True, ordinals[1:] != ordinals[:-1]]) if stop else np.zeros(0, np.int64)
+    distinct = values[starts]
+    index = {'n_rows': len(values), 'stop': stop}
+    for period in PERIODS:
+        keys = _period_keys(distinct, period)
+        first = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else starts
+        index[period] = {'starts': starts[first], 'labels': _period_labels(keys[first], period)}
+    return index
+
+def period_lengths(time_index, period):
+    """Rows in each period"""
+    return np.diff(np.append(time_index[period]['starts'], time_index['stop']))
+
+def period_codes(time_index, period):
+    """
+    Period number of every row (-1 for rows with a missing date), without hashing
+    Args: time_index (dict): Output of build_time_index
+          period (str): One of PERIODS
+    Returns: numpy.ndarray: int64 codes, usable as a (codes, labels) group-by key
+    """
+    codes = np.full(time_index['n_rows'], -1, dtype=np.int64)
+    n_periods = len(time_index[period]['starts'])
+    codes[:time_index['stop']] = np.repeat(np.arange(n_periods), period_lengths(time_index, period))
+    return codes
+
+def segment_sums(time_index, period, values):
+    """
+    Sum of values per period as contiguous segments (np.add.reduceat)
+    Args: time_index (dict): Output of build_time_index
+          period (str): One of PERIODS
+          values (numpy.ndarray): Row values in the indexed order
+    Returns: numpy.ndarray: One sum per period
+    """
+    starts = time_index[period]['starts']
+    if not len(starts):
+        return np.zeros(0, dtype=np.asarray(values).dtype)
+    return np.add.reduceat(np.asarray(values)[:time_index['stop']], starts)
+
+def period_totals(df, time_index, period, columns):
+    """
+    Totals of several columns per period
+    Args: df (pandas.DataFrame): Rows in the indexed order
+          time_index (dict): Output of build_time_index
+          period (str): One of PERIODS
+          columns (list): Numeric columns to sum (missing values count as 0)
+    Returns: pandas.DataFrame: Indexed by period label
+    """
+    totals = {col: segment_sums(time_index, period, df[col].to_numpy(dtype=np.float64, na_value=0))
+              for col in columns}
+    return pd.DataFrame(totals, index=time_index[period]['labels'])
+
+def downsample(df, time_index, periods, columns):
+    """
+    Totals of several columns at successively coarser periods, computed once:
+    the first period is summed over the rows, and every later one from the
+    totals of the previous period when its boundaries nest (month -> quarter -> year),
+    so a week -> month -> quarter -> year chain touches the rows only once
+    Args: df (pandas.DataFrame): Rows in the indexed order
+          time_index (dict): Output of build_time_index
+          periods (list): Periods of PERIODS, finest first
+          columns (list): Numeric columns to sum (missing values count as 0)
+    Returns: dict: Period -> pandas.DataFrame indexed by period label
+    """
+    totals = {}
+    previous = None
+    for period in periods:
+        starts = time_index[period]['starts']
+        if previous is not None and np.isin(starts, time_index[previous]['starts']).all():
+            # Coarser boundaries are a subset of the finer ones: reduce the finer totals
+            offsets = np.searchsorted(time_index[previous]['starts'], starts)
+            finer = totals[previous]
+            sums = {col: np.add.reduceat(finer[col].to_numpy(), offsets) if len(offsets) else
+                    np.zeros(0) for col in columns}
+            totals[period] = pd.DataFrame(sums, index=time_index[period]['labels'])
+        else:
+            totals[period] = period_totals(df, time_index, period, columns)
+        previous = period
+    return totals
+
+def period_breakdown(df, time_index, period, dimension, measure):
+    """
+    Per-period totals of a measure split by a dimension (periods x members),
+    from the period codes and the dimension's integer codes
+    Args: df (pandas.DataFrame): Rows in the indexed order
+          time_index (dict): Output of build_time_index
+          period (str): One of PERIODS
+          dimension (str): Dimension column, e.g. 'Product'
+          measure (str): Numeric column to sum
+    Returns: pandas.DataFrame: Periods as rows, dimension members as columns
+    """
+    member_codes, members = dimension_codes(df[dimension])
+    rows = period_codes(time_index, period)
+    keep = (rows >= 0) & (member_codes >= 0)
+    n_members = len(members)
+    cells = rows[keep] * n_members + member_codes[keep]
+    values = df[measure].to_numpy(dtype=np.float64, na_value=0)[keep]
+    n_periods = len(time_index[period]['starts'])
+    table = np.bincount(cells, weights=values, minlength=n_periods * n_members)
+    return pd.DataFrame(table.reshape(n_periods, n_members), index=time_index[period]['labels'],
+                        columns=pd.Index(members, name=dimension))
+
+if __name__ == "__main__":
+    from data_loader import create_sample_data
+    from data_cleaner import clean_data
+    cleaned_df = clean_data(create_sample_data(), verbose=False)
+    time_index = build_time_index(cleaned_df['Date'])
+    for period in PERIODS:
+        print(f"{period:>8}: {len(time_index[period]['starts'])} periods")
+    print(period_totals(cleaned_df, time_index, 'quarter', ['Sales', 'Revenue']).head())
+    print(period_breakdown(cleaned_df, time_index, 'year', 'Region', 'Revenue'))
\ No newline at end of file
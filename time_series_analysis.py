@@ -1,39 +1,69 @@
 # Trend and seasonal analysis
 
-import matplotlib.pyplot as plt
-import seaborn as sns
 import pandas as pd
 import numpy as np
+from rendering import RENDER_SETTINGS, load_pyplot, save_figure
+from aggregate_cube import build_cube, roll_up
+from frequency import (FREQUENCIES, MOVING_AVERAGE_MONTHS, infer_frequency, iso_weeks, regular_index,
+                       seasonal_key, window_periods)
+from time_index import build_time_index, downsample
 
 def setup_plot_style():
-    """Set up consistent plot style"""
+    """
+    Set up consistent plot style
+    Returns: tuple: (matplotlib.pyplot, seaborn), imported on first use
+    """
+    import seaborn as sns
+    plt = load_pyplot()
     plt.style.use('seaborn-v0_8')
     sns.set_palette("husl")
+    return plt, sns
 
-def time_series_analysis(df):
+def build_monthly_data(df, cube=None):
     """
-    Perform time series analysis including trends and seasonal patterns
-    Args: df (pandas.DataFrame): Cleaned data
-    Returns: pandas.DataFrame: Monthly aggregated data
+    Totals per period at the data's own frequency (monthly, weekly or daily) with
+    moving averages and calendar columns (no plotting)
+    Args: df (pandas.DataFrame): Cleaned data or Date-level totals (None when cube is given)
+          cube (pandas.DataFrame): Aggregate cube of df (see aggregate_cube.build_cube)
+    Returns: pandas.DataFrame: Aggregated data on a gap-free period grid; weekly data
+                               adds the ISO 'Week' and, when known, 'IsHoliday'
     """
-    print("\n" + "="*50)
-    print("📈 TIME SERIES ANALYSIS")
-    print("="*50)
-    
-    setup_plot_style()
+    # Aggregate data to the Date level (a roll-up of the cube's Date cells)
+    if cube is None:
+        cube = build_cube(df, verbose=False)
+    by_date = roll_up(cube, ['Date'])
+    monthly_data = pd.DataFrame({'Sales': by_date['Sales_sum']})
+    if 'Revenue_sum' in by_date.columns:
+        monthly_data['Revenue'] = by_date['Revenue_sum']
+    
+    # Missing periods become empty rows, so moving averages span time, not rows
+    frequency = infer_frequency(monthly_data.index)
+    grid = regular_index(monthly_data.index, frequency)
+    if len(grid) != len(monthly_data):
+        monthly_data = monthly_data.reindex(grid)
+    
+    # Calculate moving averages for trend analysis (3, 6 and 12 months of periods)
+    for months in MOVING_AVERAGE_MONTHS:
+        window = window_periods(months, frequency)
+        monthly_data[f'MA_{months}'] = monthly_data['Sales'].rolling(window=window).mean()
     
-    # Aggregate data to monthly level
-    monthly_data = df.groupby('Date').agg({
-        'Sales': 'sum',
-        'Revenue': 'sum'
-    }).reset_index()
-    
-    monthly_data = monthly_data.set_index('Date')
-    
-    # Calculate moving averages for trend analysis
-    monthly_data['MA_3'] = monthly_data['Sales'].rolling(window=3).mean()
-    monthly_data['MA_6'] = monthly_data['Sales'].rolling(window=6).mean()
-    monthly_data['MA_12'] = monthly_data['Sales'].rolling(window=12).mean()
+    monthly_data['Year'] = monthly_data.index.year
+    monthly_data['Month'] = monthly_data.index.month
+    if frequency == 'weekly':
+        monthly_data['Week'] = iso_weeks(monthly_data.index)[1]
+        if 'holiday_rows' in by_date.columns:
+            monthly_data['IsHoliday'] = by_date['holiday_rows'].reindex(monthly_data.index, fill_value=0) > 0
+    return monthly_data
+
+def plot_time_series_dashboard(monthly_data, seasonal_pattern, rollups):
+    """
+    Draw and save the trend and seasonality dashboard
+    Args: monthly_data (pandas.DataFrame): Output of build_monthly_data
+          seasonal_pattern (pandas.Series): Average sales per calendar month (ISO week
+                                            for weekly data)
+          rollups (dict): Quarterly and yearly totals (see time_index.downsample)
+    """
+    plt, sns = setup_plot_style()
     
     # Create comprehensive time series dashboard
     fig, axes = plt.subplots(2, 2, figsize=(16, 12))
@@ -48,6 +78,10 @@ def time_series_analysis(df):
                    label='6-Month MA', linewidth=2)
     axes[0, 0].plot(monthly_data.index, monthly_data['MA_12'], 
                    label='12-Month MA', linewidth=2)
+    if 'IsHoliday' in monthly_data.columns:
+        holidays = monthly_data[monthly_data['IsHoliday']]
+        axes[0, 0].scatter(holidays.index, holidays['Sales'], color='red', s=20, zorder=3,
+                           label='Holiday Weeks')
     axes[0, 0].set_title('Sales Trend with Moving Averages', fontweight='bold')
     axes[0, 0].set_xlabel('Date')
     axes[0, 0].set_ylabel('Sales')
@@ -55,25 +89,27 @@ def time_series_analysis(df):
     axes[0, 0].grid(True, alpha=0.3)
     
     # 2. Seasonal decomposition (simplified)
-    monthly_data['Year'] = monthly_data.index.year
-    monthly_data['Month'] = monthly_data.index.month
-    
-    seasonal_pattern = monthly_data.groupby('Month')['Sales'].mean()
     axes[0, 1].plot(seasonal_pattern.index, seasonal_pattern.values, 
                    marker='o', linewidth=2, color='green')
-    axes[0, 1].set_title('Seasonal Pattern (Monthly Average)', fontweight='bold')
-    axes[0, 1].set_xlabel('Month')
     axes[0, 1].set_ylabel('Average Sales')
     axes[0, 1].grid(True, alpha=0.3)
-    axes[0, 1].set_xticks(range(1, 13))
-    
-    # Add month names to x-axis
-    month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 
-                  'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    axes[0, 1].set_xticklabels(month_names)
+    if seasonal_pattern.index.name == 'Week':
+        axes[0, 1].set_title('Seasonal Pattern (ISO Week Average)', fontweight='bold')
+        axes[0, 1].set_xlabel('ISO Week')
+        axes[0, 1].set_xticks(range(1, 54, 4))
+    else:
+        axes[0, 1].set_title('Seasonal Pattern (Monthly Average)', fontweight='bold')
+        axes[0, 1].set_xlabel('Month')
+        axes[0, 1].set_xticks(range(1, 13))
+        
+        # Add month names to x-axis
+        month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 
+                      'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+        axes[0, 1].set_xticklabels(month_names)
     
     # 3. Year-over-year comparison
-    yearly_sales = monthly_data.groupby('Year')['Sales'].sum()
+    yearly_sales = rollups['year']['Sales'].copy()
+    yearly_sales.index = yearly_sales.index.year
     bars = axes[1, 0].bar(yearly_sales.index, yearly_sales.values, 
                          color=sns.color_palette())
     axes[1, 0].set_title('Yearly Sales Comparison', fontweight='bold')
@@ -87,7 +123,7 @@ def time_series_analysis(df):
                        f'{height:,.0f}', ha='center', va='bottom', fontweight='bold')
     
     # 4. Quarterly sales trend
-    quarterly_sales = monthly_data.resample('Q').sum()['Sales']
+    quarterly_sales = rollups['quarter']['Sales']
     axes[1, 1].plot(quarterly_sales.index, quarterly_sales.values, 
                    marker='o', linewidth=2, color='red')
     axes[1, 1].set_title('Quarterly Sales Trend', fontweight='bold')
@@ -96,14 +132,41 @@ def time_series_analysis(df):
     axes[1, 1].grid(True, alpha=0.3)
     
     plt.tight_layout()
-    plt.savefig('time_series_analysis.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    save_figure(fig, 'time_series_analysis')
+
+def time_series_analysis(df, cube=None):
+    """
+    Perform time series analysis including trends and seasonal patterns
+    Args: df (pandas.DataFrame): Cleaned data or Date-level totals (None when cube is given)
+          cube (pandas.DataFrame): Aggregate cube of df (see aggregate_cube.build_cube)
+    Returns: pandas.DataFrame: Monthly aggregated data
+    """
+    print("\n" + "="*50)
+    print("📈 TIME SERIES ANALYSIS")
+    print("="*50)
+    
+    monthly_data = build_monthly_data(df, cube)
+    frequency = infer_frequency(monthly_data.index)
+    unit = FREQUENCIES[frequency]['unit']
+    # Seasonal cycle by calendar month, or by ISO week (52/53 per year) for weekly data
+    seasonal_pattern = monthly_data['Sales'].groupby(seasonal_key(monthly_data.index, frequency)).mean()
+    
+    # Month, quarter and year totals, each coarser level summed from the previous one
+    rollups = downsample(monthly_data, build_time_index(monthly_data.index), ['month', 'quarter', 'year'],
+                         ['Sales'])
+    
+    if RENDER_SETTINGS['figures']:
+        plot_time_series_dashboard(monthly_data, seasonal_pattern, rollups)
     
     # Print trend analysis results
     print("\n📊 TREND ANALYSIS RESULTS:")
     print(f"Data period: {monthly_data.index.min()} to {monthly_data.index.max()}")
-    print(f"Total months: {len(monthly_data)}")
-    print(f"Average monthly sales: {monthly_data['Sales'].mean():,.2f}")
+    print(f"Data frequency: {frequency}")
+    print(f"Total {unit}s: {len(monthly_data)}")
+    print(f"Average {frequency} sales: {monthly_data['Sales'].mean():,.2f}")
+    if frequency != 'monthly':
+        print(f"Average monthly sales: {rollups['month']['Sales'].mean():,.2f} "
+              f"({len(rollups['month'])} months)")
     
     # Calculate growth rate
     if len(monthly_data) > 1:
@@ -116,12 +179,26 @@ def time_series_analysis(df):
     seasonal_strength = seasonal_pattern.std() / monthly_data['Sales'].mean() * 100
     print(f"Seasonal strength: {seasonal_strength:.2f}%")
     
+    # Holiday weeks against the other weeks
+    if 'IsHoliday' in monthly_data.columns and monthly_data['IsHoliday'].any():
+        holiday_sales = monthly_data.loc[monthly_data['IsHoliday'], 'Sales'].mean()
+        other_sales = monthly_data.loc[~monthly_data['IsHoliday'], 'Sales'].mean()
+        print(f"Holiday weeks: {int(monthly_data['IsHoliday'].sum())}, "
+              f"average sales {holiday_sales:,.2f} ({(holiday_sales / other_sales - 1) * 100:+.1f}% vs other weeks)")
+    
     return monthly_data
 
 if __name__ == "__main__":
-    from data_loader import create_sample_data
-    from data_cleaner import clean_data
-    test_df = create_sample_data()
-    cleaned_df = clean_data(test_df)
-    monthly_data = time_series_analysis(cleaned_df)
+    import sys
+    if '--walmart' in sys.argv:
+        # Weekly Store x Dept sales with holiday flags
+        from walmart_data import load_walmart_dataset
+        weekly = load_walmart_dataset().rename(columns={'Weekly_Sales': 'Sales'})
+        monthly_data = time_series_analysis(weekly[['Date', 'Sales', 'IsHoliday']])
+    else:
+        from data_loader import create_sample_data
+        from data_cleaner import clean_data
+        test_df = create_sample_data()
+        cleaned_df = clean_data(test_df)
+        monthly_data = time_series_analysis(cleaned_df)
     print(f"Monthly data shape: {monthly_data.shape}")
\ No newline at end of file
@@ -0,0 +1,289 @@
+# Grid search of forecasting parameters across many series at once
+
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from backtesting import prefix_statistics, rolling_origin_cutoffs
+from batch_forecasting import _shared, map_row_chunks, series_matrix
+
+PARAMS_FILE = 'tuned_params.json'
+MAX_ENTRIES = 16  # Tuned parameter sets kept in PARAMS_FILE, most recent first
+
+# Candidate parameters per data frequency: smoothing alphas, rolling mean windows
+# and seasonal lags of the naive forecast
+ALPHA_GRID = (0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.7, 0.9)
+GRIDS = {
+    'daily': {'alphas': ALPHA_GRID, 'windows': (7, 28, 91, 182, 365), 'lags': (7, 91, 365)},
+    'monthly': {'alphas': ALPHA_GRID, 'windows': (3, 6, 12, 24), 'lags': (3, 6, 12)},
+    'weekly': {'alphas': ALPHA_GRID, 'windows': (4, 8, 13, 26, 52), 'lags': (13, 26, 52)}
+}
+
+# Tuned method -> parameter it is tuned on (also the output column)
+TUNED_PARAMETERS = {
+    'Rolling Mean': 'window',
+    'Exponential Smoothing': 'alpha',
+    'Seasonal Naive': 'season_lag'
+}
+
+def _window_means(stats, cutoffs, widths):
+    """
+    Means of the last width observations before every cutoff, for every width
+    Args: stats (dict): Output of backtesting.prefix_statistics
+          cutoffs (numpy.ndarray): Training lengths (folds)
+          widths (numpy.ndarray): Window widths
+    Returns: numpy.ndarray: (series x width x fold), NaN without observations
+    """
+    starts = np.maximum(cutoffs[None, :] - widths[:, None], 0)
+    total = stats['cumsum'][:, cutoffs][:, None, :] - stats['cumsum'][:, starts]
+    count = stats['cumcount'][:, cutoffs][:, None, :] - stats['cumcount'][:, starts]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return total / count
+
+def _mean_abs_error(forecast, actual):
+    """
+    MAE over folds and horizon of every candidate
+    Args: forecast (numpy.ndarray): (series x candidate x fold x horizon), broadcastable
+          actual (numpy.ndarray): (series x fold x horizon)
+    Returns: numpy.ndarray: (series x candidate), inf where nothing could be scored
+    """
+    error = np.abs(forecast - actual[:, None])
+    valid = ~np.isnan(error)
+    count = valid.sum(axis=(2, 3))
+    total = np.where(valid, error, 0).sum(axis=(2, 3))
+    return np.where(count > 0, total / np.maximum(count, 1), np.inf)
+
+def grid_errors(values, cutoffs, horizon, alphas, windows, lags):
+    """
+    Backtest error of every candidate parameter for every series in one broadcast
+    pass: rolling means for all windows come from prefix-sum differences, smoothing
+    levels for all alphas from one blocked smoothing run, and seasonal naive
+    forecasts for all lags from one gather
+    Args: values (numpy.ndarray): (series x period) matrix, NaN for missing periods
+          cutoffs (list): Training lengths of the rolling-origin folds
+          horizon (int): Periods forecast per fold
+          alphas, windows, lags (tuple): Candidate parameters
+    Returns: numpy.ndarray: (series x candidate) MAE, candidates ordered as
+                            windows, then alphas, then lags
+    """
+    cutoffs = np.asarray(cutoffs)
+    windows, lags = np.asarray(windows), np.asarray(lags)
+    stats = prefix_statistics(values, np.asarray(alphas, dtype=np.float64))
+    steps = np.arange(horizon)
+    actual = values[:, cutoffs[:, None] + steps]
+    
+    # Rolling Mean: (series x window x fold), constant over the horizon
+    rolling = _window_means(stats, cutoffs, windows)[..., None]
+    
+    # Exponential Smoothing: level after each cutoff, (series x alpha x fold)
+    level = stats['smoothed'][:, :, cutoffs - 1].transpose(1, 0, 2)
+    has_history = stats['cumcount'][:, cutoffs] > 0
+    level = np.where(has_history[:, None], level, np.nan)[..., None]
+    
+    # Seasonal Naive: same step one lag earlier, mean of that lag if unobserved
+    index = cutoffs[None, :, None] - lags[:, None, None] + steps[None, None, :] % lags[:, None, None]
+    seasonal = values[:, index]
+    seasonal = np.where(np.isnan(seasonal), _window_means(stats, cutoffs, lags)[..., None], seasonal)
+    
+    return np.concatenate([_mean_abs_error(rolling, actual), _mean_abs_error(level, actual),
+                           _mean_abs_error(seasonal, actual)], axis=1)
+
+def _grid_rows(start, stop, cutoffs, horizon, alphas, windows, lags):
+    """Pool task: (series x candidate) errors for rows [start, stop)"""
+    return grid_errors(_shared['values'][start:stop], cutoffs, horizon, alphas, windows, lags)
+
+def grid_search(values, horizon, n_folds=4, step=None, grid=GRIDS['weekly'], workers=1, chunk_size=256):
+    """
+    Pick the best parameter of each method and the best method per series by
+    rolling-origin backtest MAE
+    Args: values (numpy.ndarray): (series x period) matrix, NaN for missing periods
+          horizon (int): Periods forecast per fold
+          n_folds (int): Number of cutoffs
+          step (int): Periods between cutoffs (default: horizon)
+          grid (dict): 'alphas', 'windows' and 'lags' candidates
+          workers (int): Worker processes (1 runs in-process)
+          chunk_size (int): Series per task
+    Returns: pandas.DataFrame: One row per series with 'window', 'alpha', 'season_lag',
+                               the best 'method' and its 'MAE' (NaN if never scored)
+    """
+    n_series, n_periods = values.shape
+    # Every fold must cover the shortest seasonal lag; candidates longer than the
+    # first training window are dropped (windows would only be truncated)
+    cutoffs = rolling_origin_cutoffs(n_periods, horizon, n_folds, step, min_train=min(grid['lags']))
+    if not cutoffs:
+        raise ValueError(f"History of {n_periods} periods is too short for horizon {horizon}")
+    candidates = {
+        'window': [w for w in grid['windows'] if w <= cutoffs[0]] or [cutoffs[0]],
+        'alpha': list(grid['alphas']),
+        'season_lag': [lag for lag in grid['lags'] if lag <= cutoffs[0]]
+    }
+    
+    blocks = map_row_chunks(_grid_rows, {'values': values}, n_series,
+                            (cutoffs, horizon, candidates['alpha'], candidates['window'],
+                             candidates['season_lag']), workers=workers, chunk_size=chunk_size)
+    errors = np.concatenate(blocks) if blocks else np.empty((0, 0))
+    
+    # Best candidate within each method's block of columns, then the best method
+    tuned = {}
+    method_errors = []
+    offset = 0
+    for method, param in TUNED_PARAMETERS.items():
+        block = errors[:, offset:offset + len(candidates[param])]
+        offset += len(candidates[param])
+        best = block.argmin(axis=1)
+        tuned[param] = np.asarray(candidates[param])[best]
+        method_errors.append(block[np.arange(n_series), best])
+    method_errors = np.stack(method_errors, axis=1)
+    best_method = method_errors.argmin(axis=1)
+    best_error = method_errors[np.arange(n_series), best_method]
+    
+    tuned['method'] = np.asarray(list(TUNED_PARAMETERS))[best_method]
+    tuned['MAE'] = np.where(np.isinf(best_error), np.nan, best_error)
+    return pd.DataFrame(tuned)
+
+def parameters_fingerprint(values, settings):
+    """
+    Identify a series matrix and the search settings
+    Args: values (numpy.ndarray): (series x period) matrix
+          settings (dict): JSON-serialisable search settings
+    Returns: str: Hex digest
+    """
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode())
+    digest.update(str(values.shape).encode())
+    digest.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+def load_parameters(fingerprint, path=PARAMS_FILE):
+    """
+    Tuned parameters saved for this fingerprint
+    Args: fingerprint (str): Output of parameters_fingerprint
+          path (str): Parameters file
+    Returns: pandas.DataFrame or None: Saved parameters, or None if not found
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            entry = json.load(f).get(fingerprint)
+    except (OSError, ValueError):
+        return None
+    return None if entry is None else pd.DataFrame(entry['parameters'])
+
+def save_parameters(fingerprint, params, settings, path=PARAMS_FILE):
+    """
+    Store tuned parameters atomically, keeping the MAX_ENTRIES most recent sets
+    Args: fingerprint (str): Output of parameters_fingerprint
+          params (pandas.DataFrame): Output of grid_search (plus series keys)
+          settings (dict): Search settings, stored for reference
+          path (str): Parameters file
+    """
+    entries = {}
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+    entries[fingerprint] = {
+        'created': time.time(),
+        'settings': settings,
+        'parameters': json.loads(params.to_json(orient='columns', double_precision=15))
+    }
+    recent = sorted(entries, key=lambda key: entries[key]['created'], reverse=True)[:MAX_ENTRIES]
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({key: entries[key] for key in recent}, f)
+    os.replace(tmp_path, path)
+
+def tune_parameters(values, horizon, series_keys=None, n_folds=4, frequency='weekly', retune=False,
+                    path=PARAMS_FILE, workers=1, chunk_size=256):
+    """
+    Tuned parameters per series, searched once and reused by later runs on the
+    same data and settings
+    Args: values (numpy.ndarray): (series x period) matrix, NaN for missing periods
+          horizon (int): Periods forecast per fold
+          series_keys (pandas.DataFrame): Optional key columns, one row per series
+          n_folds (int): Number of cutoffs
+          frequency (str): Key of GRIDS ('daily', 'weekly' or 'monthly')
+          retune (bool): Search again even if saved parameters exist
+          path (str): Parameters file (None disables persistence)
+          workers (int): Worker processes for the search
+          chunk_size (int): Series per task
+    Returns: pandas.DataFrame: Output of grid_search, keys first when given
+    """
+    grid = GRIDS[frequency]
+    settings = {'horizon': int(horizon), 'n_folds': int(n_folds), 'frequency': frequency,
+                'grid': {name: list(options) for name, options in grid.items()}}
+    fingerprint = parameters_fingerprint(values, settings)
+    
+    if path and not retune:
+        params = load_parameters(fingerprint, path)
+        if params is not None:
+            print(f"♻️  Reusing tuned parameters for {len(params):,} series from {path}")
+            return params
+    
+    start_time = time.time()
+    params = grid_search(values, horizon, n_folds, grid=grid, workers=workers, chunk_size=chunk_size)
+    n_candidates = sum(len(options) for options in grid.values())
+    print(f"🎛️  Searched {n_candidates} candidates x {len(params):,} series in "
+          f"{time.time() - start_time:.2f}s")
+    if series_keys is not None:
+        params = pd.concat([series_keys.reset_index(drop=True), params], axis=1)
+    if path:
+        save_parameters(fingerprint, params, settings, path)
+        print(f"💾 Tuned parameters saved to {path}")
+    return params
+
+def tune_series(series, horizon=6, frequency='monthly', retune=False, path=PARAMS_FILE):
+    """
+    Tuned parameters of a single series (e.g. the monthly sales of simple_forecasting)
+    Args: series (pandas.Series): Observations in time order
+          horizon (int): Periods forecast per fold
+          frequency (str): Key of GRIDS
+          retune (bool): Search again even if saved parameters exist
+          path (str): Parameters file
+    Returns: dict: 'window', 'alpha', 'season_lag' and the best 'method'
+    """
+    values = series.to_numpy(dtype=np.float64)[None, :]
+    params = tune_parameters(values, horizon, frequency=frequency, retune=retune, path=path)
+    return {param: params[param].iloc[0] for param in list(TUNED_PARAMETERS.values()) + ['method']}
+
+def tune_dataset(dataset, horizon=13, n_folds=4, keys=('Store', 'Dept'), value_col='Weekly_Sales',
+                 frequency='weekly', retune=False, workers=1, chunk_size=256):
+    """
+    Tune the forecasting parameters of every series in a long-format dataset
+    Args: dataset (pandas.DataFrame): Long-format rows (e.g. walmart_data.load_walmart_dataset)
+          horizon (int): Periods forecast per fold
+          n_folds (int): Number of cutoffs
+          keys (tuple): Columns identifying a series
+          value_col (str): Column holding the observations
+          frequency (str): Key of GRIDS
+          retune (bool): Search again even if saved parameters exist
+          workers (int): Worker processes for the search
+          chunk_size (int): Series per task
+    Returns: pandas.DataFrame: Keys and tuned parameters per series
+    """
+    print("\n" + "="*50)
+    print("🎛️  PARAMETER TUNING")
+    print("="*50)
+    
+    values, series_keys, _ = series_matrix(dataset, keys, value_col)
+    params = tune_parameters(values, horizon, series_keys, n_folds, frequency, retune,
+                             workers=workers, chunk_size=chunk_size)
+    
+    print("\n📊 BEST METHOD PER SERIES:")
+    print(params['method'].value_counts().to_string())
+    for param in TUNED_PARAMETERS.values():
+        print(f"\n{param} chosen:")
+        print(params[param].value_counts().sort_index().to_string())
+    return params
+
+if __name__ == "__main__":
+    import sys
+    from walmart_data import load_walmart_dataset
+    train = load_walmart_dataset()
+    params = tune_dataset(train, retune='--retune' in sys.argv)
+    print(params.head(10))
\ No newline at end of file
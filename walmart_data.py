@@ -0,0 +1,225 @@
+# Walmart multi-file dataset assembly (train/test + features + stores)
+
+import os
+import re
+import numpy as np
+import pandas as pd
+
+TRAIN_FILE = 'train.csv'
+TEST_FILE = 'test.csv'
+FEATURES_FILE = 'features.csv'
+STORES_FILE = 'stores.csv'
+
+FEATURE_COLUMNS = ['Temperature', 'Fuel_Price', 'MarkDown1', 'MarkDown2', 'MarkDown3',
+                   'MarkDown4', 'MarkDown5', 'CPI', 'Unemployment']
+
+SALES_DTYPES = {'Store': 'int16', 'Dept': 'int16', 'Weekly_Sales': 'float32', 'IsHoliday': 'bool'}
+FEATURE_DTYPES = dict({'Store': 'int16', 'IsHoliday': 'bool'},
+                      **{col: 'float32' for col in FEATURE_COLUMNS})
+
+def date_ordinal(dates):
+    """
+    Convert dates to integer day ordinals (days since 1970-01-01)
+    Args: dates (pandas.Series): Datetime values
+    Returns: numpy.ndarray: int32 day numbers
+    """
+    return dates.to_numpy(dtype='datetime64[D]').astype(np.int32)
+
+# Offset that maps every int32 day ordinal (negative before 1970) to 0 .. 2**32 - 1
+ORDINAL_OFFSET = 1 << 31
+
+def _join_key(stores, ordinals):
+    """Pack (Store, date ordinal) into one sortable int64 key"""
+    return (stores.astype(np.int64) << 32) | (ordinals.astype(np.int64) + ORDINAL_OFFSET)
+
+def read_stores(path=STORES_FILE):
+    """
+    Read store metadata (Store, Type, Size)
+    Args: path (str): Path to stores.csv
+    Returns: pandas.DataFrame: One row per store, sorted by Store
+    """
+    with open(path) as f:
+        text = f.read().strip()
+    
+    if '\n' in text:
+        stores = pd.read_csv(path)
+    else:
+        # Some exports lost their line breaks ("Store,Type,Size1,A,1513152,A,..."):
+        # every Size runs into the next Store id, which is always the previous id + 1
+        tokens = text.split(',')
+        match = re.fullmatch(r'Size(\d+)', tokens[2])
+        if tokens[:2] != ['Store', 'Type'] or match is None:
+            raise ValueError(f"Unrecognised store file layout in '{path}'")
+        rows = []
+        store = int(match.group(1))
+        for i in range(3, len(tokens), 2):
+            store_type, size = tokens[i], tokens[i + 1]
+            next_id = str(store + 1)
+            if i + 2 < len(tokens):
+                if not size.endswith(next_id):
+                    raise ValueError(f"Cannot split size and store id in '{size}'")
+                size = size[:-len(next_id)]
+            rows.append((store, store_type, int(size)))
+            store += 1
+        stores = pd.DataFrame(rows, columns=['Store', 'Type', 'Size'])
+    
+    stores['Store'] = stores['Store'].astype('int16')
+    stores['Type'] = stores['Type'].astype('category')
+    stores['Size'] = stores['Size'].astype('int32')
+    return stores.sort_values('Store', ignore_index=True)
+
+def read_features(path=FEATURES_FILE):
+    """
+    Read per-Store x Date features, sorted by the (Store, date ordinal) join key
+    Args: path (str): Path to features.csv
+    Returns: pandas.DataFrame: Features with a 'Join_Key' column
+    """
+    features = pd.read_csv(path, dtype=FEATURE_DTYPES, parse_dates=['Date'])
+    features['Join_Key'] = _join_key(features['Store'].to_numpy(), date_ordinal(features['Date']))
+    return features.sort_values('Join_Key', ignore_index=True)
+
+def read_sales(path):
+    """
+    Read weekly Store x Dept rows (train.csv with Weekly_Sales, or test.csv without)
+    Args: path (str): Path to the sales file
+    Returns: pandas.DataFrame: Rows sorted by Store, Dept and Date
+    """
+    columns = pd.read_csv(path, nrows=0).columns
+    dtypes = {col: dtype for col, dtype in SALES_DTYPES.items() if col in columns}
+    sales = pd.read_csv(path, dtype=dtypes, parse_dates=['Date'])
+    order = np.lexsort((date_ordinal(sales['Date']), sales['Dept'].to_numpy(),
+                        sales['Store'].to_numpy()))
+    return sales.take(order).reset_index(drop=True)
+
+def join_features(sales, features, stores, max_gap_days=0):
+    """
+    Attach features and store metadata to Store x Dept rows with sorted-key lookups
+    instead of hash merges: each row is matched to the latest feature row of the
+    same store dated at most max_gap_days before it (0 means an exact date match).
+    Args: sales (pandas.DataFrame): Output of read_sales
+          features (pandas.DataFrame): Output of read_features
+          stores (pandas.DataFrame): Output of read_stores
+          max_gap_days (int): Largest allowed distance to an earlier feature date
+    Returns: pandas.DataFrame: Sales rows with feature and store columns
+    """
+    store_ids = sales['Store'].to_numpy()
+    ordinals = date_ordinal(sales['Date'])
+    
+    # As-of lookup on the packed (Store, ordinal) key of the pre-sorted features
+    feature_keys = features['Join_Key'].to_numpy()
+    joined = sales.copy()
+    if len(feature_keys):
+        position = np.searchsorted(feature_keys, _join_key(store_ids, ordinals), side='right') - 1
+        position = np.clip(position, 0, len(feature_keys) - 1)
+        matched_keys = feature_keys[position]
+        gap = ordinals.astype(np.int64) - ((matched_keys & 0xFFFFFFFF) - ORDINAL_OFFSET)
+        matched = ((matched_keys >> 32) == store_ids) & (gap >= 0) & (gap <= max_gap_days)
+        for col in FEATURE_COLUMNS:
+            values = features[col].to_numpy()[position]
+            joined[col] = np.where(matched, values, np.float32(np.nan))
+        holidays = features['IsHoliday'].to_numpy()[position] & matched
+    else:
+        # No feature rows: every feature is missing
+        matched = np.zeros(len(sales), dtype=bool)
+        for col in FEATURE_COLUMNS:
+            joined[col] = np.full(len(sales), np.nan, dtype=np.float32)
+        holidays = matched
+    if 'IsHoliday' not in joined.columns:
+        joined['IsHoliday'] = holidays
+    
+    # Store metadata through a dense lookup table indexed by Store id, sized for the
+    # sales ids too so stores missing from stores.csv read as unknown
+    size = max(np.max(stores['Store'].to_numpy(), initial=0), np.max(store_ids, initial=0)) + 1
+    lookup = np.full(int(size), -1, dtype=np.int32)
+    lookup[stores['Store'].to_numpy()] = np.arange(len(stores))
+    store_position = lookup[store_ids]
+    known_store = store_position >= 0
+    # Unknown stores point at a trailing missing entry
+    store_position = np.where(known_store, store_position, len(stores))
+    joined['Type'] = pd.Categorical.from_codes(
+        np.append(stores['Type'].cat.codes.to_numpy(), -1)[store_position], dtype=stores['Type'].dtype)
+    joined['Size'] = pd.arrays.IntegerArray(
+        np.append(stores['Size'].to_numpy(dtype=np.int32), 0)[store_position], ~known_store)
+    
+    print(f"🔗 Joined {len(joined):,} rows ({(~matched).sum():,} without features)")
+    return joined
+
+def create_sample_train_data(test, features, stores, seed=42):
+    """
+    Create sample weekly sales for the Store x Dept pairs of test.csv, covering
+    the feature weeks before the test period, when train.csv is unavailable
+    Args: test (pandas.DataFrame): Output of read_sales on test.csv
+          features (pandas.DataFrame): Output of read_features
+          stores (pandas.DataFrame): Output of read_stores
+          seed (int): Random seed
+    Returns: pandas.DataFrame: Store, Dept, Date, Weekly_Sales, IsHoliday
+    """
+    print("🛠️  Creating sample weekly sales for the Store x Dept pairs in test.csv...")
+    rng = np.random.default_rng(seed)
+    
+    pairs = test[['Store', 'Dept']].drop_duplicates().to_numpy()
+    history = features[features['Date'] < test['Date'].min()]
+    weeks = np.sort(history['Date'].unique())
+    holiday_weeks = history.loc[history['IsHoliday'], 'Date'].unique().to_numpy()
+    
+    n_pairs, n_weeks = len(pairs), len(weeks)
+    store_size = stores.set_index('Store')['Size'].reindex(pairs[:, 0]).fillna(100000).to_numpy()
+    
+    # Level by store size and department, yearly seasonality, holiday lift and noise
+    level = store_size[:, None] / 10 * rng.lognormal(0, 0.8, n_pairs)[:, None]
+    week_of_year = pd.DatetimeIndex(weeks).isocalendar().week.to_numpy(dtype=float)
+    seasonal = 1 + 0.15 * np.sin(2 * np.pi * week_of_year / 52) + 0.4 * (week_of_year >= 47)
+    holiday = np.where(np.isin(weeks, holiday_weeks), 1.2, 1.0)
+    trend = 1 + 0.03 * np.arange(n_weeks) / 52
+    noise = rng.normal(1, 0.1, (n_pairs, n_weeks))
+    sales = level * (seasonal * holiday * trend)[None, :] * noise
+    
+    sample = pd.DataFrame({
+        'Store': np.repeat(pairs[:, 0], n_weeks).astype('int16'),
+        'Dept': np.repeat(pairs[:, 1], n_weeks).astype('int16'),
+        'Date': np.tile(weeks, n_pairs),
+        'Weekly_Sales': sales.ravel().astype('float32'),
+        'IsHoliday': np.tile(holiday > 1, n_pairs)
+    })
+    print(f"✅ Sample weekly sales created: {len(sample):,} rows")
+    return sample
+
+def load_walmart_dataset(data_dir='.', split='train', max_gap_days=0):
+    """
+    Assemble the Kaggle-style Walmart layout: weekly Store x Dept rows joined to
+    per-Store x Date features and store metadata
+    Args: data_dir (str): Directory holding train/test/features/stores CSVs
+          split (str): 'train' (historical Weekly_Sales) or 'test' (rows to forecast)
+          max_gap_days (int): As-of tolerance for the feature join
+    Returns: pandas.DataFrame: Joined dataset sorted by Store, Dept and Date
+    """
+    print("\n" + "="*50)
+    print("🏬 WALMART DATASET ASSEMBLY")
+    print("="*50)
+    
+    path = lambda name: os.path.join(data_dir, name)
+    features = read_features(path(FEATURES_FILE))
+    stores = read_stores(path(STORES_FILE))
+    print(f"✅ Features: {len(features):,} rows, stores: {len(stores)}")
+    
+    if split == 'test':
+        sales = read_sales(path(TEST_FILE))
+    elif os.path.exists(path(TRAIN_FILE)):
+        sales = read_sales(path(TRAIN_FILE))
+    else:
+        print(f"⚠️  {TRAIN_FILE} not found.")
+        sales = create_sample_train_data(read_sales(path(TEST_FILE)), features, stores)
+    
+    dataset = join_features(sales, features, stores, max_gap_days=max_gap_days)
+    print(f"📊 Dataset shape: {dataset.shape}")
+    print(f"🏬 Stores: {dataset['Store'].nunique()}, departments: {dataset['Dept'].nunique()}, "
+          f"weeks: {dataset['Date'].nunique()}")
+    print(f"💾 Memory: {dataset.memory_usage(deep=True).sum() / 1024 ** 2:,.1f} MB")
+    return dataset
+
+if __name__ == "__main__":
+    # Test the dataset assembly
+    train = load_walmart_dataset()
+    print(train.head())
+    test = load_walmart_dataset(split='test')
+    print(test.head())
\ No newline at end of file